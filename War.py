@@ -1,645 +1,639 @@
+import os
 import pygame
 import sys
-import random
-import math
 from pygame.locals import *
 
-# 初始化pygame
-pygame.init()
+from war_ai import AIPlanner, DistanceFields
+from war_engine import WarEngine, COUNTRY_ELIMINATED, GREEN, YELLOW, CYAN
+from war_profile import Profiler
+from war_render import BoardRenderer, Camera, WHITE
+from war_replay import ReplayReader, ReplayWriter
+from war_save import load_game, save_game
+from war_search import SearchAI
 
-# 游戏常量
+# 游戏常量（地图尺寸和国家数量可在启动时通过命令行参数修改）
 SCREEN_WIDTH = 1000
 SCREEN_HEIGHT = 700
+PANEL_HEIGHT = 100  # 下方留100像素用于信息面板
 TILE_SIZE = 40  # 增大格子尺寸
-GRID_WIDTH = SCREEN_WIDTH // TILE_SIZE  # 25格
-GRID_HEIGHT = (SCREEN_HEIGHT - 100) // TILE_SIZE  # 17格（下方留100像素用于信息面板）
-
-# 尝试加载中文字体
-try:
-    # 尝试常见的中文字体
-    FONT = pygame.font.SysFont("SimHei", 20)
-    LARGE_FONT = pygame.font.SysFont("SimHei", 30)
-    SMALL_FONT = pygame.font.SysFont("SimHei", 18)
-except:
-    # 回退到默认字体
-    FONT = pygame.font.SysFont(None, 20)
-    LARGE_FONT = pygame.font.SysFont(None, 30)
-    SMALL_FONT = pygame.font.SysFont(None, 18)
-
-# 颜色
-BACKGROUND = (30, 30, 50)
-GRID_COLOR = (60, 60, 80)
-WHITE = (255, 255, 255)
-BLACK = (0, 0, 0)
-RED = (255, 80, 80)
-GREEN = (80, 255, 80)
-BLUE = (80, 150, 255)
-YELLOW = (255, 255, 80)
-PURPLE = (200, 80, 255)
-CYAN = (80, 255, 255)
-ORANGE = (255, 165, 0)
-PINK = (255, 105, 180)
-COLORS = [RED, BLUE, YELLOW, PURPLE, CYAN, ORANGE, PINK]  # 增加更多颜色
-HIGHLIGHT = (255, 255, 255, 100)
-NEUTRAL_COLOR = (100, 100, 100)  # 中立领土颜色
-
-class Country:
-    def __init__(self, color, name, is_player=False):
-        self.color = color
-        self.name = name
-        self.is_player = is_player
-        self.current_territory = 0  # 当前拥有的领土数
-        self.total_territory = 0    # 总共占领过的领土数（包括失去的）
-        self.troops = []  # 存储士兵组的位置坐标
-        self.next_reward = 3
-        self.defeated = False
-    
-    def get_troop_count(self):
-        """计算国家总兵力（士兵组数量）"""
-        return len(self.troops)
-    
-    def add_territory(self, game):
-        """增加领土并检查是否应生成新士兵组"""
-        # 每新占领3块领土获得一个新的士兵组（基于总共占领过的领土数）
-        if self.total_territory >= self.next_reward:
-            # 更新奖励阈值
-            self.next_reward += 3
-            
-            # 在随机领土上生成新士兵组
-            if self.troops:
-                # 收集所有安全的领土位置（仅限己方领土且无士兵重叠）
-                safe_positions = []
-                for y in range(GRID_HEIGHT):
-                    for x in range(GRID_WIDTH):
-                        if game.grid[y][x] and game.grid[y][x]['country'] == self:
-                            # 确保不在他国领土上
-                            is_safe = True
-                            for dx, dy in [(0,0), (0,-1), (0,1), (-1,0), (1,0)]:
-                                nx, ny = x + dx, y + dy
-                                if 0 <= nx < GRID_WIDTH and 0 <= ny < GRID_HEIGHT:
-                                    if game.grid[ny][nx] and game.grid[ny][nx]['country'] != self:
-                                        is_safe = False
-                                        break
-                            
-                            if is_safe:
-                                safe_positions.append((x, y))
-                
-                if safe_positions:
-                    # 随机选择一个安全位置
-                    x, y = random.choice(safe_positions)
-                    
-                    # 创建新士兵组
-                    new_troop = [x, y]
-                    
-                    # 添加到国家士兵列表
-                    self.troops.append(new_troop)
-                    
-                    # 添加到网格
-                    game.grid[y][x]['troops'].append(new_troop)
-                    return True
-        return False
+GRID_WIDTH = SCREEN_WIDTH // TILE_SIZE  # 默认25格
+GRID_HEIGHT = (SCREEN_HEIGHT - PANEL_HEIGHT) // TILE_SIZE  # 默认15格
+NUM_AI = 5
+PAN_STEP = 40  # 方向键每次平移的像素
+PANEL_COUNTRIES = 6  # 信息面板最多列出的电脑国家数量
+
+AI_MOVE_DELAY = 500  # 电脑每次行动后的默认展示时间（毫秒）
+AI_TURN_PLAYBACK = 3000  # 一个电脑回合回放的最长总时间（毫秒），电脑国家多时缩短每步的展示时间
+REPLAY_DELAY = 100  # 回放时每一步的默认展示时间（毫秒）
+SAVE_FILE = "war.wars"  # 按F5保存、按F9载入的默认存档
+# 性能面板显示的阶段（按F3开关）
+PROFILE_PHASES = [("handle_event", "事件"), ("move_troops", "移动"), ("ai_turn", "电脑"),
+                  ("add_territory", "生成"), ("draw_grid", "绘制")]
+IDLE_TIMEOUT = 1000  # 事件驱动模式下无事件时的最长等待时间（毫秒）
+AI_PLANNED = USEREVENT + 1  # 后台规划完成时唤醒主循环
+
+def load_fonts():
+    global FONT, LARGE_FONT, SMALL_FONT
+    # 尝试加载中文字体
+    try:
+        # 尝试常见的中文字体
+        FONT = pygame.font.SysFont("SimHei", 20)
+        LARGE_FONT = pygame.font.SysFont("SimHei", 30)
+        SMALL_FONT = pygame.font.SysFont("SimHei", 18)
+    except:
+        # 回退到默认字体
+        FONT = pygame.font.SysFont(None, 20)
+        LARGE_FONT = pygame.font.SysFont(None, 30)
+        SMALL_FONT = pygame.font.SysFont(None, 18)
+
+class AIPlayback:
+    """电脑回合回放：每隔delay毫秒执行一个电脑国家的行动，由主循环在帧之间推进
+
+    delay为0时整个电脑回合在一次update中完成；电脑国家多时每步的展示时间按AI_TURN_PLAYBACK缩短，
+    回放期间玩家不能操作，总时间不随国家数增长。
+    同时行动模式下orders为玩家的命令，规划完成后与电脑的命令一起结算，没有逐步回放。
+    """
+
+    def __init__(self, engine, delay, pending=None, orders=None):
+        self.engine = engine
+        # pending为后台规划中的PlannedTurn，完成后才开始回放
+        self.pending = pending
+        self.orders = orders
+        self.steps = None if pending or orders is not None else engine.ai_turn_steps()
+        countries = sum(1 for country in engine.countries if not country.is_player and not country.defeated)
+        self.delay = min(delay, AI_TURN_PLAYBACK // max(countries, 1))
+        self.next_time = pygame.time.get_ticks() + self.delay
+        self.done = False
+
+    def time_until_next(self):
+        if self.pending:
+            return IDLE_TIMEOUT  # 由AI_PLANNED事件唤醒
+        return max(0, self.next_time - pygame.time.get_ticks())
+
+    def update(self):
+        """执行到期的步骤，返回画面是否发生变化"""
+        plans = None
+        if self.pending:
+            if not self.pending.done():
+                return False
+            plans = self.pending.plans()
+            self.pending = None
+        if self.orders is not None:
+            self.engine.simultaneous_turn(self.orders, plans)
+            self.done = True
+            return True
+        if plans is not None:
+            self.steps = self.engine.ai_turn_steps(plans)
+
+        if self.delay <= 0:
+            for _ in self.steps:
+                pass
+            self.finish()
+            return True
+
+        now = pygame.time.get_ticks()
+        if now < self.next_time:
+            return False
+        try:
+            next(self.steps)
+        except StopIteration:
+            self.finish()
+        self.next_time = now + self.delay
+        return True
+
+    def finish(self):
+        # 所有电脑国家行动完毕，结算本回合
+        self.engine.finish_turn()
+        self.done = True
 
 class Game:
-    def __init__(self):
+    """pygame前端：负责绘制和输入，规则由WarEngine处理"""
+
+    def __init__(self, event_driven=True, ai_delay=AI_MOVE_DELAY, ai_workers=4, ai_pool="thread",
+                 grid_width=GRID_WIDTH, grid_height=GRID_HEIGHT, num_ai=NUM_AI, tile_size=TILE_SIZE,
+                 search_ms=0, record=None, seed=None, save_path=SAVE_FILE, load=False, profile=False,
+                 strategic=False, simultaneous=False):
+        # 初始化pygame（仅在创建窗口时进行，导入本模块不会初始化显示）
+        pygame.init()
+        load_fonts()
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption("war")
+        pygame.key.set_repeat(200, 30)  # 按住方向键连续平移
         self.clock = pygame.time.Clock()
-        
-        # 创建国家
-        self.countries = []
-        self.player_country = Country(GREEN, "玩家", True)
-        self.countries.append(self.player_country)
-        
-        # 创建电脑国家 (使用不同颜色)
-        ai_names = ["红国", "蓝国", "黄国", "紫国", "青国"]
-        for i in range(5):  # 创建5个电脑国家
-            color_idx = i % len(COLORS)
-            self.countries.append(Country(COLORS[color_idx], ai_names[i]))
-        
-        # 初始化网格
-        self.grid = [[None for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+        # 事件驱动模式：只在画面被标记为需要重绘时才绘制
+        self.event_driven = event_driven
+        self.frame_dirty = True
+        # 电脑回合回放
+        self.ai_delay = ai_delay
+        self.ai_playback = None
+        # 电脑规划在线程/进程池中进行，不占用界面线程；ai_workers为0时在主线程规划
+        # 搜索型电脑按顺序在实时棋盘上搜索，每步耗时受search_ms限制，不使用规划池
+        self.ai_planner = AIPlanner(ai_workers, ai_pool) if ai_workers > 0 and not search_ms else None
+
+        # 游戏规则核心；load为True时从存档继续（地图尺寸和国家数量以存档为准）
+        self.save_path = save_path
+        if load:
+            self.engine = load_game(save_path)
+            self.engine.searcher = SearchAI(search_ms / 1000) if search_ms else None
+            self.engine.fields = DistanceFields() if strategic else None
+            self.engine.simultaneous = simultaneous
+        else:
+            self.engine = WarEngine(grid_width, grid_height, num_ai=num_ai, search_time=search_ms / 1000, seed=seed,
+                                    strategic=strategic, simultaneous=simultaneous)
+        self.engine.subscribe(COUNTRY_ELIMINATED, self.on_country_eliminated)
+        self.engine.track_history()  # 按U撤销、按Y重做
+        # 录像：record为文件路径，重新开始后的对局依次写入“文件名-2”、“文件名-3”……
+        self.record = record
+        self.recorder = None
+        self.games = 1
+        self.start_recording()
         self.selected_tile = None  # 改为选择整个方格
-        self.game_over = False
-        self.winner = None
-        self.turn_count = 0  # 回合计数器
-        
-        # 初始化领土和士兵
-        self.initialize_game()
-    
-    def initialize_game(self):
-        # 为每个国家分配初始领土
-        positions = []
-        for i in range(len(self.countries)):
-            while True:
-                x = random.randint(2, GRID_WIDTH - 3)
-                y = random.randint(2, GRID_HEIGHT - 3)
-                # 确保初始位置不重叠且有一定间距
-                too_close = False
-                for px, py in positions:
-                    if abs(px - x) < 4 and abs(py - y) < 4:
-                        too_close = True
-                        break
-                if not too_close and (x, y) not in positions:
-                    positions.append((x, y))
-                    self.grid[y][x] = {
-                        'country': self.countries[i],
-                        'troops': [[x, y]]  # 初始士兵组
-                    }
-                    self.countries[i].current_territory = 1
-                    self.countries[i].total_territory = 1
-                    self.countries[i].troops = [[x, y]]
-                    self.countries[i].next_reward = 3
-                    break
-    
+        self.message = None  # 信息面板上的最新战报
+
+        # 视口：地图大于屏幕时只显示其中一部分，可平移和缩放
+        self.camera = Camera((0, 0, SCREEN_WIDTH, SCREEN_HEIGHT - PANEL_HEIGHT),
+                             self.engine.grid_width, self.engine.grid_height, tile_size)
+        self.dragging = False  # 右键拖动平移中
+        self.center_on_player()
+        self.renderer = BoardRenderer(self.screen, self.board, self.countries, self.camera, FONT,
+                                      self.engine.move_offsets)
+
+        # 性能统计：profile为True时从开始就统计（退出时可写入文件），否则按F3时才开启
+        self.profiler = None
+        self.keep_profiling = profile
+        self.show_profile = False
+        if profile:
+            self.start_profiling()
+
+    # 以下属性直接读取规则核心中的状态
+    @property
+    def board(self):
+        return self.engine.board
+
+    @property
+    def countries(self):
+        return self.engine.countries
+
+    @property
+    def player_country(self):
+        return self.engine.player_country
+
+    @property
+    def game_over(self):
+        return self.engine.game_over
+
+    @property
+    def winner(self):
+        return self.engine.winner
+
+    @property
+    def turn_count(self):
+        return self.engine.turn_count
+
     def draw_grid(self):
-        # 绘制网格背景
-        self.screen.fill(BACKGROUND)
-        
-        # 绘制网格线
-        for x in range(0, SCREEN_WIDTH, TILE_SIZE):
-            pygame.draw.line(self.screen, GRID_COLOR, (x, 0), (x, GRID_HEIGHT * TILE_SIZE))
-        for y in range(0, GRID_HEIGHT * TILE_SIZE, TILE_SIZE):
-            pygame.draw.line(self.screen, GRID_COLOR, (0, y), (SCREEN_WIDTH, y))
-        
-        # 绘制领土和士兵
-        for y in range(GRID_HEIGHT):
-            for x in range(GRID_WIDTH):
-                tile = self.grid[y][x]
-                if tile:
-                    # 确保国家对象存在
-                    if tile['country']:
-                        rect = pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
-                        pygame.draw.rect(self.screen, tile['country'].color, rect)
-                        
-                        # 绘制士兵组
-                        troop_count = len(tile['troops'])
-                        if troop_count > 0:
-                            pygame.draw.circle(self.screen, WHITE, 
-                                            (x * TILE_SIZE + TILE_SIZE//2, y * TILE_SIZE + TILE_SIZE//2),
-                                            TILE_SIZE//3)
-                            text = FONT.render(str(troop_count), True, BLACK)
-                            text_rect = text.get_rect(center=(x * TILE_SIZE + TILE_SIZE//2, y * TILE_SIZE + TILE_SIZE//2))
-                            self.screen.blit(text, text_rect)
-                    else:
-                        # 绘制中立领土
-                        rect = pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
-                        pygame.draw.rect(self.screen, NEUTRAL_COLOR, rect)
-        
-        # 绘制选中的方格
-        if self.selected_tile:
-            x, y = self.selected_tile
-            rect = pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
-            pygame.draw.rect(self.screen, HIGHLIGHT, rect, 3)
-            
-            # 绘制可移动范围 (距离2格)
-            for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0),  # 相邻格子
-                          (0, -2), (0, 2), (-2, 0), (2, 0)]:  # 距离2格
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < GRID_WIDTH and 0 <= ny < GRID_HEIGHT:
-                    rect = pygame.Rect(nx * TILE_SIZE, ny * TILE_SIZE, TILE_SIZE, TILE_SIZE)
-                    pygame.draw.rect(self.screen, (255, 255, 255, 100), rect, 2)
-        
-        # 绘制信息面板
-        info_panel_y = GRID_HEIGHT * TILE_SIZE
-        info_panel_height = SCREEN_HEIGHT - info_panel_y
-        pygame.draw.rect(self.screen, (40, 40, 60), (0, info_panel_y, SCREEN_WIDTH, info_panel_height))
-        pygame.draw.line(self.screen, WHITE, (0, info_panel_y), (SCREEN_WIDTH, info_panel_y), 2)
-        
-        # 绘制玩家信息
-        player_text = LARGE_FONT.render(f"玩家: {self.player_country.current_territory}领土 {self.player_country.get_troop_count()}兵力", True, GREEN)
-        self.screen.blit(player_text, (20, info_panel_y + 10))
-        
-        # 绘制电脑国家信息
-        ai_info = []
-        for country in self.countries:
-            if not country.is_player and not country.defeated:
+        """绘制一帧（只重绘变化部分），返回需要更新到显示器的矩形列表"""
+        info_panel_y = self.renderer.panel_rect.top
+        panel_items = []
+
+        # 玩家信息
+        panel_items.append((LARGE_FONT, f"玩家: {self.player_country.current_territory}领土 {self.player_country.get_troop_count()}兵力", GREEN, (20, info_panel_y + 10)))
+
+        if self.show_profile:
+            # 性能面板代替电脑国家信息显示
+            frame_line, phase_line, counter_line = self.profiler.summary(PROFILE_PHASES)
+            panel_items.append((SMALL_FONT, frame_line, WHITE, (20, info_panel_y + 45)))
+            panel_items.append((SMALL_FONT, phase_line, WHITE, (20, info_panel_y + 70)))
+            panel_items.append((SMALL_FONT, counter_line, WHITE, (650, info_panel_y + 35)))
+        else:
+            # 电脑国家信息
+            ai_info = []
+            alive = [country for country in self.countries if not country.is_player and not country.defeated]
+            if len(alive) > PANEL_COUNTRIES:
+                # 国家太多时只列出领土最多的几个
+                alive = sorted(alive, key=lambda country: -country.current_territory)
+            for country in alive[:PANEL_COUNTRIES]:
                 # 显示国家名、领土数和兵力
                 ai_info.append(f"{country.name}: {country.current_territory}领土 {country.get_troop_count()}兵力")
-        
-        # 第一列
-        if len(ai_info) > 0:
-            ai_text1 = SMALL_FONT.render("电脑国家: " + ", ".join(ai_info[:3]), True, YELLOW)
-            self.screen.blit(ai_text1, (20, info_panel_y + 45))
-        
-        # 第二列
-        if len(ai_info) > 3:
-            ai_text2 = SMALL_FONT.render(", ".join(ai_info[3:]), True, YELLOW)
-            self.screen.blit(ai_text2, (20, info_panel_y + 70))
-        
+            if len(alive) > PANEL_COUNTRIES:
+                ai_info[-1] += f" 等{len(alive)}国"
+
+            # 第一列
+            if len(ai_info) > 0:
+                panel_items.append((SMALL_FONT, "电脑国家: " + ", ".join(ai_info[:3]), YELLOW, (20, info_panel_y + 45)))
+
+            # 第二列
+            if len(ai_info) > 3:
+                panel_items.append((SMALL_FONT, ", ".join(ai_info[3:]), YELLOW, (20, info_panel_y + 70)))
+
         # 回合计数
-        turn_text = SMALL_FONT.render(f"回合: {self.turn_count}", True, CYAN)
-        self.screen.blit(turn_text, (500, info_panel_y + 10))
-        
-        # 绘制游戏结束信息
+        panel_items.append((SMALL_FONT, f"回合: {self.turn_count}", CYAN, (500, info_panel_y + 10)))
+
+        # 最新战报
+        if self.message:
+            panel_items.append((SMALL_FONT, self.message, WHITE, (650, info_panel_y + 10)))
+
+        # 游戏结束信息
+        overlay_items = None
         if self.game_over:
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 180))
-            self.screen.blit(overlay, (0, 0))
-            
             if self.winner.is_player:
-                text = LARGE_FONT.render("恭喜！你赢得了战争！", True, GREEN)
+                title = (LARGE_FONT, "恭喜！你赢得了战争！", GREEN, -50)
             else:
-                text = LARGE_FONT.render(f"{self.winner.name}赢得了战争！", True, self.winner.color)
-            
-            restart = FONT.render("按R键重新开始游戏", True, WHITE)
-            
-            self.screen.blit(text, (SCREEN_WIDTH//2 - text.get_width()//2, SCREEN_HEIGHT//2 - 50))
-            self.screen.blit(restart, (SCREEN_WIDTH//2 - restart.get_width()//2, SCREEN_HEIGHT//2 + 20))
-    
+                title = (LARGE_FONT, f"{self.winner.name}赢得了战争！", self.winner.color, -50)
+            overlay_items = [title, (FONT, "按R键重新开始游戏", WHITE, 20)]
+
+        return self.renderer.render(self.selected_tile, panel_items, overlay_items)
+
     def handle_click(self, pos):
-        if self.game_over:
+        # 电脑回合回放期间不接受移动操作
+        if self.game_over or self.ai_playback:
             return
         
-        grid_x = pos[0] // TILE_SIZE
-        grid_y = pos[1] // TILE_SIZE
-        
-        # 确保点击在网格范围内
-        if not (0 <= grid_x < GRID_WIDTH and 0 <= grid_y < GRID_HEIGHT):
+        # 确保点击在网格范围内（由视口换算成格子坐标）
+        tile = self.camera.screen_to_tile(pos)
+        if tile is None:
             return
+        grid_x, grid_y = tile
         
         # 选择整个方格
         if self.selected_tile is None:
-            tile = self.grid[grid_y][grid_x]
-            if tile and tile['country'] == self.player_country:
+            if self.board.owner[grid_y, grid_x] == self.player_country.cid:
                 # 检查该位置是否有玩家士兵组
-                if tile['troops']:
+                if self.board.troop_count[grid_y, grid_x]:
                     self.selected_tile = (grid_x, grid_y)
         else:
             # 移动士兵组
             selected_x, selected_y = self.selected_tile
             
-            # 检查是否在移动范围内 (曼哈顿距离 <= 2 且在同一行或列)
-            dx = abs(grid_x - selected_x)
-            dy = abs(grid_y - selected_y)
-            
             # 只能水平或垂直移动，距离1-2格
-            if ((dx == 1 or dx == 2) and dy == 0) or ((dy == 1 or dy == 2) and dx == 0):
+            if (grid_x - selected_x, grid_y - selected_y) in self.engine.move_offsets:
                 self.move_troops(selected_x, selected_y, grid_x, grid_y)
             
             self.selected_tile = None
     
     def move_troops(self, from_x, from_y, to_x, to_y):
-        # 获取原方格信息
-        from_tile = self.grid[from_y][from_x]
-        if not from_tile or not from_tile['troops']:
-            return
-        
-        # 获取要移动的所有士兵组
-        moving_troops = from_tile['troops'][:]  # 复制列表
-        moving_count = len(moving_troops)
-        
-        # 从原位置移除所有士兵组
-        from_tile['troops'] = []
-        for troop in moving_troops:
-            if troop in self.player_country.troops:
-                self.player_country.troops.remove(troop)
-        
-        # 更新士兵组位置
-        for troop in moving_troops:
-            troop[0] = to_x
-            troop[1] = to_y
-        
-        # 添加到新位置
-        to_tile = self.grid[to_y][to_x]
-        
-        if not to_tile:
-            # 占领新领土
-            self.grid[to_y][to_x] = {
-                'country': self.player_country,
-                'troops': moving_troops
-            }
-            self.player_country.current_territory += 1
-            self.player_country.total_territory += 1
-            self.player_country.troops.extend(moving_troops)
-            # 检查是否应获得新士兵组（基于总占领领土数）
-            self.player_country.add_territory(self)
-        else:
-            if to_tile['country'] == self.player_country:
-                # 合并到友方领土
-                to_tile['troops'].extend(moving_troops)
-                self.player_country.troops.extend(moving_troops)
-            else:
-                # 与敌方发生战斗
-                self.resolve_battle(to_x, to_y, moving_troops, moving_count)
-        
-        # 电脑回合
-        self.ai_turn()
-        self.turn_count += 1
-        
-        # 检查游戏是否结束
-        self.check_game_over()
-    
-    def resolve_battle(self, x, y, attacking_troops, attacking_count):
-        tile = self.grid[y][x]
-        defending_country = tile['country']
-        defending_troops = tile['troops']
-        defending_count = len(defending_troops)
-        
-        # 计算战斗结果
-        if attacking_count >= defending_count:
-            # 攻击方胜利
-            tile['country'] = self.player_country
-            
-            # 保留差值数量的士兵组
-            remaining_attacking_troops = attacking_troops[:attacking_count - defending_count] if attacking_count > defending_count else []
-            
-            # 设置领土上的士兵组
-            tile['troops'] = remaining_attacking_troops
-            
-            # 更新玩家士兵列表
-            self.player_country.troops.extend(remaining_attacking_troops)
-            
-            # 领土变更
-            self.player_country.current_territory += 1
-            self.player_country.total_territory += 1
-            if defending_country:
-                defending_country.current_territory -= 1
-                # 检查防御方是否被击败
-                if defending_country.current_territory <= 0:
-                    defending_country.defeated = True
-                    # 移除所有该国家的领土
-                    for y2 in range(GRID_HEIGHT):
-                        for x2 in range(GRID_WIDTH):
-                            tile2 = self.grid[y2][x2]
-                            if tile2 and tile2['country'] == defending_country:
-                                tile2['country'] = None
-            
-            # 检查是否应获得新士兵组（基于总占领领土数）
-            self.player_country.add_territory(self)
+        engine = self.engine
+        orders = None
+        if engine.simultaneous:
+            # 同时行动：玩家的命令先保留，电脑规划完成后一起结算
+            player = self.player_country
+            if engine.is_legal_move(player.cid, from_x, from_y, to_x, to_y):
+                orders = [(player.cid, from_x, from_y, to_x, to_y)]
+        if orders or (not engine.simultaneous and engine.player_move(from_x, from_y, to_x, to_y)):
+            # 电脑回合交给主循环逐步回放，不阻塞事件处理
+            pending = None
+            if self.ai_planner:
+                pending = self.ai_planner.submit(self.engine)
+                pending.add_done_callback(lambda: pygame.event.post(pygame.event.Event(AI_PLANNED)))
+            self.ai_playback = AIPlayback(engine, self.ai_delay, pending, orders)
+
+    def update_ai(self):
+        """推进电脑回合回放"""
+        if self.ai_playback and self.ai_playback.update():
+            self.frame_dirty = True
+            if self.ai_playback.done:
+                self.ai_playback = None
+
+    def center_on_player(self):
+        """视口移动到玩家的领土"""
+        if self.player_country.tiles:
+            self.camera.center_on(*min(self.player_country.tiles))
+
+    def handle_camera_event(self, event):
+        """平移（方向键/WASD、右键拖动）和缩放（滚轮），返回是否处理了该事件"""
+        camera = self.camera
+        if event.type == KEYDOWN:
+            dx, dy = {
+                K_LEFT: (-1, 0), K_a: (-1, 0), K_RIGHT: (1, 0), K_d: (1, 0),
+                K_UP: (0, -1), K_w: (0, -1), K_DOWN: (0, 1), K_s: (0, 1),
+            }.get(event.key, (0, 0))
+            if not (dx or dy):
+                return False
+            camera.pan(dx * PAN_STEP, dy * PAN_STEP)
+        elif event.type == MOUSEWHEEL:
+            camera.zoom(event.y, pygame.mouse.get_pos())
+        elif event.type == MOUSEBUTTONDOWN and event.button == 3:
+            self.dragging = True
+            pygame.event.set_allowed(MOUSEMOTION)
+        elif event.type == MOUSEBUTTONUP and event.button == 3:
+            self.dragging = False
+            if self.event_driven:
+                pygame.event.set_blocked(MOUSEMOTION)
+        elif event.type == MOUSEMOTION and self.dragging:
+            camera.pan(-event.rel[0], -event.rel[1])
         else:
-            # 防御方胜利 - 保留y-x个士兵组
-            # 移除所有进攻方士兵组
-            for troop in attacking_troops:
-                if troop in self.player_country.troops:
-                    self.player_country.troops.remove(troop)
-            
-            # 计算防御方应保留的士兵组数量
-            remaining_defending_count = defending_count - attacking_count
-            
-            # 随机保留防御方士兵组
-            if remaining_defending_count > 0:
-                # 随机选择要保留的士兵组
-                remaining_troops = random.sample(defending_troops, remaining_defending_count)
-                tile['troops'] = remaining_troops
-                
-                # 更新防御方国家士兵列表
-                if defending_country:
-                    defending_country.troops = [t for t in defending_country.troops if t in remaining_troops]
-            else:
-                # 如果防御方士兵全部被消灭
-                tile['troops'] = []
-                tile['country'] = None
-                if defending_country:
-                    defending_country.current_territory -= 1
-                    if defending_country.current_territory <= 0:
-                        defending_country.defeated = True
-                        # 移除所有该国家的领土
-                        for y2 in range(GRID_HEIGHT):
-                            for x2 in range(GRID_WIDTH):
-                                t = self.grid[y2][x2]
-                                if t and t['country'] == defending_country:
-                                    t['country'] = None
-    
-    def ai_turn(self):
-        for country in self.countries:
-            if country.is_player or country.defeated:
-                continue
-            
-            # 收集所有可能的移动
-            possible_moves = []
-            
-            # 收集所有边境格子（与敌方或空白相邻的格子）
-            border_tiles = []
-            for y in range(GRID_HEIGHT):
-                for x in range(GRID_WIDTH):
-                    tile = self.grid[y][x]
-                    if tile and tile['country'] == country and tile['troops']:
-                        # 检查是否在边境
-                        is_border = False
-                        for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0)]:
-                            nx, ny = x + dx, y + dy
-                            if 0 <= nx < GRID_WIDTH and 0 <= ny < GRID_HEIGHT:
-                                neighbor = self.grid[ny][nx]
-                                if not neighbor or (neighbor['country'] and neighbor['country'] != country):
-                                    is_border = True
-                                    break
-                        
-                        if is_border:
-                            border_tiles.append((x, y))
-            
-            if not border_tiles:
-                # 如果没有边境格子，使用所有有士兵的格子
-                for y in range(GRID_HEIGHT):
-                    for x in range(GRID_WIDTH):
-                        tile = self.grid[y][x]
-                        if tile and tile['country'] == country and tile['troops']:
-                            border_tiles.append((x, y))
-            
-            # 尝试每个边境格子
-            random.shuffle(border_tiles)
-            moved = False
-            
-            for x, y in border_tiles:
-                tile = self.grid[y][x]
-                # 检查该格子是否还有士兵（可能在之前的移动中已被移动）
-                if not tile or not tile['troops'] or tile['country'] != country:
-                    continue
-                
-                # 收集可能的移动目标
-                targets = []
-                
-                # 检查所有可能的方向（1-2格距离）
-                for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0), (0, -2), (0, 2), (-2, 0), (2, 0)]:
-                    nx, ny = x + dx, y + dy
-                    if 0 <= nx < GRID_WIDTH and 0 <= ny < GRID_HEIGHT:
-                        targets.append((nx, ny))
-                
-                # 随机打乱目标顺序
-                random.shuffle(targets)
-                
-                for tx, ty in targets:
-                    # 获取目标格子
-                    target_tile = self.grid[ty][tx]
-                    
-                    # 如果是空白格子，直接占领
-                    if not target_tile:
-                        self.ai_move(country, x, y, tx, ty)
-                        moved = True
-                        break
-                    
-                    # 如果是敌方格子，评估实力
-                    if target_tile and target_tile['country'] and target_tile['country'] != country:
-                        # 获取边境实力
-                        my_strength = len(tile['troops'])
-                        enemy_strength = len(target_tile['troops'])
-                        
-                        # 增强策略性 - 只在实力足够时进攻
-                        if my_strength >= enemy_strength:
-                            self.ai_move(country, x, y, tx, ty)
-                            moved = True
-                            break
-                
-                if moved:
-                    # 添加延时，让玩家看到电脑操作
-                    self.draw_grid()
-                    pygame.display.flip()
-                    pygame.time.delay(500)  # 0.5秒延时
-                    break
-    
-    def ai_move(self, country, from_x, from_y, to_x, to_y):
-        # 获取原方格信息
-        from_tile = self.grid[from_y][from_x]
-        if not from_tile or not from_tile['troops']:
+            return False
+        self.frame_dirty = True
+        return True
+
+    def undo_turn(self):
+        """撤销到玩家上一次移动之前（连同之后电脑的行动和回合结算）"""
+        if self.ai_playback:
             return
-        
-        # 获取要移动的所有士兵组
-        moving_troops = from_tile['troops'][:]  # 复制列表
-        moving_count = len(moving_troops)
-        
-        # 从原位置移除所有士兵组
-        from_tile['troops'] = []
-        for troop in moving_troops:
-            if troop in country.troops:
-                country.troops.remove(troop)
-        
-        # 更新士兵组位置
-        for troop in moving_troops:
-            troop[0] = to_x
-            troop[1] = to_y
-        
-        # 添加到新位置
-        to_tile = self.grid[to_y][to_x]
-        
-        if not to_tile:
-            # 占领新领土
-            self.grid[to_y][to_x] = {
-                'country': country,
-                'troops': moving_troops
-            }
-            country.current_territory += 1
-            country.total_territory += 1
-            country.troops.extend(moving_troops)
-            # 检查是否应获得新士兵组（基于总占领领土数）
-            country.add_territory(self)
+        player = self.player_country.cid
+        while True:
+            delta = self.engine.undo()
+            if delta is None or delta.actor == player:
+                break
+        self.selected_tile = None
+        self.message = None
+
+    def redo_turn(self):
+        """重做玩家的一次移动，以及之后电脑的行动和回合结算"""
+        if self.ai_playback or self.engine.redo() is None:
+            return
+        history = self.engine.history
+        while history.undone and history.undone[-1].actor != self.player_country.cid:
+            self.engine.redo()
+        self.selected_tile = None
+        self.message = None
+
+    def save_game(self):
+        if self.ai_playback:
+            return
+        try:
+            save_game(self.engine, self.save_path)
+        except OSError as e:
+            self.message = f"无法保存：{e}"
+            return
+        self.message = f"已保存到{self.save_path}"
+
+    def load_game(self):
+        """从存档继续：地图尺寸和国家数量必须与当前对局一致"""
+        if self.ai_playback:
+            return
+        try:
+            load_game(self.save_path, self.engine)
+        except (OSError, ValueError) as e:
+            self.message = f"无法载入存档：{e}"
+            return
+        self.selected_tile = None
+        self.message = f"已载入{self.save_path}"
+        self.renderer.invalidate()
+
+    def start_profiling(self):
+        profiler = self.profiler = Profiler()
+        profiler.attach_engine(self.engine)
+        profiler.wrap(self, 'handle_event', 'handle_event')
+        profiler.wrap(self, 'draw_grid', 'draw_grid', after=lambda rects: profiler.end_frame())
+
+    def toggle_profile(self):
+        """开关性能面板；不需要保留统计时关闭面板即停止统计，恢复原方法"""
+        if self.show_profile:
+            self.show_profile = False
+            if not self.keep_profiling:
+                self.profiler.detach()
+                self.profiler = None
         else:
-            if to_tile['country'] == country:
-                # 合并到友方领土
-                to_tile['troops'].extend(moving_troops)
-                country.troops.extend(moving_troops)
-            else:
-                # 与敌方发生战斗
-                defending_country = to_tile['country'] if to_tile['country'] else None
-                defending_troops = to_tile['troops']
-                defending_count = len(defending_troops)
-                
-                if moving_count >= defending_count:
-                    # 攻击方胜利
-                    to_tile['country'] = country
-                    
-                    # 保留差值数量的士兵组
-                    remaining_attacking_troops = moving_troops[:moving_count - defending_count] if moving_count > defending_count else []
-                    
-                    # 设置领土上的士兵组
-                    to_tile['troops'] = remaining_attacking_troops
-                    
-                    # 更新国家士兵列表
-                    country.troops.extend(remaining_attacking_troops)
-                    
-                    # 领土变更
-                    country.current_territory += 1
-                    country.total_territory += 1
-                    if defending_country:
-                        defending_country.current_territory -= 1
-                        if defending_country.current_territory <= 0:
-                            defending_country.defeated = True
-                            # 移除所有该国家的领土
-                            for y2 in range(GRID_HEIGHT):
-                                for x2 in range(GRID_WIDTH):
-                                    tile2 = self.grid[y2][x2]
-                                    if tile2 and tile2['country'] == defending_country:
-                                        tile2['country'] = None
-                    
-                    # 检查是否应获得新士兵组（基于总占领领土数）
-                    country.add_territory(self)
-                else:
-                    # 防御方胜利 - 保留y-x个士兵组
-                    # 移除所有进攻方士兵组
-                    for troop in moving_troops:
-                        if troop in country.troops:
-                            country.troops.remove(troop)
-                    
-                    # 计算防御方应保留的士兵组数量
-                    remaining_defending_count = defending_count - moving_count
-                    
-                    # 随机保留防御方士兵组
-                    if remaining_defending_count > 0:
-                        # 随机选择要保留的士兵组
-                        remaining_troops = random.sample(defending_troops, remaining_defending_count)
-                        to_tile['troops'] = remaining_troops
-                        
-                        # 更新防御方国家士兵列表
-                        if defending_country:
-                            defending_country.troops = [t for t in defending_country.troops if t in remaining_troops]
-                    else:
-                        # 如果防御方士兵全部被消灭
-                        to_tile['troops'] = []
-                        to_tile['country'] = None
-                        if defending_country:
-                            defending_country.current_territory -= 1
-                            if defending_country.current_territory <= 0:
-                                defending_country.defeated = True
-                                # 移除所有该国家的领土
-                                for y2 in range(GRID_HEIGHT):
-                                    for x2 in range(GRID_WIDTH):
-                                        t = self.grid[y2][x2]
-                                        if t and t['country'] == defending_country:
-                                            t['country'] = None
-    
-    def check_game_over(self):
-        active_countries = [c for c in self.countries if not c.defeated]
-        
-        if len(active_countries) == 1:
-            self.game_over = True
-            self.winner = active_countries[0]
-    
+            if self.profiler is None:
+                self.start_profiling()
+            self.show_profile = True
+
+    def start_recording(self):
+        if self.recorder:
+            self.recorder.close()
+        if self.record:
+            path = self.record
+            if self.games > 1:
+                stem, ext = os.path.splitext(path)
+                path = f"{stem}-{self.games}{ext}"
+            self.recorder = ReplayWriter(path, self.engine)
+
+    def on_country_eliminated(self, country):
+        self.message = f"{country.name}已被消灭"
+
     def restart_game(self):
         # 重置游戏状态
-        self.grid = [[None for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-        for country in self.countries:
-            country.current_territory = 0
-            country.total_territory = 0
-            country.troops = []
-            country.next_reward = 3
-            country.defeated = False
-        
+        self.engine.restart_game()
+        self.games += 1
+        self.start_recording()
         self.selected_tile = None
-        self.game_over = False
-        self.winner = None
-        self.turn_count = 0
-        
-        # 重新初始化游戏
-        self.initialize_game()
-    
+        self.message = None
+        self.ai_playback = None
+        self.center_on_player()
+        self.renderer.invalidate()
+
+    def handle_event(self, event):
+        if event.type == QUIT:
+            if self.ai_planner:
+                self.ai_planner.shutdown()
+            if self.recorder:
+                self.recorder.close()
+            pygame.quit()
+            sys.exit()
+        elif self.handle_camera_event(event):
+            pass
+        elif event.type == MOUSEBUTTONDOWN:
+            if event.button == 1:  # 左键点击
+                self.handle_click(event.pos)
+                self.frame_dirty = True
+        elif event.type == KEYDOWN:  # 修正此处：添加键盘事件处理
+            if event.key == K_r:  # 按R键重新开始
+                self.restart_game()
+                self.frame_dirty = True
+            elif event.key == K_u:
+                self.undo_turn()
+                self.frame_dirty = True
+            elif event.key == K_y:
+                self.redo_turn()
+                self.frame_dirty = True
+            elif event.key == K_F5:
+                self.save_game()
+                self.frame_dirty = True
+            elif event.key == K_F9:
+                self.load_game()
+                self.frame_dirty = True
+            elif event.key == K_F3:
+                self.toggle_profile()
+                self.frame_dirty = True
+        elif event.type in (VIDEOEXPOSE, WINDOWEXPOSED):
+            # 窗口被遮挡后恢复，需要整屏重绘
+            self.renderer.invalidate()
+            self.frame_dirty = True
+
     def run(self):
+        if self.event_driven:
+            self.run_event_driven()
         while True:
             for event in pygame.event.get():
-                if event.type == QUIT:
-                    pygame.quit()
-                    sys.exit()
-                elif event.type == MOUSEBUTTONDOWN:
-                    if event.button == 1:  # 左键点击
-                        self.handle_click(event.pos)
-                elif event.type == KEYDOWN:  # 修正此处：添加键盘事件处理
-                    if event.key == K_r:  # 按R键重新开始
-                        self.restart_game()
-            
-            self.draw_grid()
-            pygame.display.flip()
+                self.handle_event(event)
+            self.update_ai()
+
+            pygame.display.update(self.draw_grid())
             self.clock.tick(60)
 
+    def run_event_driven(self):
+        """事件驱动的主循环：没有输入或画面变化时阻塞等待，不占用CPU"""
+        # 鼠标移动不影响画面，不必唤醒主循环（右键拖动时临时允许）
+        pygame.event.set_blocked(MOUSEMOTION)
+        while True:
+            if self.frame_dirty:
+                pygame.display.update(self.draw_grid())
+                self.frame_dirty = False
+
+            # 有电脑行动待回放时，最多等到下一步的时间
+            timeout = IDLE_TIMEOUT
+            if self.ai_playback:
+                timeout = max(1, min(timeout, self.ai_playback.time_until_next()))
+            event = pygame.event.wait(timeout)
+            if event.type != NOEVENT:
+                self.handle_event(event)
+            for event in pygame.event.get():
+                self.handle_event(event)
+            self.update_ai()
+
+class ReplayViewer:
+    """录像回放界面：空格播放/暂停，逗号/句号跳到上/下一回合，PageUp/PageDown跳10回合，Home/End跳到开头/结尾
+
+    跳转通过最近的关键帧完成（见war_replay.ReplayReader.seek），与录像长度无关。
+    """
+
+    def __init__(self, path, delay=REPLAY_DELAY, tile_size=TILE_SIZE):
+        pygame.init()
+        load_fonts()
+        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        pygame.display.set_caption(f"war - {os.path.basename(path)}")
+        pygame.key.set_repeat(200, 30)
+        self.reader = ReplayReader(path)
+        self.engine, self.steps = self.reader.seek(0)
+        self.delay = delay
+        self.playing = False
+        self.next_time = 0
+        self.event_driven = True
+        self.frame_dirty = True
+
+        self.camera = Camera((0, 0, SCREEN_WIDTH, SCREEN_HEIGHT - PANEL_HEIGHT),
+                             self.reader.width, self.reader.height, tile_size)
+        self.dragging = False
+        self.renderer = BoardRenderer(self.screen, self.engine.board, self.engine.countries, self.camera, FONT,
+                                      self.engine.move_offsets)
+
+    # 平移和缩放与游戏界面相同
+    handle_camera_event = Game.handle_camera_event
+
+    def seek(self, turn):
+        turn = min(max(0, turn), self.reader.last_turn)
+        self.engine, self.steps = self.reader.seek(turn, self.engine)
+        self.renderer.invalidate()
+        self.frame_dirty = True
+
+    def advance(self):
+        """播放下一步，录像结束时暂停"""
+        if next(self.steps, StopIteration) is StopIteration:
+            self.playing = False
+        self.frame_dirty = True
+
+    def draw(self):
+        top = self.renderer.panel_rect.top
+        engine = self.engine
+        state = "播放中" if self.playing else "暂停"
+        panel_items = [(LARGE_FONT, f"回放: 第{engine.turn_count}/{self.reader.last_turn}回合 {state}", CYAN, (20, top + 10))]
+        alive = sorted((country for country in engine.countries if not country.defeated),
+                       key=lambda country: -country.current_territory)
+        info = [f"{country.name}: {country.current_territory}领土 {country.get_troop_count()}兵力"
+                for country in alive[:PANEL_COUNTRIES]]
+        if info:
+            panel_items.append((SMALL_FONT, ", ".join(info[:3]), YELLOW, (20, top + 45)))
+        if len(info) > 3:
+            panel_items.append((SMALL_FONT, ", ".join(info[3:]), YELLOW, (20, top + 70)))
+        panel_items.append((SMALL_FONT, "空格 播放/暂停  ,/. 上/下一回合  PgUp/PgDn ±10回合", WHITE, (550, top + 10)))
+        if engine.winner:
+            panel_items.append((SMALL_FONT, f"{engine.winner.name}赢得了战争", engine.winner.color, (550, top + 35)))
+        return self.renderer.render(None, panel_items)
+
+    def handle_event(self, event):
+        if event.type == QUIT:
+            self.reader.close()
+            pygame.quit()
+            sys.exit()
+        elif self.handle_camera_event(event):
+            pass
+        elif event.type == KEYDOWN:
+            turn = self.engine.turn_count
+            if event.key == K_SPACE:
+                self.playing = not self.playing
+                self.next_time = pygame.time.get_ticks()
+                self.frame_dirty = True
+            elif event.key == K_PERIOD:
+                self.seek(turn + 1)
+            elif event.key == K_COMMA:
+                self.seek(turn - 1)
+            elif event.key == K_PAGEDOWN:
+                self.seek(turn + 10)
+            elif event.key == K_PAGEUP:
+                self.seek(turn - 10)
+            elif event.key == K_HOME:
+                self.seek(0)
+            elif event.key == K_END:
+                self.seek(self.reader.last_turn)
+        elif event.type in (VIDEOEXPOSE, WINDOWEXPOSED):
+            self.renderer.invalidate()
+            self.frame_dirty = True
+
+    def run(self):
+        pygame.event.set_blocked(MOUSEMOTION)
+        while True:
+            if self.playing and pygame.time.get_ticks() >= self.next_time:
+                self.advance()
+                self.next_time = pygame.time.get_ticks() + self.delay
+            if self.frame_dirty:
+                pygame.display.update(self.draw())
+                self.frame_dirty = False
+            timeout = max(1, self.next_time - pygame.time.get_ticks()) if self.playing else IDLE_TIMEOUT
+            event = pygame.event.wait(timeout)
+            if event.type != NOEVENT:
+                self.handle_event(event)
+            for event in pygame.event.get():
+                self.handle_event(event)
+
 if __name__ == "__main__":
-    game = Game()
-    game.run()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="war")
+    parser.add_argument("--poll", action="store_true", help="每秒固定重绘60帧（旧的轮询主循环）")
+    parser.add_argument("--ai-delay", type=int, default=AI_MOVE_DELAY,
+                        help="电脑每步行动的展示时间（毫秒），0表示立即完成；"
+                             "电脑国家多时缩短，使一个电脑回合的回放不超过%d毫秒" % AI_TURN_PLAYBACK)
+    parser.add_argument("--ai-workers", type=int, default=4, help="规划电脑行动的工作者数量，0表示在界面线程中规划")
+    parser.add_argument("--ai-pool", choices=["thread", "process"], default="thread", help="工作者类型，电脑国家很多时使用process以利用多核")
+    parser.add_argument("--width", type=int, default=GRID_WIDTH, help="地图宽度（格）")
+    parser.add_argument("--height", type=int, default=GRID_HEIGHT, help="地图高度（格）")
+    parser.add_argument("--countries", type=int, default=NUM_AI, help="电脑国家数量")
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE, help="初始格子像素大小，可用滚轮缩放")
+    parser.add_argument("--search-ms", type=int, default=0, help="搜索型电脑每步的思考时间（毫秒），越大越强，0表示贪心电脑")
+    parser.add_argument("--strategic", action="store_true", help="电脑按距离场把后方的士兵组移向空白领土和弱敌")
+    parser.add_argument("--simultaneous", action="store_true", help="同时行动：玩家和所有电脑针对同一个棋盘下达命令，一起结算")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子，相同的种子和相同的操作得到相同的对局")
+    parser.add_argument("--record", default=None, help="把对局录制到该文件（二进制录像）")
+    parser.add_argument("--replay", default=None, help="回放录像文件")
+    parser.add_argument("--save", default=SAVE_FILE, help="存档文件（F5保存、F9载入）")
+    parser.add_argument("--load", action="store_true", help="从存档继续上次的对局")
+    parser.add_argument("--profile", default=None, help="从开始统计各阶段耗时，退出时写入该文件（JSON）")
+    parser.add_argument("--cprofile", default=None, help="用cProfile运行，退出时把结果写入该文件（可用pstats或snakeviz查看）")
+    args = parser.parse_args()
+
+    if args.replay:
+        ReplayViewer(args.replay, tile_size=args.tile_size).run()
+
+    game = Game(event_driven=not args.poll, ai_delay=args.ai_delay,
+                ai_workers=args.ai_workers, ai_pool=args.ai_pool,
+                grid_width=args.width, grid_height=args.height,
+                num_ai=args.countries, tile_size=args.tile_size, search_ms=args.search_ms,
+                record=args.record, seed=args.seed, save_path=args.save, load=args.load,
+                profile=args.profile is not None, strategic=args.strategic,
+                simultaneous=args.simultaneous)
+    profile = None
+    if args.cprofile:
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+    try:
+        game.run()
+    finally:
+        if profile:
+            profile.disable()
+            profile.dump_stats(args.cprofile)
+        if args.profile:
+            game.profiler.dump(args.profile)
 """
 这是一个使用python库编写的战略游戏，规则如下：
 1.玩家控制一个属于自己的国家，而电脑控制数个国家，所有的国家之间都是敌对关系
@@ -0,0 +1,267 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from war_ai import DistanceFields
+from war_engine import WarEngine
+from war_env import VectorEnv
+
+# 性能基准：在默认25x15地图和放大的地图上测量War的热点路径
+#
+#   python bench.py --out bench.json                    # 运行并保存结果
+#   python bench.py --compare bench.json                # 与基准比较，退化时返回非零
+#   python bench.py --sizes 25x15,100x100 --repeat 50   # 只测部分地图
+#
+# 所有用例使用固定种子；绘制用例在离屏表面上进行（SDL dummy驱动），不需要显示器。
+
+# 地图尺寸 -> (电脑国家数量, 预热回合数)
+SIZES = {
+    "25x15": (5, 30),
+    "100x100": (20, 60),
+    "250x250": (50, 80),
+    "1000x1000": (200, 100),
+}
+
+def make_engine(width, height, countries, warmup, seed, with_player=True):
+    """按固定种子创建游戏并预热若干回合，使棋盘上有足够的领土和士兵"""
+    engine = WarEngine(width, height, num_ai=countries, with_player=with_player, seed=seed)
+    for _ in range(warmup):
+        engine.end_turn()
+    return engine
+
+def timed(func, *args):
+    start = time.perf_counter_ns()
+    func(*args)
+    return time.perf_counter_ns() - start
+
+def bench_ai_turn(engine, repeat):
+    return [timed(engine.ai_turn) for _ in range(repeat)]
+
+def bench_ai_move(engine, repeat):
+    samples = []
+    countries = [c for c in engine.countries if not c.is_player]
+    for i in range(repeat):
+        country = countries[i % len(countries)]
+        if country.defeated:
+            continue
+        move = engine.plan_ai_move(country)
+        if move:
+            samples.append(timed(engine.ai_move, country, *move))
+    return samples
+
+def bench_player_move(engine, repeat):
+    """玩家移动（不含电脑回合）；目标用贪心策略选择"""
+    samples = []
+    player = engine.player_country
+    while len(samples) < repeat:
+        if player.defeated:
+            # 玩家被消灭后重新开局（随机数序列仍由种子决定）
+            engine.restart_game()
+        move = engine.plan_ai_move(player)
+        if not move:
+            engine.ai_turn()
+            continue
+        samples.append(timed(engine.player_move, *move))
+    return samples
+
+def bench_apply_moves(engine, repeat):
+    """所有电脑国家的一批移动（贪心策略规划）一次执行"""
+    samples = []
+    for _ in range(repeat):
+        plans = engine.plan_ai_moves()
+        moves = [(cid,) + move for cid, move in plans.items() if move]
+        if not moves:
+            break
+        samples.append(timed(engine.apply_moves, moves))
+    return samples
+
+def bench_resolve_orders(engine, repeat):
+    """所有电脑国家的一批命令（贪心策略规划）同时结算"""
+    samples = []
+    for _ in range(repeat):
+        plans = engine.plan_ai_moves()
+        orders = [(cid,) + move for cid, move in plans.items() if move]
+        if not orders:
+            break
+        samples.append(timed(engine.resolve_orders, orders))
+    return samples
+
+def bench_resolve_battle(engine, repeat):
+    """玩家士兵组进攻随机敌方格子"""
+    samples = []
+    player = engine.player_country
+    enemies = [c for c in engine.countries if not c.is_player]
+    for i in range(repeat):
+        alive = [c for c in enemies if c.tiles]
+        if not alive:
+            break
+        country = alive[i % len(alive)]
+        x, y = min(country.tiles)
+        # 进攻方兵力在守军上下浮动，两种结果都会出现
+        count = max(1, int(engine.board.troop_count[y, x]) + (i % 3) - 1)
+        attackers = [engine.new_troop(x, y) for _ in range(count)]
+        samples.append(timed(engine.resolve_battle, player, x, y, attackers))
+    return samples
+
+def bench_add_territory(engine, repeat):
+    """强制达到奖励阈值，测量生成士兵组时的安全格子查找"""
+    samples = []
+    countries = [c for c in engine.countries if not c.defeated and c.troops]
+    for i in range(repeat):
+        country = countries[i % len(countries)]
+        country.next_reward = country.total_territory
+        samples.append(timed(country.add_territory, engine))
+    return samples
+
+def bench_distance_fields(engine, repeat):
+    """电脑共用的距离场（每个格子到最近目标和到另一个国家的最近目标的距离）从头计算一次"""
+    board = engine.board
+    return [timed(DistanceFields().refresh, board.owner, board.troop_count, board.hash) for _ in range(repeat)]
+
+def bench_vector_env(engine, repeat):
+    """批量环境的一步（受控国家随机走合法动作，含电脑回合），换算为每局一步的时间；对局数随地图变小而增加"""
+    games = max(1, min(1024, 2 ** 19 // (engine.grid_width * engine.grid_height)))
+    env = VectorEnv(games, engine.grid_width, engine.grid_height, num_ai=len(engine.countries) - 1, seed=engine.seed)
+    for _ in range(10):
+        env.step(env.sample_actions())
+    return [timed(env.step, env.sample_actions()) / games for _ in range(repeat)]
+
+def make_renderer(engine):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import pygame
+    from war_render import BoardRenderer, Camera
+
+    pygame.font.init()
+    # 与游戏窗口相同的1000x600视口，地图较小时放大格子以铺满视口
+    tile_size = max(4, min(40, 1000 // engine.grid_width))
+    screen = pygame.Surface((1000, 700))
+    camera = Camera((0, 0, 1000, 600), engine.grid_width, engine.grid_height, tile_size)
+    font = pygame.font.SysFont(None, 20)
+    return BoardRenderer(screen, engine.board, engine.countries, camera, font, engine.move_offsets)
+
+def panel_items(engine, renderer):
+    return [(renderer.font, f"回合: {engine.turn_count}", (255, 255, 255), (20, renderer.panel_rect.top + 10))]
+
+def bench_draw_full(engine, repeat):
+    renderer = make_renderer(engine)
+    samples = []
+    for _ in range(repeat):
+        renderer.invalidate()
+        samples.append(timed(renderer.render, None, panel_items(engine, renderer)))
+    return samples
+
+def bench_draw_incremental(engine, repeat):
+    """电脑回合之后的一帧（只重绘变化的格子）"""
+    renderer = make_renderer(engine)
+    renderer.render(None, panel_items(engine, renderer))
+    samples = []
+    for _ in range(repeat):
+        engine.ai_turn()
+        samples.append(timed(renderer.render, None, panel_items(engine, renderer)))
+    return samples
+
+def bench_draw_idle(engine, repeat):
+    """没有任何变化时的一帧"""
+    renderer = make_renderer(engine)
+    renderer.render(None, panel_items(engine, renderer))
+    return [timed(renderer.render, None, panel_items(engine, renderer)) for _ in range(repeat)]
+
+CASES = {
+    "ai_turn": bench_ai_turn,
+    "ai_move": bench_ai_move,
+    "player_move": bench_player_move,
+    "apply_moves": bench_apply_moves,
+    "resolve_orders": bench_resolve_orders,
+    "resolve_battle": bench_resolve_battle,
+    "add_territory": bench_add_territory,
+    "distance_fields": bench_distance_fields,
+    "vector_env_step": bench_vector_env,
+    "draw_grid_full": bench_draw_full,
+    "draw_grid_incremental": bench_draw_incremental,
+    "draw_grid_idle": bench_draw_idle,
+}
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "n": len(samples),
+        "median_us": statistics.median(samples) / 1000,
+        "mean_us": statistics.fmean(samples) / 1000,
+        "min_us": samples[0] / 1000,
+        "p90_us": samples[min(len(samples) - 1, int(len(samples) * 0.9))] / 1000,
+    }
+
+def run(sizes, cases, repeat, seed):
+    results = {}
+    for size in sizes:
+        width, height = map(int, size.split("x"))
+        countries, warmup = SIZES.get(size, (max(5, width * height // 5000), 50))
+        for name in cases:
+            # 每个用例都从相同种子的新棋盘开始，互不影响
+            engine = make_engine(width, height, countries, warmup, seed)
+            samples = CASES[name](engine, repeat)
+            if not samples:
+                continue
+            key = f"{size}/{name}"
+            results[key] = summarize(samples)
+            print(f"{key:35s} 中位数 {results[key]['median_us']:10.1f}us  (n={results[key]['n']})", file=sys.stderr)
+    return results
+
+def compare(results, baseline, threshold):
+    """与基准比较中位数，返回退化的用例列表"""
+    regressions = []
+    for key, result in sorted(results.items()):
+        base = baseline["results"].get(key)
+        if not base:
+            continue
+        ratio = result["median_us"] / base["median_us"] if base["median_us"] else float("inf")
+        flag = "退化" if ratio > 1 + threshold else ("提升" if ratio < 1 - threshold else "")
+        print(f"{key:35s} {base['median_us']:10.1f}us -> {result['median_us']:10.1f}us  x{ratio:5.2f} {flag}", file=sys.stderr)
+        if ratio > 1 + threshold:
+            regressions.append(key)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="War性能基准")
+    parser.add_argument("--sizes", default=",".join(SIZES), help="逗号分隔的地图尺寸，如25x15,100x100")
+    parser.add_argument("--cases", default=",".join(CASES), help="逗号分隔的用例名")
+    parser.add_argument("--repeat", type=int, default=30, help="每个用例的采样次数")
+    parser.add_argument("--seed", type=int, default=12345)
+    parser.add_argument("--out", help="结果JSON文件")
+    parser.add_argument("--compare", metavar="BASELINE", help="与保存的基准JSON比较")
+    parser.add_argument("--threshold", type=float, default=0.25, help="中位数变慢超过该比例视为退化")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes.split(","), args.cases.split(","), args.repeat, args.seed)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)}个用例退化: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from war_engine import WarEngine, COUNTRY_ELIMINATED
+from war_replay import ReplayWriter
+
+# 批量电脑自我对弈：用于调整平衡参数（奖励步长、移动距离、电脑国家数量）
+#
+#   python selfplay.py --games 10000 --workers 8 --reward-step 3 --move-range 2 --ai 5 > results.jsonl
+#
+# 每局结果以JSONL格式逐行输出，汇总（每秒对局数、胜率）输出到stderr。
+
+def play_game(config):
+    """以给定种子进行一局无界面的电脑对战，返回结果字典"""
+    seed = config["seed"]
+    engine = WarEngine(config["width"], config["height"], num_ai=config["ai"], with_player=False,
+                       reward_step=config["reward_step"], move_range=config["move_range"],
+                       search_time=config["search_ms"] / 1000, seed=seed, strategic=config["strategic"],
+                       simultaneous=config["simultaneous"])
+
+    # 统计层订阅引擎事件
+    eliminated = {}
+    engine.subscribe(COUNTRY_ELIMINATED, lambda country: eliminated.setdefault(country.name, engine.turn_count))
+    recorder = None
+    if config["replays"]:
+        recorder = ReplayWriter(os.path.join(config["replays"], f"game-{seed}.warr"), engine)
+
+    curve_every = config["curve_every"]
+    curves = {country.name: [country.current_territory] for country in engine.countries}
+    while not engine.game_over and engine.turn_count < config["max_turns"]:
+        engine.end_turn()
+        if engine.turn_count % curve_every == 0:
+            for country in engine.countries:
+                curves[country.name].append(country.current_territory)
+    if recorder:
+        recorder.close()
+
+    leader = max(engine.countries, key=lambda country: country.current_territory)
+    return {
+        "seed": seed,
+        "winner": engine.winner.name if engine.winner else None,
+        "leader": leader.name,
+        "turns": engine.turn_count,
+        "eliminated": eliminated,
+        "territory": curves,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量电脑自我对弈")
+    parser.add_argument("--games", type=int, default=1000, help="对局数")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="进程数")
+    parser.add_argument("--seed", type=int, default=0, help="第一局的随机种子，之后每局加1")
+    parser.add_argument("--width", type=int, default=25)
+    parser.add_argument("--height", type=int, default=15)
+    parser.add_argument("--ai", type=int, default=5, help="电脑国家数量")
+    parser.add_argument("--reward-step", type=int, default=3, help="每占领多少领土奖励一个士兵组")
+    parser.add_argument("--move-range", type=int, default=2, help="士兵组一次最多移动几格")
+    parser.add_argument("--search-ms", type=int, default=0, help="搜索型电脑每步的思考时间（毫秒），0表示贪心电脑")
+    parser.add_argument("--strategic", action="store_true", help="贪心电脑按距离场把后方的士兵组移向空白领土和弱敌")
+    parser.add_argument("--simultaneous", action="store_true", help="同时行动：所有电脑针对同一个棋盘下达命令，一起结算")
+    parser.add_argument("--max-turns", type=int, default=1000, help="超过该回合数未分胜负则记为平局")
+    parser.add_argument("--curve-every", type=int, default=10, help="领土曲线的采样间隔（回合）")
+    parser.add_argument("--out", default="-", help="JSONL输出文件，默认标准输出")
+    parser.add_argument("--replays", default=None, help="把每局录像写入该目录（game-种子.warr）")
+    args = parser.parse_args(argv)
+
+    base = {
+        "width": args.width, "height": args.height, "ai": args.ai,
+        "reward_step": args.reward_step, "move_range": args.move_range, "search_ms": args.search_ms,
+        "strategic": args.strategic, "simultaneous": args.simultaneous,
+        "max_turns": args.max_turns, "curve_every": args.curve_every, "replays": args.replays,
+    }
+    if args.replays:
+        os.makedirs(args.replays, exist_ok=True)
+    configs = [dict(base, seed=args.seed + i) for i in range(args.games)]
+
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    wins = {}
+    leaders = {}
+    draws = 0
+    total_turns = 0
+    start = time.perf_counter()
+    try:
+        with multiprocessing.Pool(args.workers) as pool:
+            chunksize = max(1, args.games // (args.workers * 16))
+            for result in pool.imap_unordered(play_game, configs, chunksize):
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                total_turns += result["turns"]
+                leaders[result["leader"]] = leaders.get(result["leader"], 0) + 1
+                if result["winner"] is None:
+                    draws += 1
+                else:
+                    wins[result["winner"]] = wins.get(result["winner"], 0) + 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    games = args.games
+    print(f"{games}局 用时{elapsed:.2f}秒 ({games / elapsed:.1f}局/秒, {total_turns / elapsed:.0f}回合/秒)", file=sys.stderr)
+    print(f"平局（{args.max_turns}回合未分胜负）: {draws}局 ({draws / games:.1%})", file=sys.stderr)
+    for name in sorted(set(wins) | set(leaders)):
+        print(f"{name}: 胜率 {wins.get(name, 0) / games:.1%}  领土领先 {leaders.get(name, 0) / games:.1%}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
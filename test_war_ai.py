@@ -0,0 +1,42 @@
+import numpy as np
+
+from war_ai import DistanceFields
+from war_board import EMPTY
+
+# 距离场：python -m pytest test_war_ai.py
+
+def brute_objective(owner, troop_count, cid):
+    """逐格计算到最近空白格子或最近的他国最弱士兵组的曼哈顿距离"""
+    height, width = owner.shape
+    targets = [tuple(tile) for tile in np.argwhere(owner == EMPTY)]
+    for other in set(owner[troop_count > 0].tolist()) - {cid}:
+        flat = np.flatnonzero(((owner == other) & (troop_count > 0)).ravel())
+        weakest = flat[np.lexsort((flat, troop_count.ravel()[flat]))[0]]
+        targets.append(divmod(int(weakest), width))
+    result = np.full(owner.shape, height + width)
+    for y in range(height):
+        for x in range(width):
+            for ty, tx in targets:
+                result[y, x] = min(result[y, x], abs(y - ty) + abs(x - tx))
+    return result
+
+def test_own_weak_stack_does_not_hide_enemy_weak_stack():
+    # 1x12的条带没有空白格子：国家0的最弱士兵组在x=0，国家1的在x=10
+    owner = np.array([[0] * 7 + [1] * 5], dtype=np.int16)
+    troop_count = np.array([[1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 2]], dtype=np.int32)
+    fields = DistanceFields().refresh(owner, troop_count, 1)
+    xs = np.arange(12)
+    objective = fields.objective(np.zeros(12, dtype=np.intp), xs, np.zeros(12, dtype=np.intp))
+    assert objective.tolist() == np.abs(xs - 10).tolist()
+
+def test_objective_matches_brute_force():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        height, width = rng.integers(1, 10, 2)
+        owner = rng.integers(-2, 4, (height, width)).astype(np.int16)
+        troop_count = np.where(owner >= 0, rng.integers(0, 4, (height, width)), 0).astype(np.int32)
+        fields = DistanceFields().refresh(owner, troop_count, 1)
+        ys, xs = np.mgrid[0:height, 0:width]
+        for cid in range(4):
+            objective = fields.objective(ys, xs, np.full(owner.shape, cid))
+            assert np.array_equal(objective, brute_objective(owner, troop_count, cid))
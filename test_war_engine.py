@@ -0,0 +1,89 @@
+import numpy as np
+
+from war_board import EMPTY
+from war_engine import MOVE_CAPTURED, MOVE_OCCUPIED, WarEngine
+from war_history import GameState
+
+# 同时行动模式的结算：python -m pytest test_war_engine.py
+
+def position(rows, **options):
+    """按字符画创建对局：每格为"."（空白）或"国家编号:士兵组数"，格子之间用空格分隔"""
+    cells = [row.split() for row in rows]
+    height, width = len(cells), len(cells[0])
+    owner = np.full((height, width), EMPTY, dtype=np.int16)
+    troop_count = np.zeros((height, width), dtype=np.int32)
+    for y, row in enumerate(cells):
+        for x, cell in enumerate(row):
+            if cell != ".":
+                cid, count = cell.split(":")
+                owner[y, x], troop_count[y, x] = int(cid), int(count)
+    num_countries = int(owner.max()) + 1
+    territory = np.bincount(owner[owner >= 0], minlength=num_countries)
+    countries = np.array([(t, t, 3, 0) for t in territory.tolist()], dtype=np.int64)
+    troop_ids = np.arange(int(troop_count.sum()), dtype=np.int64)
+    state = GameState(owner, troop_count, troop_ids, countries, len(troop_ids), 0, False, -1)
+    return WarEngine(width, height, num_ai=num_countries, with_player=False, state=state, seed=0,
+                     simultaneous=True, **options)
+
+def mirror(rows):
+    return rows[::-1]
+
+def mirror_order(order, height):
+    cid, from_x, from_y, to_x, to_y = order
+    return cid, from_x, height - 1 - from_y, to_x, height - 1 - to_y
+
+def resolve_both(rows, orders):
+    """在原局面和上下镜像的局面上结算同一批命令，返回两者的(结果, 引擎)"""
+    engine = position(rows)
+    mirrored = position(mirror(rows))
+    height = len(rows)
+    return ((engine.resolve_orders(orders), engine),
+            (mirrored.resolve_orders([mirror_order(order, height) for order in orders]), mirrored))
+
+def test_evacuated_country_survives_regardless_of_tile_order():
+    # 国家0把唯一的士兵组从(1, 2)移到(1, 1)，同时国家1进攻被撤离的(1, 2)
+    rows = [". . .",
+            ". . .",
+            ". 0:1 .",
+            ". 1:3 .",
+            ". . ."]
+    orders = [(0, 1, 2, 1, 1), (1, 1, 3, 1, 2)]
+    (results, engine), (mirrored_results, mirrored) = resolve_both(rows, orders)
+    assert results == mirrored_results == [MOVE_OCCUPIED, MOVE_CAPTURED]
+    for game in (engine, mirrored):
+        assert not game.countries[0].defeated
+        assert game.countries[0].current_territory == 1
+        assert game.countries[0].get_troop_count() == 1
+    assert np.array_equal(engine.board.owner, mirrored.board.owner[::-1])
+    assert np.array_equal(engine.board.troop_count, mirrored.board.troop_count[::-1])
+
+def test_country_losing_every_tile_is_eliminated_after_the_batch():
+    rows = [". 0:1 .",
+            ". 1:3 .",
+            ". . ."]
+    orders = [(1, 1, 1, 1, 0)]
+    (results, engine), (mirrored_results, mirrored) = resolve_both(rows, orders)
+    assert results == mirrored_results == [MOVE_CAPTURED]
+    for game in (engine, mirrored):
+        assert game.countries[0].defeated
+        assert game.countries[1].current_territory == 2
+
+def test_contested_tile_is_mirror_invariant():
+    # 三个国家同时进攻同一个空白格子：最强者减去第二强者后剩余
+    rows = [". 0:4 .",
+            "1:2 . 2:1",
+            ". . ."]
+    orders = [(0, 1, 0, 1, 1), (1, 0, 1, 1, 1), (2, 2, 1, 1, 1)]
+    (results, engine), (mirrored_results, mirrored) = resolve_both(rows, orders)
+    assert results == mirrored_results
+    assert engine.board.owner[1, 1] == 0 and engine.board.troop_count[1, 1] == 2
+    assert np.array_equal(engine.board.owner, mirrored.board.owner[::-1])
+    assert np.array_equal(engine.board.troop_count, mirrored.board.troop_count[::-1])
+
+def test_swapped_stacks_do_not_meet():
+    rows = [". 0:2 1:2 ."]
+    orders = [(0, 1, 0, 2, 0), (1, 2, 0, 1, 0)]
+    engine = position(rows)
+    assert engine.resolve_orders(orders) == [MOVE_CAPTURED, MOVE_CAPTURED]
+    assert engine.board.owner.tolist() == [[EMPTY, 1, 0, EMPTY]]
+    assert engine.board.troop_count.tolist() == [[0, 2, 2, 0]]
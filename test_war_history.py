@@ -0,0 +1,98 @@
+from war_engine import WarEngine
+from war_history import GameState
+
+# 撤销/重做和紧凑状态：python -m pytest test_war_history.py
+
+def snapshot(engine):
+    """比较用的完整状态：棋盘、每格的士兵组id、各国家的计数器和索引、引擎计数器"""
+    board = engine.board
+    assert board.hash == board.compute_hash()
+    countries = tuple((c.current_territory, c.total_territory, c.next_reward, c.defeated,
+                       tuple(sorted(c.troops)), frozenset(c.tiles), frozenset(c.frontier),
+                       frozenset(c.safe)) for c in engine.countries)
+    tiles = tuple((pos, tuple(troop.id for troop in troops)) for pos, troops in sorted(board.tile_troops.items()))
+    for (x, y), troops in board.tile_troops.items():
+        assert all((troop.x, troop.y) == (x, y) for troop in troops)
+    return (board.hash, board.owner.tobytes(), board.troop_count.tobytes(), tiles, countries,
+            engine.next_troop_id, engine.turn_count, engine.game_over, engine.winner)
+
+def play(engine, turns):
+    for _ in range(turns):
+        if engine.game_over:
+            break
+        engine.end_turn()
+
+def test_undo_to_start_and_redo_to_end():
+    engine = WarEngine(25, 15, with_player=False, seed=5)
+    engine.track_history()
+    start = snapshot(engine)
+    play(engine, 60)
+    end = snapshot(engine)
+
+    steps = 0
+    while engine.undo() is not None:
+        steps += 1
+    assert steps > 60
+    assert snapshot(engine) == start
+
+    while engine.redo() is not None:
+        steps -= 1
+    assert steps == 0
+    assert snapshot(engine) == end
+
+def test_undo_turn_by_turn():
+    # 每回合的步为各电脑的移动，最后是回合结算（行动者为None）
+    engine = WarEngine(12, 10, num_ai=6, with_player=False, seed=11)
+    engine.track_history()
+    states = [snapshot(engine)]
+    for _ in range(40):
+        engine.end_turn()
+        states.append(snapshot(engine))
+    for expected in reversed(states[:-1]):
+        assert engine.undo().actor is None
+        while engine.history.done and engine.history.done[-1].actor is not None:
+            engine.undo()
+        assert snapshot(engine) == expected
+
+def test_new_step_after_undo_discards_redo():
+    engine = WarEngine(25, 15, with_player=False, seed=2)
+    engine.track_history()
+    play(engine, 10)
+    engine.undo()
+    engine.undo()
+    assert engine.history.undone
+    engine.end_turn()
+    assert not engine.history.undone
+    assert engine.redo() is None
+
+def test_history_limit():
+    engine = WarEngine(25, 15, with_player=False, seed=3)
+    engine.track_history(limit=5)
+    play(engine, 20)
+    assert len(engine.history.done) == 5
+    undone = 0
+    while engine.undo() is not None:
+        undone += 1
+    assert undone == 5
+
+def test_saved_state_loads_into_the_same_game():
+    engine = WarEngine(25, 15, with_player=False, seed=4)
+    play(engine, 30)
+    state = engine.save_state()
+    expected = snapshot(engine)
+    play(engine, 30)
+    engine.load_state(state)
+    assert snapshot(engine) == expected
+    # 只读的状态可以载入多次
+    engine.load_state(state)
+    assert snapshot(engine) == expected
+    assert isinstance(state, GameState) and state.nbytes() > 0
+
+def test_fork_is_independent_and_identical():
+    engine = WarEngine(25, 15, with_player=False, seed=6)
+    play(engine, 20)
+    clone = engine.fork()
+    assert snapshot(clone) == snapshot(engine)
+    play(engine, 30)
+    play(clone, 30)
+    assert snapshot(clone) == snapshot(engine)
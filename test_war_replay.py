@@ -0,0 +1,90 @@
+import random
+
+from test_war_history import snapshot
+from war_engine import WarEngine
+from war_replay import ReplayReader, ReplayWriter
+
+# 录像：python -m pytest test_war_replay.py
+
+def record(path, seed, turns, undo_every=None):
+    """录制一局有玩家的对局，返回(引擎, 录像写入器, {回合数: 该回合开始时的状态})
+
+    undo_every给出时每进行这么多回合撤销一到三个完整回合（与界面的撤销相同），之后的时间线从撤销处接续。
+    """
+    rng = random.Random(seed)
+    engine = WarEngine(25, 15, seed=seed)
+    if undo_every:
+        engine.track_history()
+    writer = ReplayWriter(path, engine, keyframe_interval=7)
+    player = engine.player_country
+    timeline = {0: snapshot(engine)}
+    played = 0
+    while not engine.game_over and engine.turn_count < turns:
+        stacks = sorted(tile for tile in player.tiles if engine.board.troop_count[tile[1], tile[0]])
+        if stacks:
+            x, y = rng.choice(stacks)
+            dx, dy = rng.choice(engine.move_offsets)
+            if engine.board.in_bounds(x + dx, y + dy):
+                engine.player_move(x, y, x + dx, y + dy)
+        engine.end_turn()
+        timeline[engine.turn_count] = snapshot(engine)
+        played += 1
+        if undo_every and played % undo_every == 0:
+            for _ in range(rng.randint(1, 3)):
+                while True:
+                    delta = engine.undo()
+                    if delta is None or delta.actor == player.cid:
+                        break
+            timeline = {turn: state for turn, state in timeline.items() if turn <= engine.turn_count}
+            assert timeline[engine.turn_count] == snapshot(engine)
+    return engine, writer, timeline
+
+def check_seek(path, timeline, final):
+    reader = ReplayReader(path)
+    try:
+        for turn in sorted(timeline):
+            engine, _ = reader.seek(turn)
+            assert engine.turn_count == turn
+            assert snapshot(engine) == timeline[turn]
+        # 从头顺序回放到结束
+        engine, steps = reader.seek(0)
+        for _ in steps:
+            pass
+        assert snapshot(engine) == final
+    finally:
+        reader.close()
+
+def test_seek_matches_live_board_every_turn(tmp_path):
+    path = str(tmp_path / "game.warr")
+    engine, writer, timeline = record(path, seed=1, turns=80)
+    # 正在录制（没有关键帧索引，打开时扫描记录头）和正常关闭后都应一致
+    check_seek(path, timeline, snapshot(engine))
+    writer.close()
+    check_seek(path, timeline, snapshot(engine))
+    reader = ReplayReader(path)
+    assert reader.seed == 1 and reader.last_turn == engine.turn_count
+    assert len(reader.index) > engine.turn_count // 7
+    reader.close()
+
+def test_seek_after_undo(tmp_path):
+    path = str(tmp_path / "game.warr")
+    engine, writer, timeline = record(path, seed=2, turns=80, undo_every=11)
+    writer.close()
+    check_seek(path, timeline, snapshot(engine))
+
+def test_truncated_replay_is_readable(tmp_path):
+    path = str(tmp_path / "game.warr")
+    engine, writer, timeline = record(path, seed=3, turns=40)
+    writer.close()
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        # 去掉关键帧索引和最后一条记录的一部分
+        f.write(data[:len(data) - 200])
+    reader = ReplayReader(path)
+    try:
+        for turn in range(0, reader.last_turn):
+            engine, _ = reader.seek(turn)
+            assert snapshot(engine) == timeline[turn]
+    finally:
+        reader.close()
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from war_engine import WarEngine
+from war_save import load_game, mapped_file, save_game
+
+# 存档：python -m pytest test_war_save.py
+
+def play(engine, turns):
+    """推进turns回合，返回每回合结束时的棋盘哈希"""
+    hashes = []
+    for _ in range(turns):
+        engine.end_turn()
+        hashes.append(engine.board.hash)
+    return hashes
+
+def test_loaded_game_continues_identically(tmp_path):
+    path = str(tmp_path / "game.wars")
+    engine = WarEngine(30, 20, with_player=False, seed=7)
+    play(engine, 40)
+    save_game(engine, path)
+    loaded = load_game(path)
+    assert loaded.board.hash == engine.board.hash == loaded.board.compute_hash()
+    assert (loaded.seed, loaded.turn_count, loaded.next_troop_id) == (engine.seed, engine.turn_count,
+                                                                      engine.next_troop_id)
+    assert play(loaded, 60) == play(engine, 60)
+    assert np.array_equal(loaded.board.owner, engine.board.owner)
+    assert np.array_equal(loaded.board.troop_count, engine.board.troop_count)
+    assert [sorted(c.troops) for c in loaded.countries] == [sorted(c.troops) for c in engine.countries]
+
+def test_loading_into_existing_engine(tmp_path):
+    path = str(tmp_path / "game.wars")
+    engine = WarEngine(25, 15, seed=3)
+    play(engine, 20)
+    save_game(engine, path)
+    other = WarEngine(25, 15, seed=99)
+    load_game(path, other)
+    assert play(other, 30) == play(engine, 30)
+
+def test_saving_over_the_mapped_file_releases_the_mapping(tmp_path):
+    path = str(tmp_path / "game.wars")
+    engine = WarEngine(25, 15, with_player=False, seed=1)
+    save_game(engine, path)
+    loaded = load_game(path)
+    assert mapped_file(loaded.board.owner) is not None
+    play(loaded, 5)
+    save_game(loaded, path)
+    assert mapped_file(loaded.board.owner) is None and mapped_file(loaded.board.troop_count) is None
+    reloaded = load_game(path)
+    assert reloaded.board.hash == loaded.board.hash
+    assert play(reloaded, 20) == play(loaded, 20)
+
+@pytest.mark.parametrize("keep", [0, 10, 100, -1])
+def test_truncated_save_raises_value_error(tmp_path, keep):
+    path = str(tmp_path / "game.wars")
+    save_game(WarEngine(25, 15, seed=2), path)
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:keep])
+    with pytest.raises(ValueError):
+        load_game(path)
+
+def test_other_file_raises_value_error(tmp_path):
+    path = tmp_path / "not_a_save.wars"
+    path.write_bytes(b"x" * 4096)
+    with pytest.raises(ValueError):
+        load_game(str(path))
@@ -0,0 +1,25 @@
+from war_engine import WarEngine
+from war_search import EXACT, SearchAI, TranspositionTable
+
+# 搜索型电脑：python -m pytest test_war_search.py
+
+def test_entries_from_earlier_searches_are_not_returned():
+    table = TranspositionTable(16)
+    table.new_search()
+    table.store(5, 3, 1.5, EXACT, None)
+    assert table.probe(5) is not None
+    table.new_search()
+    assert table.probe(5) is None
+    # 旧条目可以被任意深度的新条目替换
+    table.store(5, 1, -2.0, EXACT, None)
+    assert table.probe(5)[1:3] == (1, -2.0)
+
+def test_shared_table_matches_fresh_table():
+    # 固定深度（不限时间）时，共用的置换表与每次新建的置换表选出相同的移动
+    shared = SearchAI(float("inf"), 3)
+    engine = WarEngine(with_player=False, seed=4)
+    for _ in range(8):
+        for country in engine.countries:
+            if not country.defeated:
+                assert shared.choose(engine, country) == SearchAI(float("inf"), 3).choose(engine, country)
+        engine.end_turn()
@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+
+import numpy as np
+import pytest
+
+import war_client
+from war_client import WarClient
+from war_engine import WarEngine
+from war_server import WarServer, encode
+
+# 多人对战服务器（本机脚本客户端）：python -m pytest test_war_server.py
+
+async def start_server(simultaneous=False, turn_timeout=0.02):
+    engine = WarEngine(20, 12, num_ai=4, with_player=False, seed=3, simultaneous=simultaneous)
+    server = WarServer(engine, turn_timeout)
+    listener = await server.start("127.0.0.1", 0)
+    return engine, server, listener.sockets[0].getsockname()[1]
+
+async def drain(client):
+    """读取已经发送的所有消息"""
+    while True:
+        try:
+            if await asyncio.wait_for(client.recv(), 0.2) is None:
+                return
+        except asyncio.TimeoutError:
+            return
+
+@pytest.mark.parametrize("simultaneous", [False, True])
+def test_connection_joins_after_turns_have_passed(simultaneous):
+    async def scenario():
+        engine, server, port = await start_server(simultaneous)
+        client = WarClient()
+        await client.connect(port=port)
+        # 连接后还没有加入或观战：几个回合过去，不应收到任何广播
+        while engine.turn_count < 5:
+            await asyncio.sleep(0.02)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.reader.readline(), 0.1)
+
+        await client.send({"type": "join"})
+        while client.elapsed < 5:
+            message = await client.recv()
+            if client.seat is not None and message["type"] == "update" and client.turn not in (None, 0):
+                moves = client.legal_moves()
+                if moves:
+                    x0, y0, x1, y1 = moves[0]
+                    await client.send({"type": "move", "from": [x0, y0], "to": [x1, y1]})
+        # 停止推进回合后读取剩余的消息，副本应与服务器的棋盘一致
+        server.task.cancel()
+        await asyncio.gather(server.task, return_exceptions=True)
+        await drain(client)
+        assert client.seat is not None
+        assert np.array_equal(client.owner, engine.board.owner)
+        assert np.array_equal(client.troops, engine.board.troop_count)
+        await client.close()
+        await server.close()
+    asyncio.run(scenario())
+
+def test_update_before_state_is_ignored():
+    async def scenario():
+        client = WarClient()
+        client.reader = asyncio.StreamReader()
+        engine = WarEngine(6, 5, num_ai=2, with_player=False, seed=1)
+        server = WarServer(engine)
+        client.reader.feed_data(encode({"type": "update", "turn": 3, "tiles": [[0, 0, 1, 2]], "countries": [],
+                                        "game_over": False, "winner": None}))
+        client.reader.feed_data(encode(server.state_message(None)))
+        assert (await client.recv())["type"] == "update"
+        assert client.owner is None and client.legal_moves() == []
+        assert (await client.recv())["type"] == "state"
+        assert np.array_equal(client.owner, engine.board.owner)
+    asyncio.run(scenario())
+
+@pytest.mark.parametrize("simultaneous", [False, True])
+def test_scripted_bots_and_spectators_stay_consistent(simultaneous):
+    async def scenario():
+        _, server, port = await start_server(simultaneous)
+        # 所有连接先建立，再依次加入或观战
+        args = argparse.Namespace(host="127.0.0.1", port=port, unix=None, bots=3, spectators=30, turns=8, seed=1)
+        same = await war_client.run(args)
+        await server.close()
+        return same
+    assert asyncio.run(scenario())
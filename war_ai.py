@@ -0,0 +1,272 @@
+import random
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from war_board import EMPTY
+
+def move_offsets(move_range=2):
+    """士兵组可移动的方向：水平或垂直1到move_range格"""
+    offsets = []
+    for d in range(1, move_range + 1):
+        offsets += [(0, -d), (0, d), (-d, 0), (d, 0)]
+    return offsets
+
+# 电脑可移动的方向（默认1-2格距离）
+AI_TARGETS = move_offsets(2)
+
+def evaluate_moves(owner, troop_count, sources, offsets=AI_TARGETS):
+    """批量评估候选出发格子的所有移动方向（平移数组运算，不逐格循环）
+
+    sources为(n, 2)的出发格子坐标数组，返回(n, 方向数)的布尔掩码：
+    目标在棋盘内，出发格子有士兵，且目标为空白格子或实力不强于自己的敌方格子。
+    只读取owner/troop_count数组，既可用于实时棋盘也可用于快照。
+    """
+    height, width = owner.shape
+    deltas = np.asarray(offsets, dtype=np.intp)
+    sx = sources[:, 0:1]
+    sy = sources[:, 1:2]
+    tx = sx + deltas[:, 0]
+    ty = sy + deltas[:, 1]
+    inside = (tx >= 0) & (tx < width) & (ty >= 0) & (ty < height)
+    # 越界的目标先截断到棋盘内读取，再由inside排除
+    tx = tx.clip(0, width - 1)
+    ty = ty.clip(0, height - 1)
+    src_owner = owner[sy, sx]
+    src_count = troop_count[sy, sx]
+    dst_owner = owner[ty, tx]
+    dst_count = troop_count[ty, tx]
+    return inside & (src_owner >= 0) & (src_count > 0) & (
+        (dst_owner == EMPTY) | ((dst_owner >= 0) & (dst_owner != src_owner) & (src_count >= dst_count)))
+
+def greedy_moves(owner, troop_count, sources, counts, rngs, offsets=AI_TARGETS):
+    """电脑的贪心策略：每个国家随机选一个有可行目标的出发格子，再随机选一个可行目标
+
+    sources为所有国家的候选出发格子按国家依次拼接的(n, 2)数组，counts为每个国家的格子数，
+    rngs为每个国家使用的随机数生成器。所有国家的候选移动在一次evaluate_moves中评估，
+    之后每个国家只需在掩码中挑选。与逐个打乱出发格子和目标、取第一个可行移动的写法结果分布相同。
+    返回与counts对应的[(from_x, from_y, to_x, to_y)或None]。
+    """
+    if not len(sources):
+        return [None] * len(counts)
+    viable = evaluate_moves(owner, troop_count, sources, offsets)
+    # 每个出发格子的可行方向压缩为一个整数，每个国家的可行出发格子在candidates中连续排列
+    bits = viable.astype(np.int64) @ (1 << np.arange(len(offsets), dtype=np.int64))
+    candidates = np.flatnonzero(bits)
+    ends = np.cumsum(counts)
+    bounds = np.searchsorted(candidates, np.concatenate(([0], ends))).tolist()
+    candidates = candidates.tolist()
+
+    moves = []
+    for i, rng in enumerate(rngs):
+        first, last = bounds[i], bounds[i + 1]
+        if first == last:
+            moves.append(None)
+            continue
+        row = candidates[first + rng.randrange(last - first)]
+        mask = int(bits[row])
+        targets = [k for k in range(len(offsets)) if mask >> k & 1]
+        dx, dy = offsets[targets[rng.randrange(len(targets))]]
+        x, y = int(sources[row, 0]), int(sources[row, 1])
+        moves.append((x, y, x + dx, y + dy))
+    return moves
+
+def _scan(keys, scale=1):
+    """沿第0轴的前向和后向最小值累积：返回每个位置min_j(g[j] + |i - j|)的编码（距离 * scale + 标签）"""
+    index = np.arange(keys.shape[0], dtype=keys.dtype)[:, None] * scale
+    forward = np.minimum.accumulate(keys - index, axis=0)
+    forward += index
+    backward = np.minimum.accumulate((keys + index)[::-1], axis=0)[::-1]
+    backward -= index
+    return np.minimum(forward, backward, out=forward)
+
+def _transform(keys, scale=1):
+    """按列、再按行扫描，得到每个格子的min_j(g[j] + 到j的曼哈顿距离)"""
+    return np.ascontiguousarray(_scan(np.ascontiguousarray(_scan(keys, scale).T), scale).T)
+
+def nearest_two(labels):
+    """多源BFS距离场：每个格子到最近的源格子的距离和标签，以及到标签与之不同的最近源格子的距离
+
+    labels中非负值为源格子的标签，-1为其他格子。格子之间没有障碍，BFS步数即曼哈顿距离，
+    可以按列、按行分别做前向和后向的最小值累积求出，整个棋盘只需几次数组运算，没有逐格或逐层的循环；
+    距离和标签编码在同一个整数中一起比较（距离相等时取较小的标签）。
+    从格子走到标签不同的最近源格子，途中第一次走出自己标签的区域时经过一对标签不同的相邻格子(v, u)，
+    而任何这样的一对都满足：u的距离+1+到v的距离不小于到标签不同的最近源格子的距离。
+    因此以各格子相邻的异标签格子的距离+1为初值再做一次距离变换就得到第二个距离，
+    与源格子的数量和标签数都无关。没有对应的源格子时距离为高+宽、标签为-1。
+    """
+    height, width = labels.shape
+    far = height + width
+    scale = int(labels.max(initial=0)) + 1
+    dtype = np.int32 if (2 * far + 1) * scale < 2 ** 31 else np.int64
+    keys = _transform(np.where(labels >= 0, labels, far * scale).astype(dtype), scale)
+    nearest = np.minimum(keys // scale, far)
+    label = np.where(nearest < far, keys % scale, -1)
+    step = nearest + 1
+    seeds = np.full(labels.shape, far, dtype=dtype)
+    for head, tail in (((slice(-1),), (slice(1, None),)), ((slice(None), slice(-1)), (slice(None), slice(1, None)))):
+        border = label[head] != label[tail]
+        np.minimum(seeds[head], np.where(border, step[tail], far), out=seeds[head])
+        np.minimum(seeds[tail], np.where(border, step[head], far), out=seeds[tail])
+    return nearest, label, np.minimum(_transform(seeds), far)
+
+def weakest_stacks(owner, troop_count):
+    """每个国家士兵组数最少的有士兵格子（数量相同时取行优先的第一个），返回(国家编号, xs, ys)数组"""
+    flat = np.flatnonzero((owner.ravel() >= 0) & (troop_count.ravel() > 0))
+    owners = owner.ravel()[flat]
+    order = np.lexsort((flat, troop_count.ravel()[flat], owners))
+    _, first = np.unique(owners[order], return_index=True)
+    weakest = flat[order[first]]
+    return owners[order[first]], weakest % owner.shape[1], weakest // owner.shape[1]
+
+class DistanceFields:
+    """电脑国家共用的距离场：每个格子到最近的目标和到另一个国家的最近目标的距离
+
+    目标为空白格子和各国的最弱士兵组，空白格子作为一个单独的标签，用nearest_two一次求出。
+    在电脑回合开始时计算一次，所有电脑国家共用；
+    同一回合内重新规划时沿用回合开始时的距离场，棋盘哈希未变时（例如撤销后回到同一局面）直接复用。
+    最近的目标是查询的国家自己的最弱士兵组时改用第二个距离，因此每次查询都是常数时间，与国家数无关。
+    refresh只替换数组而不原地修改，复制的对象（见WarEngine.fork）互不影响。
+    """
+    __slots__ = ('hash', 'nearest', 'nearest_owner', 'other', 'far')
+
+    def __init__(self):
+        self.hash = None
+        self.nearest = self.nearest_owner = self.other = None
+        self.far = 0
+
+    def refresh(self, owner, troop_count, board_hash):
+        if board_hash == self.hash:
+            return self
+        self.hash = board_hash
+        self.far = owner.shape[0] + owner.shape[1]
+        # 标签为国家编号+1，空白格子为0，求出后减1还原为国家编号（空白格子为EMPTY）
+        labels = np.where(owner == EMPTY, 0, -1).astype(np.int32)
+        owners, xs, ys = weakest_stacks(owner, troop_count)
+        labels[ys, xs] = owners + 1
+        self.nearest, label, self.other = nearest_two(labels)
+        self.nearest_owner = label - 1
+        return self
+
+    def objective(self, ys, xs, cids):
+        """格子(xs, ys)对国家cids的目标距离：到最近空白格子或最近的他国最弱士兵组的距离"""
+        return np.where(self.nearest_owner[ys, xs] != cids, self.nearest[ys, xs], self.other[ys, xs])
+
+def strategic_moves(owner, troop_count, sources, counts, cids, rngs, fields, offsets=AI_TARGETS):
+    """按距离场规划的电脑策略：能占领或进攻时与贪心策略相同，否则把士兵组移向目标
+
+    sources为每个国家所有有士兵的格子（不只是边境），其余参数同greedy_moves，cids为每个国家的编号。
+    可行的占领和进攻得分为0；移到己方格子且目标距离（见DistanceFields.objective）缩短的移动得分为移动后的距离。
+    每个国家在得分最低的移动中随机选一个，因此远离前线的士兵组会在几回合内逐步向空白领土或弱敌集结。
+    """
+    if not len(sources):
+        return [None] * len(counts)
+    height, width = owner.shape
+    deltas = np.asarray(offsets, dtype=np.intp)
+    sx = sources[:, 0:1]
+    sy = sources[:, 1:2]
+    tx = (sx + deltas[:, 0]).clip(0, width - 1)
+    ty = (sy + deltas[:, 1]).clip(0, height - 1)
+    inside = (sx + deltas[:, 0] == tx) & (sy + deltas[:, 1] == ty)
+    src_cid = np.repeat(np.asarray(cids, dtype=owner.dtype), counts)[:, None]
+
+    attack = evaluate_moves(owner, troop_count, sources, offsets)
+    here = fields.objective(sy, sx, src_cid)
+    there = fields.objective(ty, tx, src_cid)
+    advance = inside & (owner[ty, tx] == src_cid) & (there < here) & (troop_count[sy, sx] > 0)
+    score = np.where(attack, 0, np.where(advance, there, fields.far + 1))
+
+    ends = np.cumsum(counts).tolist()
+    moves = []
+    first = 0
+    for i, rng in enumerate(rngs):
+        last = ends[i]
+        block = score[first:last]
+        best = block.min(initial=fields.far + 1)
+        if best > fields.far:
+            moves.append(None)
+        else:
+            rows, cols = np.nonzero(block == best)
+            k = rng.randrange(len(rows))
+            row = first + int(rows[k])
+            dx, dy = offsets[int(cols[k])]
+            x, y = int(sources[row, 0]), int(sources[row, 1])
+            moves.append((x, y, x + dx, y + dy))
+        first = last
+    return moves
+
+def plan_moves(snapshot, cids, sources, counts, seeds, offsets=AI_TARGETS, fields=None):
+    """在棋盘快照上为一批电脑国家规划移动（在线程或进程池中运行）
+
+    sources/counts的含义同greedy_moves，每个国家使用各自种子的随机数生成器；
+    给出fields（DistanceFields）时使用strategic_moves。
+    返回[(国家编号, 移动或None)]
+    """
+    rngs = [random.Random(seed) for seed in seeds]
+    if fields is not None:
+        return list(zip(cids, strategic_moves(snapshot.owner, snapshot.troop_count, sources, counts, cids, rngs,
+                                              fields, offsets)))
+    return list(zip(cids, greedy_moves(snapshot.owner, snapshot.troop_count, sources, counts, rngs, offsets)))
+
+class PlannedTurn:
+    """一次电脑回合的规划结果，规划在池中异步完成"""
+
+    def __init__(self, futures):
+        self.futures = futures
+
+    def done(self):
+        return all(future.done() for future in self.futures)
+
+    def add_done_callback(self, callback):
+        """全部规划完成后调用callback()（在工作线程中调用）"""
+        remaining = [len(self.futures)]
+
+        def on_done(_):
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                callback()
+
+        for future in self.futures:
+            future.add_done_callback(on_done)
+
+    def plans(self):
+        """等待并返回{国家编号: 移动或None}"""
+        result = {}
+        for future in self.futures:
+            result.update(future.result())
+        return result
+
+class AIPlanner:
+    """用线程池或进程池并行规划所有电脑国家的移动
+
+    所有国家针对同一个不可变的棋盘快照规划，结果由主线程按国家顺序应用，
+    应用时已失效的移动会在实时棋盘上重新规划（见WarEngine.ai_turn_steps）。
+    """
+
+    def __init__(self, workers=4, kind="thread"):
+        self.workers = max(1, workers)
+        if kind == "process":
+            self.executor = ProcessPoolExecutor(self.workers)
+        else:
+            self.executor = ThreadPoolExecutor(self.workers)
+
+    def submit(self, engine):
+        snapshot = engine.board.snapshot()
+        countries = [country for country in engine.countries if not country.is_player and not country.defeated]
+        fields = engine.refresh_fields()
+        sources, counts = engine.ai_sources(countries, all_stacks=fields is not None)
+        cids = [country.cid for country in countries]
+        seeds = [engine.rng.getrandbits(32) for _ in countries]
+
+        # 每个工作者处理一批国家，快照只需传递一次
+        chunk = -(-len(countries) // self.workers) if countries else 1
+        starts = np.concatenate(([0], np.cumsum(counts))).tolist()
+        futures = []
+        for i in range(0, len(countries), chunk):
+            j = min(i + chunk, len(countries))
+            futures.append(self.executor.submit(plan_moves, snapshot, cids[i:j], sources[starts[i]:starts[j]],
+                                                counts[i:j], seeds[i:j], engine.move_offsets, fields))
+        return PlannedTurn(futures)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
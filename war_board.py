@@ -0,0 +1,333 @@
+import numpy as np
+
+# 格子归属的特殊值（非负值为国家编号，即在countries列表中的下标）
+EMPTY = -1    # 从未被占领的空白格子
+NEUTRAL = -2  # 中立领土（所属国家被消灭或守军全灭）
+
+NEIGHBOURS = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+
+class IndexedSet:
+    """支持O(1)插入、删除和均匀随机抽样的集合（用于安全格子索引）
+
+    元素保存在列表中，另有元素到下标的字典；删除时用最后一个元素填补空位。
+    迭代和抽样的顺序由插入和删除的历史决定，GameState保存该顺序，使分叉和载入后的随机结果不变。
+    """
+    __slots__ = ('items', 'index')
+
+    def __init__(self, items=()):
+        self.items = list(items)
+        self.index = {item: i for i, item in enumerate(self.items)}
+
+    def add(self, item):
+        if item not in self.index:
+            self.index[item] = len(self.items)
+            self.items.append(item)
+
+    def discard(self, item):
+        i = self.index.pop(item, None)
+        if i is None:
+            return
+        last = self.items.pop()
+        if i < len(self.items):
+            self.items[i] = last
+            self.index[last] = i
+
+    def clear(self):
+        self.items.clear()
+        self.index.clear()
+
+    def choice(self, rng):
+        """均匀随机选择一个元素（与rng.choice(列表)消耗相同的随机数）"""
+        return self.items[rng.randrange(len(self.items))]
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def __iter__(self):
+        return iter(self.items)
+
+# Zobrist哈希：每个(格子, 归属)和(格子, 兵力)对应一个64位随机键，棋盘哈希为所有键的异或。
+# 键由splitmix64即时计算，不需要随地图大小增长的键表；空白格子和0兵力的键为0，空棋盘的哈希为0。
+MASK64 = (1 << 64) - 1
+OWNER_SALT = 0x5851F42D4C957F2D
+COUNT_SALT = 0x14057B7EF767814F
+
+def splitmix64(value):
+    z = (value + 0x9E3779B97F4A7C15) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+def owner_key(index, owner):
+    """格子index（y * width + x）归属为owner时的哈希键"""
+    if owner == EMPTY:
+        return 0
+    return splitmix64(((index << 16) | (owner + 2)) ^ OWNER_SALT)
+
+def count_key(index, count):
+    """格子index上有count个士兵组时的哈希键"""
+    if not count:
+        return 0
+    return splitmix64(((index << 32) | count) ^ COUNT_SALT)
+
+def splitmix64_array(values):
+    """对uint64数组逐个计算splitmix64（无符号运算自动按2^64取模）"""
+    z = values + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+# 载入后延迟重建的属性（见Board.load）
+LAZY_BOARD_FIELDS = ('tile_troops',)
+LAZY_COUNTRY_FIELDS = ('tiles', 'frontier', 'safe', 'troops')
+
+class BoardSnapshot:
+    """棋盘的不可变快照（只读的数组副本），可以安全地交给其他线程或进程"""
+    __slots__ = ('owner', 'troop_count', 'hash')
+
+    def __init__(self, owner, troop_count, board_hash=0):
+        owner.flags.writeable = False
+        troop_count.flags.writeable = False
+        self.owner = owner
+        self.troop_count = troop_count
+        self.hash = board_hash
+
+class Board:
+    """用NumPy数组保存的棋盘：归属数组 + 士兵组数量数组"""
+
+    rebuild = None  # 载入后待调用的索引重建函数，见load
+
+    def __init__(self, width, height, countries=()):
+        self.width = width
+        self.height = height
+        # 国家列表（下标即归属编号），用于维护每个国家的领土索引
+        self.countries = countries
+        self.owner = np.full((height, width), EMPTY, dtype=np.int16)
+        self.troop_count = np.zeros((height, width), dtype=np.int32)
+        # 每个格子上的士兵组列表，只保存有士兵的格子
+        self.tile_troops = {}
+        # 归属和兵力的Zobrist哈希，随每次修改增量更新
+        self.hash = 0
+        # 自上次绘制以来发生变化的格子；为None时不记录（无界面运行）
+        self.dirty = None
+        # 走子记录（war_history.MoveLog），在修改格子前通知；为None时不记录
+        self.journal = None
+
+    def track_dirty(self):
+        """开始记录发生变化的格子，供渲染器增量重绘"""
+        if self.dirty is None:
+            self.dirty = set()
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def set_owner(self, x, y, owner):
+        """修改格子归属，并增量更新受影响国家的领土、边境和安全格子索引"""
+        old = int(self.owner[y, x])
+        if old == owner:
+            return
+        if self.journal is not None:
+            self.journal.touch(x, y, owner)
+        index = y * self.width + x
+        self.hash ^= owner_key(index, old) ^ owner_key(index, owner)
+        if old >= 0:
+            country = self.countries[old]
+            country.tiles.discard((x, y))
+            country.frontier.discard((x, y))
+            country.safe.discard((x, y))
+        self.owner[y, x] = owner
+        if owner >= 0:
+            self.countries[owner].tiles.add((x, y))
+        if self.dirty is not None:
+            self.dirty.add((x, y))
+
+        # 只有该格子及其相邻格子的分类可能改变
+        self._classify(x, y)
+        for dx, dy in NEIGHBOURS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.width and 0 <= ny < self.height:
+                self._classify(nx, ny)
+
+    def _classify(self, x, y):
+        """重新判断一个格子是否属于所属国家的边境/安全格子"""
+        owner = self.owner[y, x]
+        if owner < 0:
+            return
+        is_frontier = False
+        is_safe = True
+        for dx, dy in NEIGHBOURS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.width and 0 <= ny < self.height:
+                neighbour = self.owner[ny, nx]
+                if neighbour == owner:
+                    continue
+                if neighbour == EMPTY:
+                    is_frontier = True
+                else:
+                    is_safe = False
+                    if neighbour >= 0:
+                        is_frontier = True
+        country = self.countries[owner]
+        if is_frontier:
+            country.frontier.add((x, y))
+        else:
+            country.frontier.discard((x, y))
+        if is_safe:
+            country.safe.add((x, y))
+        else:
+            country.safe.discard((x, y))
+
+    def snapshot(self):
+        return BoardSnapshot(self.owner.copy(), self.troop_count.copy(), self.hash)
+
+    def troops_at(self, x, y):
+        """返回格子上的士兵组列表（只读视图）"""
+        return self.tile_troops.get((x, y), ())
+
+    def _set_count(self, x, y, count):
+        index = y * self.width + x
+        self.hash ^= count_key(index, int(self.troop_count[y, x])) ^ count_key(index, count)
+        self.troop_count[y, x] = count
+
+    def set_troops(self, x, y, troops):
+        """替换格子上的全部士兵组"""
+        if self.journal is not None:
+            self.journal.touch(x, y)
+        if troops:
+            self.tile_troops[(x, y)] = troops
+        else:
+            self.tile_troops.pop((x, y), None)
+        self._set_count(x, y, len(troops))
+        if self.dirty is not None:
+            self.dirty.add((x, y))
+
+    def add_troops(self, x, y, troops):
+        """向格子追加士兵组"""
+        if not troops:
+            return
+        if self.journal is not None:
+            self.journal.touch(x, y)
+        stack = self.tile_troops.setdefault((x, y), [])
+        stack.extend(troops)
+        self._set_count(x, y, len(stack))
+        if self.dirty is not None:
+            self.dirty.add((x, y))
+
+    def take_troops(self, x, y):
+        """取走格子上的全部士兵组并返回"""
+        if self.journal is not None:
+            self.journal.touch(x, y)
+        troops = self.tile_troops.pop((x, y), [])
+        self._set_count(x, y, 0)
+        if self.dirty is not None:
+            self.dirty.add((x, y))
+        return troops
+
+    def compute_hash(self):
+        """从头计算棋盘哈希（增量维护的self.hash应与之相等），与owner_key/count_key逐格异或的结果相同"""
+        owner = self.owner.ravel()
+        count = self.troop_count.ravel()
+        owned = np.flatnonzero(owner != EMPTY).astype(np.uint64)
+        stacked = np.flatnonzero(count).astype(np.uint64)
+        keys = np.concatenate((
+            splitmix64_array(((owned << np.uint64(16)) | (owner[owned].astype(np.int64) + 2).astype(np.uint64))
+                             ^ np.uint64(OWNER_SALT)),
+            splitmix64_array(((stacked << np.uint64(32)) | count[stacked].astype(np.uint64)) ^ np.uint64(COUNT_SALT)),
+        ))
+        return int(np.bitwise_xor.reduce(keys)) if len(keys) else 0
+
+    def index_masks(self):
+        """整个棋盘的边境和安全格子掩码（与_classify的规则相同，地图外的相邻格子不计）"""
+        owner = self.owner
+        # 边缘复制填充：地图外的"相邻格子"与自身相同，因此被忽略
+        padded = np.pad(owner, 1, mode='edge')
+        frontier = np.zeros(owner.shape, dtype=bool)
+        unsafe = np.zeros(owner.shape, dtype=bool)
+        for dx, dy in NEIGHBOURS:
+            neighbour = padded[1 + dy:1 + dy + self.height, 1 + dx:1 + dx + self.width]
+            other = neighbour != owner
+            frontier |= other & (neighbour != NEUTRAL)
+            unsafe |= other & (neighbour != EMPTY)
+        owned = owner >= 0
+        return frontier & owned, ~unsafe & owned
+
+    def build_index(self, spawn_order=None):
+        """按当前归属数组重建所有国家的领土、边境和安全格子索引（批量计算，不逐格分类）
+
+        spawn_order为安全格子索引的顺序（格子的行优先编号，见GameState），省略时按行优先顺序。
+        """
+        frontier, safe = self.index_masks()
+        ys, xs = np.nonzero(self.owner >= 0)
+        owners = self.owner[ys, xs]
+        order = np.argsort(owners, kind='stable')
+        xs, ys, owners = xs[order], ys[order], owners[order]
+        bounds = np.searchsorted(owners, np.arange(len(self.countries) + 1)).tolist()
+        is_frontier = frontier[ys, xs]
+        is_safe = safe[ys, xs]
+        for cid, country in enumerate(self.countries):
+            first, last = bounds[cid], bounds[cid + 1]
+            cx, cy = xs[first:last], ys[first:last]
+            country.tiles = set(zip(cx.tolist(), cy.tolist()))
+            f, s = is_frontier[first:last], is_safe[first:last]
+            country.frontier = set(zip(cx[f].tolist(), cy[f].tolist()))
+            country.safe = IndexedSet(zip(cx[s].tolist(), cy[s].tolist()))
+        if spawn_order is not None:
+            # 按国家稳定分组，保持每个国家内部的顺序
+            spawn_order = np.asarray(spawn_order, dtype=np.intp)
+            owners = self.owner.ravel()[spawn_order]
+            order = np.argsort(owners, kind='stable')
+            spawn_order = spawn_order[order]
+            bounds = np.searchsorted(owners[order], np.arange(len(self.countries) + 1)).tolist()
+            xs, ys = (spawn_order % self.width).tolist(), (spawn_order // self.width).tolist()
+            for cid, country in enumerate(self.countries):
+                first, last = bounds[cid], bounds[cid + 1]
+                country.safe = IndexedSet(zip(xs[first:last], ys[first:last]))
+
+    def load(self, owner, troop_count, board_hash=None, rebuild=None):
+        """整体替换棋盘数组：可写的数组直接使用（例如写时复制的内存映射），只读的数组复制一份
+
+        tile_troops和各国家的领土索引、士兵登记表不在这里建立：rebuild为重建它们的函数，
+        在第一次访问这些属性时才调用（见__getattr__），只读取数组的操作不需要等待重建。
+        """
+        self.owner = owner if owner.flags.writeable else np.array(owner, dtype=np.int16)
+        self.troop_count = troop_count if troop_count.flags.writeable else np.array(troop_count, dtype=np.int32)
+        self.hash = self.compute_hash() if board_hash is None else board_hash
+        if self.dirty is not None:
+            self.dirty.clear()
+        for name in LAZY_BOARD_FIELDS:
+            self.__dict__.pop(name, None)
+        for country in self.countries:
+            for name in LAZY_COUNTRY_FIELDS:
+                country.__dict__.pop(name, None)
+            country.rebuild = rebuild
+        self.rebuild = rebuild
+
+    def __getattr__(self, name):
+        # 只在正常查找失败时调用：载入后尚未重建的属性在此触发重建，之后的访问没有额外开销
+        rebuild = self.__dict__.get('rebuild')
+        if rebuild is None or name not in LAZY_BOARD_FIELDS:
+            raise AttributeError(name)
+        rebuild()
+        return getattr(self, name)
+
+    def clear(self):
+        if self.rebuild:
+            # 载入后尚未重建：不必重建，直接换成空索引
+            self.rebuild = None
+            self.tile_troops = {}
+            for country in self.countries:
+                country.rebuild = None
+                country.tiles, country.frontier, country.safe, country.troops = set(), set(), IndexedSet(), {}
+        self.owner.fill(EMPTY)
+        self.troop_count.fill(0)
+        self.tile_troops = {}
+        self.hash = 0
+        if self.dirty is not None:
+            self.dirty.clear()
+        for country in self.countries:
+            country.tiles.clear()
+            country.frontier.clear()
+            country.safe.clear()
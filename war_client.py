@@ -0,0 +1,164 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import numpy as np
+
+from war_ai import move_offsets
+from war_server import encode
+
+# 多人对战服务器（war_server）的客户端：维护棋盘的本地副本，按服务器广播的变化更新
+#
+#   python war_client.py --port 8765 --bots 3 --spectators 300 --turns 50
+#
+# 在同一个进程中运行若干个随机走子的玩家和大量观战连接，结束时检查所有连接的棋盘副本是否一致，
+# 用于在本机测试服务器的协议和广播。
+
+class WarClient:
+    """一个连接：state/update消息到达时更新本地的owner/troops数组"""
+
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        # 以下由第一条state消息设置
+        self.seat = None
+        self.offsets = []
+        self.owner = None
+        self.troops = None
+        self.turn = 0
+        self.elapsed = 0  # 收到完整状态之后经过的回合数
+        self.countries = []
+        self.game_over = False
+        self.errors = []
+        self.messages = 0
+        self.received = 0  # 收到的字节数
+
+    async def connect(self, host="127.0.0.1", port=8765, path=None):
+        if path:
+            self.reader, self.writer = await asyncio.open_unix_connection(path)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(host, port)
+
+    async def send(self, message):
+        self.writer.write(encode(message))
+        await self.writer.drain()
+
+    async def recv(self):
+        """读取并应用一条消息，连接关闭时返回None"""
+        line = await self.reader.readline()
+        if not line:
+            return None
+        self.messages += 1
+        self.received += len(line)
+        message = json.loads(line)
+        kind = message["type"]
+        if kind == "update" and self.owner is None:
+            # 还没有收到完整状态，无法应用变化
+            return message
+        if kind == "state":
+            self.seat = message["seat"]
+            self.offsets = move_offsets(message["move_range"])
+            self.owner = np.array(message["owner"], dtype=np.int16)
+            self.troops = np.array(message["troops"], dtype=np.int32)
+        elif kind == "update":
+            for x, y, owner, troops in message["tiles"]:
+                self.owner[y, x] = owner
+                self.troops[y, x] = troops
+        elif kind == "error":
+            self.errors.append(message["message"])
+        if kind in ("state", "update"):
+            if kind == "update" and message["turn"] != self.turn:
+                self.elapsed += 1
+            self.turn = message["turn"]
+            self.countries = message["countries"]
+            self.game_over = message["game_over"]
+        return message
+
+    def legal_moves(self):
+        """本地副本上本国家的所有合法移动[(from_x, from_y, to_x, to_y)]，还没有收到state或在观战时为空"""
+        if self.owner is None or self.seat is None:
+            return []
+        height, width = self.owner.shape
+        ys, xs = np.nonzero((self.owner == self.seat) & (self.troops > 0))
+        return [(x, y, x + dx, y + dy) for x, y in zip(xs.tolist(), ys.tolist()) for dx, dy in self.offsets
+                if 0 <= x + dx < width and 0 <= y + dy < height]
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+async def play_bot(client, turns, rng):
+    """随机走子：每回合在本地副本上随机选一个合法移动，没有时放弃；加入后进行turns回合"""
+    await client.send({"type": "join"})
+    acted = None
+    while client.elapsed < turns:
+        message = await client.recv()
+        if message is None:
+            break
+        if client.seat is None or message["type"] == "error":
+            continue
+        if client.turn == acted or client.game_over or client.countries[client.seat][2]:
+            continue
+        acted = client.turn
+        moves = client.legal_moves()
+        if moves:
+            x0, y0, x1, y1 = rng.choice(moves)
+            await client.send({"type": "move", "from": [x0, y0], "to": [x1, y1]})
+        else:
+            await client.send({"type": "pass"})
+
+async def watch(client, turns):
+    await client.send({"type": "watch"})
+    while client.elapsed < turns:
+        if await client.recv() is None:
+            break
+
+async def run(args):
+    rng = random.Random(args.seed)
+    address = {"path": args.unix} if args.unix else {"host": args.host, "port": args.port}
+    bots = [WarClient() for _ in range(args.bots)]
+    spectators = [WarClient() for _ in range(args.spectators)]
+    for client in bots + spectators:
+        await client.connect(**address)
+    start = time.perf_counter()
+    await asyncio.gather(*[play_bot(client, args.turns, random.Random(rng.getrandbits(32))) for client in bots],
+                         *[watch(client, args.turns) for client in spectators])
+    elapsed = time.perf_counter() - start
+
+    # 所有连接在同一回合停止读取时，棋盘副本应当完全相同
+    clients = bots + spectators
+    final = max(client.turn for client in clients)
+    synced = [client for client in clients if client.turn == final]
+    same = all(np.array_equal(client.owner, synced[0].owner) and np.array_equal(client.troops, synced[0].troops)
+               for client in synced)
+    messages = sum(client.messages for client in clients)
+    received = sum(client.received for client in clients)
+    print(f"{len(bots)}个玩家 {len(spectators)}个观战 {final}回合 用时{elapsed:.2f}秒，"
+          f"共收到{messages}条消息 {received / 1024:.0f}KB，"
+          f"棋盘副本{'一致' if same else '不一致'}（{len(synced)}个连接在第{final}回合）")
+    errors = [error for client in bots for error in client.errors]
+    if errors:
+        print(f"服务器拒绝了{len(errors)}个请求，例如：{errors[0]}")
+    for client in clients:
+        await client.close()
+    return same
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多人对战服务器的脚本客户端")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="通过Unix套接字连接")
+    parser.add_argument("--bots", type=int, default=2, help="随机走子的玩家数量")
+    parser.add_argument("--spectators", type=int, default=100, help="观战连接数量")
+    parser.add_argument("--turns", type=int, default=30, help="每个连接加入或观战后运行的回合数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    return 0 if asyncio.run(run(args)) else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,705 @@
+import colorsys
+import copy
+import random
+
+import numpy as np
+
+from war_ai import DistanceFields, greedy_moves, move_offsets, strategic_moves
+from war_board import Board, EMPTY, IndexedSet, LAZY_COUNTRY_FIELDS, NEUTRAL
+from war_history import GameState, MoveLog, recorded
+from war_search import SearchAI
+
+# 无界面的游戏规则核心：不依赖pygame，可在无显示器的服务器上运行
+
+# 默认地图尺寸（与War.py窗口大小对应：1000x600像素，每格40像素）
+GRID_WIDTH = 25
+GRID_HEIGHT = 15
+
+# 国家颜色
+RED = (255, 80, 80)
+GREEN = (80, 255, 80)
+BLUE = (80, 150, 255)
+YELLOW = (255, 255, 80)
+PURPLE = (200, 80, 255)
+CYAN = (80, 255, 255)
+ORANGE = (255, 165, 0)
+PINK = (255, 105, 180)
+COLORS = [RED, BLUE, YELLOW, PURPLE, CYAN, ORANGE, PINK]  # 电脑国家颜色
+
+AI_NAMES = ["红国", "蓝国", "黄国", "紫国", "青国"]
+
+def ai_color(i):
+    """第i个电脑国家的颜色：先用预设颜色，之后按黄金角在色环上取不同色相"""
+    if i < len(COLORS):
+        return COLORS[i]
+    r, g, b = colorsys.hsv_to_rgb((i * 0.618034) % 1.0, 0.55 + 0.3 * (i % 2), 0.95 - 0.25 * (i % 3 == 2))
+    return int(r * 255), int(g * 255), int(b * 255)
+
+SPAWN_ATTEMPTS = 1000  # 初始位置满足间距要求的最大尝试次数
+
+# 引擎事件
+COUNTRY_ELIMINATED = "country_eliminated"  # 参数：被消灭的国家
+STATE_RESTORED = "state_restored"          # 撤销、重做或载入状态后，状态不再是上一步的延续；无参数
+# STEP_RECORDED（见war_history）：开启走子记录后每记录完一步发出，参数为该步的Delta
+
+# 移动的结果（apply_moves的返回值）
+MOVE_INVALID = 0   # 不合法，未执行
+MOVE_OCCUPIED = 1  # 占领空白格子
+MOVE_MERGED = 2    # 与己方格子上的士兵组合并
+MOVE_CAPTURED = 3  # 战斗胜利（或兵力相等同归于尽），占领该格子
+MOVE_REPELLED = 4  # 战斗失败，进攻的士兵组全部阵亡
+
+class Troop:
+    """士兵组：id在整局游戏中保持不变，可作为登记表的键"""
+    __slots__ = ('id', 'x', 'y')
+
+    def __init__(self, troop_id, x, y):
+        self.id = troop_id
+        self.x = x
+        self.y = y
+
+    def __repr__(self):
+        return f"Troop({self.id}, {self.x}, {self.y})"
+
+class Country:
+    rebuild = None  # 载入后待调用的索引重建函数，见Board.load
+
+    def __init__(self, color, name, is_player=False):
+        self.color = color
+        self.name = name
+        self.is_player = is_player
+        self.current_territory = 0  # 当前拥有的领土数
+        self.total_territory = 0    # 总共占领过的领土数（包括失去的）
+        self.troops = {}  # 士兵组登记表：id -> Troop
+        self.next_reward = 3
+        self.defeated = False
+        self.cid = -1  # 在棋盘归属数组中的编号
+        # 由棋盘增量维护的领土索引
+        self.tiles = set()     # 拥有的所有格子
+        self.frontier = set()  # 边境格子：与空白或他国领土相邻
+        self.safe = IndexedSet()  # 安全格子：上下左右没有他国或中立领土，士兵组在其中随机生成
+
+    def __getattr__(self, name):
+        # 载入后领土索引和士兵登记表在第一次访问时才重建
+        rebuild = self.__dict__.get('rebuild')
+        if rebuild is None or name not in LAZY_COUNTRY_FIELDS:
+            raise AttributeError(name)
+        rebuild()
+        return getattr(self, name)
+
+    def get_troop_count(self):
+        """计算国家总兵力（士兵组数量）"""
+        return len(self.troops)
+
+    def enlist(self, troops):
+        """登记士兵组"""
+        for troop in troops:
+            self.troops[troop.id] = troop
+
+    def discharge(self, troops):
+        """注销士兵组（移动中或阵亡），不存在的士兵组忽略"""
+        for troop in troops:
+            self.troops.pop(troop.id, None)
+
+    @recorded(lambda country, game: (game, country, None))
+    def add_territory(self, game):
+        """增加领土并检查是否应生成新士兵组"""
+        # 每新占领reward_step（默认3）块领土获得一个新的士兵组（基于总共占领过的领土数）
+        if self.total_territory >= self.next_reward:
+            # 更新奖励阈值
+            self.next_reward += game.reward_step
+
+            # 在随机领土上生成新士兵组
+            if self.troops:
+                # 在安全的领土位置（仅限己方领土且上下左右没有他国或中立领土）中随机选择，
+                # 安全格子索引由棋盘在格子归属变化时维护，抽样为O(1)，与领土和地图大小无关
+                if self.safe:
+                    x, y = self.safe.choice(game.rng)
+
+                    # 创建新士兵组
+                    new_troop = game.new_troop(x, y)
+
+                    # 登记到国家士兵表
+                    self.troops[new_troop.id] = new_troop
+
+                    # 添加到网格
+                    game.board.add_troops(x, y, [new_troop])
+                    return True
+        return False
+
+class WarEngine:
+    """游戏规则与状态，不包含任何绘制、输入和延时"""
+
+    def __init__(self, grid_width=GRID_WIDTH, grid_height=GRID_HEIGHT, num_ai=5, with_player=True,
+                 reward_step=3, move_range=2, search_time=0.0, search_depth=6, state=None, seed=None,
+                 strategic=False, simultaneous=False):
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        # 平衡参数：每占领多少领土奖励一个士兵组、一次最多移动几格
+        self.reward_step = reward_step
+        self.move_range = move_range
+        self.move_offsets = move_offsets(move_range)
+        self.move_offset_set = frozenset(self.move_offsets)
+        # 电脑策略：search_time为每步的搜索时间预算（秒），0表示使用贪心策略
+        self.searcher = SearchAI(search_time, search_depth) if search_time > 0 else None
+        # strategic为True时贪心电脑按距离场把远离前线的士兵组移向空白领土和弱敌（见war_ai.strategic_moves）
+        self.fields = DistanceFields() if strategic else None
+        # 同时行动模式：所有国家针对同一个棋盘下达命令，一起结算（见simultaneous_turn）
+        self.simultaneous = simultaneous
+
+        # 创建国家
+        self.countries = []
+        if with_player:
+            self.player_country = Country(GREEN, "玩家", True)
+            self.countries.append(self.player_country)
+        else:
+            # 自我对弈时所有国家都由电脑控制
+            self.player_country = None
+
+        # 创建电脑国家 (使用不同颜色)
+        for i in range(num_ai):
+            name = AI_NAMES[i] if i < len(AI_NAMES) else f"电脑{i + 1}"
+            self.countries.append(Country(ai_color(i), name))
+        for cid, country in enumerate(self.countries):
+            country.cid = cid
+
+        # 本局的随机数生成器：所有随机选择（初始位置、奖励位置、战斗结果、电脑策略）都经过它，
+        # 相同的种子和相同的玩家操作总是得到相同的对局；不给出种子时随机选取
+        self.seed = seed if seed is not None else random.SystemRandom().getrandbits(32)
+        self.rng = random.Random(self.seed)
+
+        # 事件订阅：事件名 -> 回调列表
+        self.listeners = {}
+
+        # 士兵组id计数器
+        self.next_troop_id = 0
+
+        # 初始化棋盘
+        self.board = Board(self.grid_width, self.grid_height, self.countries)
+        self.game_over = False
+        self.winner = None
+        self.turn_count = 0  # 回合计数器
+        # 走子记录（见track_history），为None时不记录
+        self.history = None
+
+        # 初始化领土和士兵；给出state（GameState）时直接从该状态开始
+        if state is not None:
+            self.load_state(state)
+        else:
+            self.initialize_game()
+
+    def country_at(self, x, y):
+        """返回格子所属国家，空白或中立格子返回None"""
+        owner = self.board.owner[y, x]
+        return self.countries[owner] if owner >= 0 else None
+
+    def subscribe(self, event, callback):
+        """订阅引擎事件，例如COUNTRY_ELIMINATED"""
+        self.listeners.setdefault(event, []).append(callback)
+
+    def unsubscribe(self, event, callback):
+        self.listeners.get(event, []).remove(callback)
+
+    def emit(self, event, *args):
+        for callback in self.listeners.get(event, ()):
+            callback(*args)
+
+    @recorded(lambda engine, country: (engine, country, None))
+    def eliminate(self, country):
+        """消灭国家：只释放该国剩余的领土（变为中立），并发出事件"""
+        country.defeated = True
+        for x, y in list(country.tiles):
+            self.board.set_owner(x, y, NEUTRAL)
+        self.emit(COUNTRY_ELIMINATED, country)
+
+    def new_troop(self, x, y):
+        """创建带唯一id的士兵组"""
+        troop = Troop(self.next_troop_id, x, y)
+        self.next_troop_id += 1
+        return troop
+
+    def initialize_game(self):
+        # 为每个国家分配初始领土
+        positions = []
+        for i in range(len(self.countries)):
+            attempts = 0
+            while True:
+                x = self.rng.randint(2, self.grid_width - 3)
+                y = self.rng.randint(2, self.grid_height - 3)
+                attempts += 1
+                # 确保初始位置不重叠且有一定间距（地图放不下时放宽间距要求）
+                too_close = False
+                if attempts <= SPAWN_ATTEMPTS:
+                    for px, py in positions:
+                        if abs(px - x) < 4 and abs(py - y) < 4:
+                            too_close = True
+                            break
+                if not too_close and (x, y) not in positions:
+                    positions.append((x, y))
+                    troop = self.new_troop(x, y)  # 初始士兵组
+                    self.board.set_owner(x, y, i)
+                    self.board.set_troops(x, y, [troop])
+                    self.countries[i].current_territory = 1
+                    self.countries[i].total_territory = 1
+                    self.countries[i].troops = {troop.id: troop}
+                    self.countries[i].next_reward = self.reward_step
+                    break
+
+    def move_troops(self, from_x, from_y, to_x, to_y):
+        """玩家移动士兵组，随后进行电脑回合并结算本回合（同时行动模式下与电脑的命令一起结算）"""
+        if self.simultaneous:
+            if self.is_legal_move(self.player_country.cid, from_x, from_y, to_x, to_y):
+                self.simultaneous_turn([(self.player_country.cid, from_x, from_y, to_x, to_y)])
+        elif self.player_move(from_x, from_y, to_x, to_y):
+            self.end_turn()
+
+    def player_move(self, from_x, from_y, to_x, to_y):
+        """只执行玩家的移动，返回是否移动成功"""
+        return self.apply_moves([(self.player_country.cid, from_x, from_y, to_x, to_y)])[0] != MOVE_INVALID
+
+    def apply_moves(self, moves):
+        """按顺序执行一批移动，返回每个移动的结果（MOVE_*）
+
+        moves为[(国家编号, from_x, from_y, to_x, to_y)]。玩家、电脑和其他模拟都经过这里：
+        出发格子必须属于该国家且有士兵，方向在移动范围内，目标在地图内，否则跳过并返回MOVE_INVALID。
+        每个移动单独记录为一步（见war_history），前面的移动的结果会影响后面移动的验证。
+        """
+        countries = self.countries
+        is_legal_move = self.is_legal_move
+        results = []
+        for cid, from_x, from_y, to_x, to_y in moves:
+            if is_legal_move(cid, from_x, from_y, to_x, to_y):
+                results.append(self.apply_move(countries[cid], from_x, from_y, to_x, to_y))
+            else:
+                results.append(MOVE_INVALID)
+        return results
+
+    def is_legal_move(self, cid, from_x, from_y, to_x, to_y):
+        """出发格子属于该国家且有士兵，方向在移动范围内，目标在地图内"""
+        board = self.board
+        width, height = board.width, board.height
+        return (not self.countries[cid].defeated and (to_x - from_x, to_y - from_y) in self.move_offset_set
+                and 0 <= from_x < width and 0 <= from_y < height and 0 <= to_x < width and 0 <= to_y < height
+                and board.owner[from_y, from_x] == cid and board.troop_count[from_y, from_x] > 0)
+
+    @recorded(lambda engine, country, *move: (engine, country, move))
+    def apply_move(self, country, from_x, from_y, to_x, to_y):
+        """执行一个已验证的移动：占领、合并或战斗，返回结果（MOVE_*）"""
+        board = self.board
+        # 取走原位置的所有士兵组
+        moving_troops = board.take_troops(from_x, from_y)
+        country.discharge(moving_troops)
+
+        # 更新士兵组位置
+        for troop in moving_troops:
+            troop.x = to_x
+            troop.y = to_y
+
+        # 添加到新位置
+        to_owner = board.owner[to_y, to_x]
+
+        if to_owner == EMPTY:
+            # 占领新领土
+            board.set_owner(to_x, to_y, country.cid)
+            board.set_troops(to_x, to_y, moving_troops)
+            country.current_territory += 1
+            country.total_territory += 1
+            country.enlist(moving_troops)
+            # 检查是否应获得新士兵组（基于总占领领土数）
+            country.add_territory(self)
+            return MOVE_OCCUPIED
+        if to_owner == country.cid:
+            # 合并到友方领土
+            board.add_troops(to_x, to_y, moving_troops)
+            country.enlist(moving_troops)
+            return MOVE_MERGED
+        # 与敌方（或中立领土）发生战斗
+        return self.resolve_battle(country, to_x, to_y, moving_troops)
+
+    @recorded(lambda engine, country, *battle: (engine, country, None))
+    def resolve_battle(self, country, x, y, attacking_troops, eliminate=True):
+        """country的士兵组attacking_troops进攻格子(x, y)，返回MOVE_CAPTURED或MOVE_REPELLED
+
+        比较双方士兵组数：进攻方不少于防守方时占领该格子并保留差值数量的士兵组，
+        否则进攻方全部阵亡，防守方随机保留差值数量的士兵组。
+        eliminate为False时失去最后一块领土的防守方不在这里消灭，由调用者统一处理（见resolve_orders）。
+        """
+        board = self.board
+        defending_country = self.country_at(x, y)
+        defending_troops = list(board.troops_at(x, y))
+        defending_count = len(defending_troops)
+        attacking_count = len(attacking_troops)
+
+        if attacking_count >= defending_count:
+            # 攻击方胜利
+            board.set_owner(x, y, country.cid)
+
+            # 保留差值数量的士兵组
+            remaining_attacking_troops = attacking_troops[:attacking_count - defending_count]
+
+            # 设置领土上的士兵组
+            board.set_troops(x, y, remaining_attacking_troops)
+
+            # 更新进攻方士兵列表
+            country.enlist(remaining_attacking_troops)
+
+            # 领土变更，阵亡的防御方士兵组从其国家注销
+            country.current_territory += 1
+            country.total_territory += 1
+            if defending_country:
+                defending_country.discharge(defending_troops)
+                defending_country.current_territory -= 1
+                # 检查防御方是否被击败
+                if eliminate and defending_country.current_territory <= 0:
+                    self.eliminate(defending_country)
+
+            # 检查是否应获得新士兵组（基于总占领领土数）
+            country.add_territory(self)
+            return MOVE_CAPTURED
+
+        # 防御方胜利 - 进攻方全部阵亡，随机保留y-x个防御方士兵组
+        country.discharge(attacking_troops)
+        remaining_troops = self.rng.sample(defending_troops, defending_count - attacking_count)
+        board.set_troops(x, y, remaining_troops)
+
+        # 注销阵亡的防御方士兵组
+        if defending_country:
+            kept = {troop.id for troop in remaining_troops}
+            defending_country.discharge([t for t in defending_troops if t.id not in kept])
+        return MOVE_REPELLED
+
+    def end_turn(self):
+        """电脑回合、回合计数并检查游戏是否结束"""
+        if self.simultaneous:
+            self.simultaneous_turn()
+            return
+        self.ai_turn()
+        self.finish_turn()
+
+    def simultaneous_turn(self, orders=(), plans=None):
+        """同时行动模式的一个回合：玩家等外部控制国家的命令orders和所有电脑的命令一起结算，然后回合结算
+
+        电脑的命令取自plans（{国家编号: 移动}，例如war_ai.AIPlanner的结果），省略时在当前棋盘上规划；
+        所有命令都针对同一个棋盘，规划互不依赖，可以完全并行。返回orders之后依次为各电脑命令的结果。
+        """
+        if plans is None:
+            countries = [country for country in self.countries if not country.is_player and not country.defeated]
+            if self.searcher:
+                plans = {country.cid: self.plan_ai_move(country) for country in countries}
+            else:
+                plans = self.plan_ai_moves(countries)
+        orders = list(orders) + [(cid,) + tuple(move) for cid, move in sorted(plans.items()) if move]
+        results = self.resolve_orders(orders)
+        self.finish_turn()
+        return results
+
+    @recorded(lambda engine, orders: (engine, engine.countries[orders[0][0]] if orders else None, None))
+    def resolve_orders(self, orders):
+        """同时结算一批针对同一个棋盘下达的命令[(国家编号, from_x, from_y, to_x, to_y)]，返回每个命令的结果
+
+        规则（结果与命令的顺序无关，只有防守方随机保留士兵组时使用随机数）：
+        1. 按当前棋盘验证所有命令，每个国家只有第一个合法的命令有效；所有移动的士兵组同时离开出发格子，
+           因此互换位置的两个士兵组不会相遇，进攻刚被离开的格子时守军为0。
+        2. 各目标格子按行优先顺序结算：格子所属国家的士兵组先作为援军加入守军；
+           其他国家的士兵组先互相战斗，最强者减去第二强者后剩余，兵力相同的最强者同归于尽；
+           剩余的士兵组再按普通规则占领空白格子或与守军战斗（见resolve_battle）。
+        3. 所有格子结算完后，再消灭失去全部领土的国家：同一批中撤离的格子被占领、
+           撤出的士兵组占领了新格子的国家仍然存活，与格子的结算顺序无关。
+        整个结算记为第一个命令所属国家的一步（玩家的命令在最前，参与时即为玩家的一步），回合结算另记一步。
+        """
+        board = self.board
+        countries = self.countries
+        results = [MOVE_INVALID] * len(orders)
+        arrivals = {}  # 目标格子 -> [(国家, 士兵组, 命令下标)]
+        ordered = set()
+        legal = []
+        for i, order in enumerate(orders):
+            if order[0] not in ordered and self.is_legal_move(*order):
+                ordered.add(order[0])
+                legal.append(i)
+        for i in legal:
+            cid, from_x, from_y, to_x, to_y = orders[i]
+            troops = board.take_troops(from_x, from_y)
+            countries[cid].discharge(troops)
+            for troop in troops:
+                troop.x = to_x
+                troop.y = to_y
+            arrivals.setdefault((to_x, to_y), []).append((countries[cid], troops, i))
+
+        for x, y in sorted(arrivals, key=lambda pos: (pos[1], pos[0])):
+            owner = board.owner[y, x]
+            hostile = []
+            for country, troops, i in arrivals[(x, y)]:
+                if country.cid == owner:
+                    board.add_troops(x, y, troops)
+                    country.enlist(troops)
+                    results[i] = MOVE_MERGED
+                else:
+                    hostile.append((country, troops, i))
+            if not hostile:
+                continue
+            hostile.sort(key=lambda arrival: (-len(arrival[1]), arrival[0].cid))
+            for _, _, i in hostile[1:]:
+                results[i] = MOVE_REPELLED
+            country, troops, i = hostile[0]
+            if len(hostile) > 1:
+                survivors = len(troops) - len(hostile[1][1])
+                if not survivors:
+                    results[i] = MOVE_REPELLED
+                    continue
+                troops = troops[:survivors]
+            if board.owner[y, x] == EMPTY:
+                board.set_owner(x, y, country.cid)
+                board.set_troops(x, y, troops)
+                country.current_territory += 1
+                country.total_territory += 1
+                country.enlist(troops)
+                country.add_territory(self)
+                results[i] = MOVE_OCCUPIED
+            else:
+                results[i] = self.resolve_battle(country, x, y, troops, eliminate=False)
+
+        for country in countries:
+            if not country.defeated and country.current_territory <= 0:
+                self.eliminate(country)
+        return results
+
+    @recorded(lambda engine: (engine, None, None))
+    def finish_turn(self):
+        """回合计数并检查游戏是否结束"""
+        self.turn_count += 1
+        self.check_game_over()
+
+    def ai_turn(self, plans=None):
+        for _ in self.ai_turn_steps(plans):
+            pass
+
+    def ai_sources(self, countries, all_stacks=False):
+        """电脑国家的候选出发格子：有士兵的边境格子，没有时（或all_stacks为True时）为所有有士兵的格子
+
+        边境格子从棋盘增量维护的Country.frontier中读取，不扫描整个棋盘的士兵组。返回
+        (按国家依次拼接、国家内按行优先排序的(n, 2)坐标数组, 每个国家的格子数)。
+        """
+        tile_troops = self.board.tile_troops
+        stacks, counts = [], []
+        for country in countries:
+            # 收集有士兵的边境格子（与敌方或空白相邻的格子）
+            tiles = [] if all_stacks else [tile for tile in country.frontier if tile in tile_troops]
+            # 如果没有边境格子，使用所有有士兵的格子
+            if not tiles:
+                tiles = {(troop.x, troop.y) for troop in country.troops.values()}
+            stacks.extend(tiles)
+            counts.append(len(tiles))
+        stacks = np.array(stacks, dtype=np.intp).reshape(-1, 2)
+        group = np.repeat(np.arange(len(countries)), counts)
+        order = np.lexsort((stacks[:, 0], stacks[:, 1], group))
+        return stacks[order], counts
+
+    def plan_ai_move(self, country):
+        """在实时棋盘上为电脑国家选择移动"""
+        if self.searcher:
+            return self.searcher.choose(self, country)
+        return self.plan_ai_moves([country])[country.cid]
+
+    def plan_ai_moves(self, countries=None):
+        """在当前棋盘上一次性为多个电脑国家（默认为所有存活的电脑国家）选择移动
+
+        返回{国家编号: 移动或None}。
+        """
+        fields = self.fields
+        if countries is None:
+            countries = [country for country in self.countries if not country.is_player and not country.defeated]
+            # 回合开始时为所有国家规划：更新距离场；之后逐个国家重新规划时沿用
+            fields = self.refresh_fields()
+        elif fields is not None and fields.hash is None:
+            fields = self.refresh_fields()
+        sources, counts = self.ai_sources(countries, all_stacks=fields is not None)
+        rngs = [self.rng] * len(countries)
+        if fields is not None:
+            moves = strategic_moves(self.board.owner, self.board.troop_count, sources, counts,
+                                    [country.cid for country in countries], rngs, fields, self.move_offsets)
+        else:
+            moves = greedy_moves(self.board.owner, self.board.troop_count, sources, counts, rngs, self.move_offsets)
+        return {country.cid: move for country, move in zip(countries, moves)}
+
+    def refresh_fields(self):
+        """按当前棋盘更新电脑共用的距离场并返回，未开启strategic时返回None"""
+        if self.fields is None:
+            return None
+        board = self.board
+        return self.fields.refresh(board.owner, board.troop_count, board.hash)
+
+    def is_valid_ai_move(self, country, from_x, from_y, to_x, to_y):
+        """检查预先规划的移动在当前棋盘上是否仍然符合电脑的行动条件"""
+        board = self.board
+        if board.owner[from_y, from_x] != country.cid or not board.troop_count[from_y, from_x]:
+            return False
+        target_owner = board.owner[to_y, to_x]
+        if target_owner == EMPTY:
+            return True
+        return (target_owner >= 0 and target_owner != country.cid
+                and board.troop_count[from_y, from_x] >= board.troop_count[to_y, to_x])
+
+    def ai_turn_steps(self, plans=None):
+        """逐步执行电脑回合：每个电脑国家行动后暂停并返回该国家
+
+        前端可以在两步之间绘制画面，实现不阻塞的行动动画。
+        plans为预先规划的{国家编号: 移动}（见plan_ai_moves和war_ai.AIPlanner），
+        省略时在回合开始时一次性规划；按国家顺序应用，已失效或缺失的移动在当前棋盘上重新规划。
+        使用搜索策略时每个国家轮到自己时才在实时棋盘上搜索。
+        """
+        if plans is None and not self.searcher:
+            plans = self.plan_ai_moves()
+        for country in self.countries:
+            if country.is_player or country.defeated:
+                continue
+
+            move = plans.get(country.cid) if plans else None
+            if move is None or not self.is_valid_ai_move(country, *move):
+                move = self.plan_ai_move(country)
+
+            if move:
+                self.ai_move(country, *move)
+                # 暂停，让前端有机会展示电脑操作
+                yield country
+
+    def ai_move(self, country, from_x, from_y, to_x, to_y):
+        """执行电脑国家的一个移动，返回结果（MOVE_*）"""
+        return self.apply_moves([(country.cid, from_x, from_y, to_x, to_y)])[0]
+
+    def check_game_over(self):
+        active_countries = [c for c in self.countries if not c.defeated]
+
+        if len(active_countries) == 1:
+            self.game_over = True
+            self.winner = active_countries[0]
+
+    def restart_game(self):
+        # 重置游戏状态
+        self.board.clear()
+        for country in self.countries:
+            country.current_territory = 0
+            country.total_territory = 0
+            country.troops = {}
+            country.next_reward = self.reward_step
+            country.defeated = False
+
+        self.game_over = False
+        self.winner = None
+        self.turn_count = 0
+        self.next_troop_id = 0
+        if self.history:
+            self.history.clear()
+
+        # 重新初始化游戏
+        self.initialize_game()
+
+    def track_history(self, limit=None):
+        """开始记录每一步的改动，之后可以用undo/redo撤销和重做（limit为最多保留的步数）"""
+        if self.history is None:
+            self.history = MoveLog(self, limit)
+            self.board.journal = self.history
+        return self.history
+
+    def undo(self):
+        """撤销最近的一步（一次移动或一次回合结算），返回被撤销的war_history.Delta或None
+
+        撤销和重做不会回退self.rng的状态，也不会重新发出事件。
+        """
+        delta = self.history.undo() if self.history else None
+        if delta is not None:
+            self.emit(STATE_RESTORED)
+        return delta
+
+    def redo(self):
+        """重做最近撤销的一步，返回该步或None"""
+        delta = self.history.redo() if self.history else None
+        if delta is not None:
+            self.emit(STATE_RESTORED)
+        return delta
+
+    def save_state(self):
+        """当前状态的紧凑副本（war_history.GameState），不包含走子记录"""
+        return GameState.capture(self)
+
+    def load_state(self, state):
+        """恢复到save_state保存的状态，清空走子记录
+
+        只复制数组和计数器；士兵组对象、各国家的领土索引和士兵登记表在第一次被访问时才重建（见Board.load）。
+        state中可写的数组被棋盘直接使用，只读的数组（save_state的结果）会被复制。
+        """
+        height, width = state.owner.shape
+        if (width, height) != (self.grid_width, self.grid_height) or len(state.countries) != len(self.countries):
+            raise ValueError("状态与当前游戏的地图尺寸或国家数量不一致")
+        for country, values in zip(self.countries, state.countries.tolist()):
+            country.current_territory, country.total_territory, country.next_reward, defeated = values
+            country.defeated = bool(defeated)
+
+        troop_ids, spawn_order = state.troop_ids, state.spawn_order
+        self.board.load(state.owner, state.troop_count, state.hash,
+                        lambda: self._rebuild_index(troop_ids, spawn_order))
+
+        self.next_troop_id = state.next_troop_id
+        self.turn_count = state.turn_count
+        self.game_over = state.game_over
+        self.winner = self.countries[state.winner] if state.winner >= 0 else None
+        if self.history:
+            self.history.clear()
+        self.emit(STATE_RESTORED)
+
+    def _rebuild_index(self, troop_ids, spawn_order=None):
+        """载入后第一次访问索引时调用：创建士兵组对象，重建tile_troops、士兵登记表和领土索引"""
+        board = self.board
+        board.rebuild = None
+        for country in self.countries:
+            country.rebuild = None
+            country.troops = {}
+        board.build_index(spawn_order)
+
+        # 按行优先顺序把士兵组id切分到各个有士兵的格子
+        tile_troops = {}
+        ids = troop_ids.tolist()
+        start = 0
+        ys, xs = np.nonzero(board.troop_count)
+        owners = board.owner[ys, xs].tolist()
+        for x, y, owner, count in zip(xs.tolist(), ys.tolist(), owners, board.troop_count[ys, xs].tolist()):
+            troops = [Troop(troop_id, x, y) for troop_id in ids[start:start + count]]
+            tile_troops[(x, y)] = troops
+            if owner >= 0:
+                self.countries[owner].enlist(troops)
+            start += count
+        board.tile_troops = tile_troops
+
+    def fork(self):
+        """分叉出一个独立的对局：规则参数、状态和随机数状态都是当前对局的副本，两者之后互不影响"""
+        with_player = self.player_country is not None
+        clone = WarEngine(self.grid_width, self.grid_height, num_ai=len(self.countries) - with_player,
+                          with_player=with_player, reward_step=self.reward_step, move_range=self.move_range,
+                          search_time=self.searcher.time_budget if self.searcher else 0.0,
+                          search_depth=self.searcher.max_depth if self.searcher else 6,
+                          state=self.save_state(), seed=self.seed, strategic=self.fields is not None,
+                          simultaneous=self.simultaneous)
+        clone.rng.setstate(self.rng.getstate())
+        if self.fields is not None:
+            clone.fields = copy.copy(self.fields)
+        return clone
+
+    def run_headless(self, max_turns=1000):
+        """不绘制、不延时地运行电脑对战，返回结束时的回合数"""
+        while not self.game_over and self.turn_count < max_turns:
+            self.end_turn()
+        return self.turn_count
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    # 无界面自我对弈：python war_engine.py [对局数]
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    start = time.perf_counter()
+    total_turns = 0
+    for _ in range(games):
+        engine = WarEngine(with_player=False)
+        total_turns += engine.run_headless()
+    elapsed = time.perf_counter() - start
+    print(f"{games}局 {total_turns}回合 用时{elapsed:.2f}秒 ({total_turns / elapsed:.0f}回合/秒)")
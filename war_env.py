@@ -0,0 +1,360 @@
+import argparse
+import time
+
+import numpy as np
+
+from war_ai import move_offsets
+from war_board import EMPTY
+from war_engine import GRID_HEIGHT, GRID_WIDTH, SPAWN_ATTEMPTS, WarEngine
+from war_history import GameState
+
+# 批量对局环境：N局相互独立的对局保存在堆叠的数组中，reset/step一次推进所有对局，用于训练和评估策略
+#
+# 每局中编号0的国家由外部策略控制（相当于玩家），其余国家使用与WarEngine.ai_turn相同的贪心策略。
+# 规则与WarEngine相同（占领、合并、战斗、奖励士兵组、消灭、胜负），但每格只记录士兵组数，不创建士兵组对象；
+# 随机数来自numpy，因此与相同种子的WarEngine对局不逐步相同，只是规则和策略的分布相同。
+#
+# 每局的棋盘按行展平，四周填充move_range格的OUTSIDE：移动和相邻格子都是固定的下标偏移，不需要边界判断。
+# 有士兵的格子很少，电脑的规划只在这些格子上进行，不逐局、不逐格循环。
+
+OUTSIDE = -3  # 填充格子的归属
+SPAWN_BATCH = 16  # 初始位置每次为每局抽取的候选数
+
+# 每个格子的各方向排列为(方向数, 格子数)的数组：逐方向运算时内层循环沿格子进行，比(格子数, 方向数)的布局快得多
+
+def any_of(mask):
+    """(k, n)布尔数组每列是否有True"""
+    result = mask[0].copy()
+    for row in mask[1:]:
+        result |= row
+    return result
+
+def choose_row(mask, rng):
+    """(k, n)布尔数组每列在为True的行中均匀随机选一行（每列至少有一个True）"""
+    counts = np.zeros(mask.shape[1], dtype=np.intp)
+    for row in mask:
+        counts += row
+    pick = (rng.random(mask.shape[1]) * counts).astype(np.intp)
+    result = np.zeros(mask.shape[1], dtype=np.intp)
+    seen = np.zeros(mask.shape[1], dtype=np.intp)
+    for k, row in enumerate(mask):
+        result[row & (seen == pick)] = k
+        seen += row
+    return result
+
+class VectorEnv:
+    """num_envs局对局的批量环境
+
+    动作为每局一个整数：(y * 宽 + x) * 方向数 + 方向（方向见war_ai.move_offsets），负数表示不移动；
+    不合法的动作同样视为不移动，电脑回合照常进行。观察为(N, 2, 高, 宽)的归属和士兵组数平面。
+    """
+
+    def __init__(self, num_envs, width=GRID_WIDTH, height=GRID_HEIGHT, num_ai=5, reward_step=3, move_range=2,
+                 max_turns=1000, seed=None):
+        self.num_envs = num_envs
+        self.width = width
+        self.height = height
+        self.num_countries = num_ai + 1
+        self.reward_step = reward_step
+        self.move_range = move_range
+        self.max_turns = max_turns
+        self.offsets = move_offsets(move_range)
+        self.rng = np.random.default_rng(seed)
+
+        # 填充后的展平布局：pitch为行宽，cells为每个格子（行优先）在展平数组中的下标
+        r = move_range
+        self.pitch = pitch = width + 2 * r
+        size = (height + 2 * r) * pitch
+        ys, xs = np.divmod(np.arange(height * width), width)
+        self.cells = (ys + r) * pitch + xs + r
+        self.deltas = np.array([dy * pitch + dx for dx, dy in self.offsets], dtype=np.intp)
+        self.neighbours = np.array([-pitch, pitch, -1, 1], dtype=np.intp)
+        self.blank = np.full(size, OUTSIDE, dtype=np.int16)
+        self.blank[self.cells] = EMPTY
+        # 每个方向、每个格子的目标是否在地图内，与棋盘内容无关
+        self.inside = self.blank[self.deltas[:, None] + self.cells] != OUTSIDE
+
+        self.size = size
+        self.owner = np.empty((num_envs, size), dtype=np.int16)
+        self.troops = np.zeros((num_envs, size), dtype=np.int32)
+        # 所有对局连在一起的一维视图：第g局的下标p对应位置g * size + p，批量读写只需一次一维索引
+        self.flat_owner = self.owner.reshape(-1)
+        self.flat_troops = self.troops.reshape(-1)
+        shape = (num_envs, self.num_countries)
+        self.territory = np.zeros(shape, dtype=np.int32)  # 当前领土
+        self.total = np.zeros(shape, dtype=np.int32)      # 总共占领过的领土
+        self.next_reward = np.zeros(shape, dtype=np.int32)
+        self.strength = np.zeros(shape, dtype=np.int32)   # 士兵组总数
+        self.defeated = np.zeros(shape, dtype=bool)
+        self.turns = np.zeros(num_envs, dtype=np.int32)
+        self.reset()
+
+    def reset(self, games=None):
+        """重新开始games中的对局（默认全部），返回所有对局的观察"""
+        games = np.arange(self.num_envs) if games is None else np.asarray(games, dtype=np.intp)
+        count = self.num_countries
+        xs, ys = self._spawn_positions(len(games))
+        r = self.move_range
+        cells = (ys + r) * self.pitch + xs + r
+        self.owner[games] = self.blank
+        self.troops[games] = 0
+        self.owner[games[:, None], cells] = np.arange(count)
+        self.troops[games[:, None], cells] = 1
+        for array in (self.territory, self.total, self.strength):
+            array[games] = 1
+        self.next_reward[games] = self.reward_step
+        self.defeated[games] = False
+        self.turns[games] = 0
+        return self.observe()
+
+    def _spawn_positions(self, num_games):
+        """与WarEngine.initialize_game相同的初始位置：间距不足4格的候选被拒绝，尝试过多时只要求不重叠"""
+        count = self.num_countries
+        xs = np.zeros((num_games, count), dtype=np.intp)
+        ys = np.zeros((num_games, count), dtype=np.intp)
+        for i in range(count):
+            pending = np.arange(num_games)
+            attempts = 0
+            while len(pending):
+                x = self.rng.integers(2, self.width - 2, size=(len(pending), SPAWN_BATCH))
+                y = self.rng.integers(2, self.height - 2, size=(len(pending), SPAWN_BATCH))
+                dx = np.abs(x[:, :, None] - xs[pending, None, :i])
+                dy = np.abs(y[:, :, None] - ys[pending, None, :i])
+                if attempts < SPAWN_ATTEMPTS:
+                    clash = (dx < 4) & (dy < 4)
+                else:
+                    clash = (dx == 0) & (dy == 0)
+                ok = ~clash.any(axis=2)
+                first = ok.argmax(axis=1)
+                found = ok[np.arange(len(pending)), first]
+                placed = pending[found]
+                xs[placed, i] = x[found, first[found]]
+                ys[placed, i] = y[found, first[found]]
+                pending = pending[~found]
+                attempts += SPAWN_BATCH
+        return xs, ys
+
+    def grid(self, array):
+        """去掉填充的(N, 高, 宽)视图"""
+        r = self.move_range
+        return array.reshape(self.num_envs, -1, self.pitch)[:, r:r + self.height, r:r + self.width]
+
+    def observe(self):
+        """(N, 2, 高, 宽)：归属平面（EMPTY/NEUTRAL或国家编号，0为受控国家）和士兵组数平面"""
+        obs = np.empty((self.num_envs, 2, self.height, self.width), dtype=np.int32)
+        obs[:, 0] = self.grid(self.owner)
+        obs[:, 1] = self.grid(self.troops)
+        return obs
+
+    def legal_mask(self):
+        """(N, 格子数 * 方向数)的合法动作掩码：从受控国家有士兵的格子移动到地图内"""
+        stacks = ((self.grid(self.owner) == 0) & (self.grid(self.troops) > 0)).reshape(self.num_envs, -1)
+        return (stacks[:, :, None] & self.inside.T).reshape(self.num_envs, -1)
+
+    def sample_actions(self):
+        """每局随机选一个合法动作（随机选有士兵的格子，再随机选方向），没有时为-1"""
+        stacks = (self.grid(self.owner) == 0) & (self.grid(self.troops) > 0)
+        games, tiles = np.nonzero(stacks.reshape(self.num_envs, -1))
+        order = np.lexsort((self.rng.random(len(games)), games))
+        last = order[np.flatnonzero(np.r_[games[order][1:] != games[order][:-1], True])] if len(games) else order
+        tiles = tiles[last]
+        actions = np.full(self.num_envs, -1, dtype=np.intp)
+        actions[games[last]] = tiles * len(self.offsets) + choose_row(self.inside[:, tiles], self.rng)
+        return actions
+
+    def step(self, actions):
+        """所有对局各进行一个回合：受控国家的动作、电脑回合、回合结算
+
+        返回(观察, 奖励, 结束, 信息)：奖励为受控国家本回合的领土变化；
+        受控国家被消灭、只剩一个国家或达到max_turns时结束，结束的对局随即重新开始，
+        返回的观察是新对局的第一个观察，信息中的winner（无胜者为-1）和turns是结束前的值。
+        """
+        n = self.num_envs
+        before = self.territory[:, 0].copy()
+        actions = np.asarray(actions, dtype=np.intp)
+        num_dirs = len(self.offsets)
+        valid = (actions >= 0) & (actions < len(self.cells) * num_dirs)
+        tile, d = np.divmod(np.where(valid, actions, 0), num_dirs)
+        games = np.arange(n)
+        src = games * self.size + self.cells[tile]
+        dst = src + self.deltas[d]
+        valid &= (self.flat_owner[src] == 0) & (self.flat_troops[src] > 0) & (self.flat_owner[dst] != OUTSIDE)
+        games = games[valid]
+        self._apply(games, np.zeros(len(games), dtype=np.intp), src[valid], dst[valid])
+
+        self.ai_turn()
+
+        self.turns += 1
+        alive = (~self.defeated).sum(axis=1)
+        winner = np.where(alive == 1, self.defeated.argmin(axis=1), -1)
+        done = (alive <= 1) | self.defeated[:, 0] | (self.turns >= self.max_turns)
+        reward = (self.territory[:, 0] - before).astype(np.float32)
+        info = {"winner": winner, "turns": self.turns.copy()}
+        if done.any():
+            self.reset(np.flatnonzero(done))
+        return self.observe(), reward, done, info
+
+    def ai_turn(self):
+        """所有对局的电脑回合：与WarEngine.ai_turn_steps相同，在回合开始时一次规划所有电脑国家，
+        按国家顺序执行，已失效或缺失的移动在当前棋盘上重新规划
+
+        电脑国家的士兵组只会因自己的行动出现在新的格子上，因此重新规划时只需检查回合开始时有士兵的格子。
+        """
+        stacks = np.flatnonzero(self.flat_troops)
+        owner = self.flat_owner[stacks]
+        stacks, owner = stacks[owner >= 1], owner[owner >= 1]
+        src, dst = self._plan(stacks)
+        for cid in range(1, self.num_countries):
+            active = np.flatnonzero(~self.defeated[:, cid] & (self.strength[:, cid] > 0))
+            s, t = src[active, cid], dst[active, cid]
+            valid = s >= 0
+            valid[valid] = self._still_valid(cid, s[valid], t[valid])
+            if not valid.all():
+                stale = np.zeros(self.num_envs, dtype=bool)
+                stale[active[~valid]] = True
+                mine = stacks[(owner == cid) & stale[stacks // self.size]]
+                replan_src, replan_dst = self._plan(mine)
+                s[~valid], t[~valid] = replan_src[active[~valid], cid], replan_dst[active[~valid], cid]
+            move = s >= 0
+            moving = active[move]
+            self._apply(moving, np.full(len(moving), cid, dtype=np.intp), s[move], t[move])
+
+    def _still_valid(self, cid, src, dst):
+        """与WarEngine.is_valid_ai_move相同"""
+        count = self.flat_troops[src]
+        target = self.flat_owner[dst]
+        return ((self.flat_owner[src] == cid) & (count > 0)
+                & ((target == EMPTY) | ((target >= 0) & (target != cid) & (count >= self.flat_troops[dst]))))
+
+    def _plan(self, stacks):
+        """贪心策略（与war_ai.greedy_moves相同）：在stacks（一维下标）中为所属的电脑国家选择移动
+
+        候选出发格子为有士兵的边境格子，国家没有时为所有有士兵的格子；随机选一个有可行目标的格子，再随机选一个可行目标。
+        返回(对局数, 国家数)的出发和目标一维下标，没有移动时为-1。
+        """
+        count = self.num_countries
+        flat_owner, flat_troops = self.flat_owner, self.flat_troops
+        owner = flat_owner[stacks]
+        troops = flat_troops[stacks]
+        keep = (owner >= 1) & (troops > 0)
+        stacks, owner, troops = stacks[keep], owner[keep], troops[keep]
+
+        # 边境格子：相邻格子为空白或他国领土；后方的士兵组通常占多数，先排除再评估移动
+        neighbour = flat_owner[self.neighbours[:, None] + stacks]
+        frontier = any_of((neighbour == EMPTY) | ((neighbour >= 0) & (neighbour != owner)))
+        group = stacks // self.size * count + owner
+        has_frontier = np.bincount(group[frontier], minlength=self.num_envs * count) > 0
+        source = frontier | ~has_frontier[group]
+        stacks, owner, troops, group = stacks[source], owner[source], troops[source], group[source]
+
+        # 可行目标：空白格子，或实力不强于自己的他国格子
+        targets = self.deltas[:, None] + stacks
+        target = flat_owner[targets]
+        viable = (target == EMPTY) | ((target >= 0) & (target != owner) & (troops >= flat_troops[targets]))
+        candidate = any_of(viable)
+        stacks, group, targets, viable = stacks[candidate], group[candidate], targets[:, candidate], viable[:, candidate]
+
+        # 每组内随机选一个候选格子：按组加随机小数排序后取每组的最后一个
+        order = np.argsort(group + self.rng.random(len(group)))
+        sorted_group = group[order]
+        last = np.flatnonzero(np.r_[sorted_group[1:] != sorted_group[:-1], True]) if len(group) else order
+        pick = order[last]
+        direction = choose_row(viable[:, pick], self.rng)
+
+        src = np.full(self.num_envs * count, -1, dtype=np.intp)
+        dst = np.full(self.num_envs * count, -1, dtype=np.intp)
+        src[sorted_group[last]] = stacks[pick]
+        dst[sorted_group[last]] = targets[direction, pick]
+        return src.reshape(-1, count), dst.reshape(-1, count)
+
+    def _apply(self, games, cids, src, dst):
+        """执行一批已验证的移动（每局最多一个，src/dst为一维下标）：
+        与WarEngine.apply_move和resolve_battle相同的占领、合并、战斗"""
+        owner, troops = self.flat_owner, self.flat_troops
+        count = troops[src]
+        troops[src] = 0
+        target = owner[dst].astype(np.intp)
+        defence = troops[dst]
+        merge = target == cids
+        battle = (target != EMPTY) & ~merge
+        capture = ~merge & (count >= defence)
+        # 合并时相加；占领空白格子时defence为0；战斗中胜者保留差值
+        troops[dst] = np.where(merge, count + defence, np.abs(count - defence))
+        losses = np.where(battle, np.minimum(count, defence), 0)
+        self.strength[games, cids] -= losses
+        defender = battle & (target >= 0)
+        self.strength[games[defender], target[defender]] -= losses[defender]
+
+        games, cids, dst, target = games[capture], cids[capture], dst[capture], target[capture]
+        owner[dst] = cids
+        self.territory[games, cids] += 1
+        self.total[games, cids] += 1
+        # 失去最后一块领土的国家被消灭（没有剩余领土需要释放为中立）
+        fallen = target >= 0
+        self.territory[games[fallen], target[fallen]] -= 1
+        self.defeated[games[fallen], target[fallen]] |= self.territory[games[fallen], target[fallen]] <= 0
+        self._reward(games, cids)
+
+    def _reward(self, games, cids):
+        """与Country.add_territory相同：达到奖励阈值时在随机的安全格子上生成一个士兵组"""
+        due = self.total[games, cids] >= self.next_reward[games, cids]
+        games, cids = games[due], cids[due]
+        self.next_reward[games, cids] += self.reward_step
+        armed = self.strength[games, cids] > 0
+        games, cids = games[armed], cids[armed]
+        if not len(games):
+            return
+        # 安全格子：上下左右（地图内）没有他国或中立领土
+        first, last = self.cells[0], self.cells[-1] + 1
+        owner = self.owner[games]
+        cids = cids[:, None]
+        allowed = (owner == cids) | (owner == EMPTY) | (owner == OUTSIDE)
+        safe = owner[:, first:last] == cids
+        for offset in self.neighbours:
+            safe &= allowed[:, first + offset:last + offset]
+        # 每局在自己的安全格子中均匀随机选一个：安全格子按局连续排列，按数量抽取序号
+        tiles = np.flatnonzero(safe)
+        counts = np.bincount(tiles // safe.shape[1], minlength=len(games))
+        found = counts > 0
+        starts = np.cumsum(counts) - counts
+        tiles = tiles[starts[found] + (self.rng.random(int(found.sum())) * counts[found]).astype(np.intp)]
+        games, cids = games[found], cids[found, 0]
+        self.flat_troops[games * self.size + first + tiles % safe.shape[1]] += 1
+        self.strength[games, cids] += 1
+
+    def engine(self, i):
+        """把第i局转换为WarEngine（例如用于查看、录像或与搜索型电脑对比），士兵组按行优先顺序重新编号"""
+        owner = self.grid(self.owner)[i]
+        troop_count = self.grid(self.troops)[i]
+        countries = np.stack((self.territory[i], self.total[i], self.next_reward[i], self.defeated[i]),
+                             axis=1).astype(np.int64)
+        alive = np.flatnonzero(~self.defeated[i])
+        num_troops = int(troop_count.sum())
+        state = GameState(owner.copy(), troop_count.copy(), np.arange(num_troops, dtype=np.int64), countries,
+                          num_troops, int(self.turns[i]), len(alive) == 1, int(alive[0]) if len(alive) == 1 else -1)
+        return WarEngine(self.width, self.height, num_ai=self.num_countries - 1, reward_step=self.reward_step,
+                         move_range=self.move_range, state=state)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量对局环境的吞吐量：受控国家随机走合法的动作")
+    parser.add_argument("--envs", type=int, default=1024, help="同时进行的对局数")
+    parser.add_argument("--steps", type=int, default=200, help="每局的步数")
+    parser.add_argument("--width", type=int, default=GRID_WIDTH)
+    parser.add_argument("--height", type=int, default=GRID_HEIGHT)
+    parser.add_argument("--ai", type=int, default=5, help="电脑国家数量")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    env = VectorEnv(args.envs, args.width, args.height, num_ai=args.ai, seed=args.seed)
+    finished = wins = 0
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        _, _, done, info = env.step(env.sample_actions())
+        finished += int(done.sum())
+        wins += int((info["winner"][done] == 0).sum())
+    elapsed = time.perf_counter() - start
+    print(f"{args.envs}局 x {args.steps}步 用时{elapsed:.2f}秒 ({args.envs * args.steps / elapsed:.0f}步/秒)，"
+          f"结束{finished}局，受控国家获胜{wins}局")
+
+if __name__ == "__main__":
+    main()
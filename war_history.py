@@ -0,0 +1,216 @@
+import functools
+from collections import deque
+
+import numpy as np
+
+# 可撤销的走子记录和紧凑的游戏状态
+#
+# 每一步（玩家或电脑的一次移动、一次战斗结算、回合结算）记录为一个Delta：
+# 被修改的格子在修改前后的归属和士兵组，以及受影响国家和引擎计数器在修改前后的值。
+# 国家士兵登记表等于其领土上的士兵组，士兵组坐标等于所在格子，都由格子内容推出，不单独记录。
+# 撤销和重做只处理记录中的格子，开销与本步的改动量成正比，与地图大小无关。
+
+# 引擎事件：每记录完一步后发出，参数为该步的Delta（录像据此写入文件，见war_replay）
+STEP_RECORDED = "step_recorded"
+
+def country_state(country):
+    return country.current_territory, country.total_territory, country.next_reward, country.defeated
+
+def engine_state(engine):
+    return engine.next_troop_id, engine.turn_count, engine.game_over, engine.winner
+
+class Delta:
+    """一步的所有改动：格子 -> [旧归属, 旧士兵组, 新归属, 新士兵组]，国家编号 -> [旧状态, 新状态]"""
+    __slots__ = ('actor', 'move', 'tiles', 'countries', 'before', 'after')
+
+    def __init__(self, actor, move, before):
+        self.actor = actor  # 行动的国家编号，回合结算为None
+        self.move = move    # (from_x, from_y, to_x, to_y)，不是一次移动时为None
+        self.tiles = {}
+        self.countries = {}
+        self.before = before
+        self.after = None
+
+class MoveLog:
+    """走子记录：由棋盘在修改格子前通知（见Board.journal），支持撤销、重做
+
+    limit为最多保留的步数，超出时丢弃最早的记录。
+    """
+
+    def __init__(self, engine, limit=None):
+        self.engine = engine
+        self.done = deque(maxlen=limit)  # 可撤销的步
+        self.undone = []                 # 可重做的步（撤销后产生新的一步时清空）
+        self.current = None              # 正在记录的一步
+        self.depth = 0                   # 嵌套记录的层数，内层并入外层
+
+    def clear(self):
+        self.done.clear()
+        self.undone.clear()
+
+    def begin(self, actor=None, move=None):
+        self.depth += 1
+        if self.depth > 1:
+            return
+        self.current = Delta(actor.cid if actor else None, move, engine_state(self.engine))
+        if actor:
+            self.watch(actor.cid)
+
+    def end(self):
+        self.depth -= 1
+        if self.depth:
+            return
+        delta, self.current = self.current, None
+        engine = self.engine
+        delta.after = engine_state(engine)
+        if not delta.tiles and delta.after == delta.before:
+            return  # 没有任何改动（例如无效的移动）
+        board = engine.board
+        for (x, y), change in delta.tiles.items():
+            change[2] = int(board.owner[y, x])
+            change[3] = tuple(board.troops_at(x, y))
+        for cid, change in delta.countries.items():
+            change[1] = country_state(engine.countries[cid])
+        self.done.append(delta)
+        self.undone.clear()
+        engine.emit(STEP_RECORDED, delta)
+
+    def watch(self, cid):
+        """记录国家在本步中第一次被改动前的状态"""
+        countries = self.current.countries
+        if cid >= 0 and cid not in countries:
+            countries[cid] = [country_state(self.engine.countries[cid]), None]
+
+    def touch(self, x, y, owner=-1):
+        """棋盘在修改格子(x, y)前调用；owner为将要设置的新归属"""
+        delta = self.current
+        if delta is None:
+            return  # 不在记录中（例如正在撤销）
+        if (x, y) not in delta.tiles:
+            board = self.engine.board
+            old = int(board.owner[y, x])
+            delta.tiles[(x, y)] = [old, tuple(board.troops_at(x, y)), None, None]
+            self.watch(old)
+        if owner >= 0:
+            self.watch(owner)
+
+    def rollback(self, delta):
+        """把棋盘和国家恢复到delta之前的状态"""
+        self._restore(delta, 0, 0)
+
+    def apply(self, delta):
+        """把棋盘和国家恢复到delta之后的状态"""
+        self._restore(delta, 2, 1)
+
+    def _restore(self, delta, tile_side, state_side):
+        engine = self.engine
+        board = engine.board
+        countries = engine.countries
+        # 先注销所有涉及格子上现有的士兵组，再登记恢复后的士兵组：
+        # 同一个士兵组可能在本步中从一个格子移到另一个格子
+        for x, y in delta.tiles:
+            owner = board.owner[y, x]
+            if owner >= 0:
+                countries[owner].discharge(board.troops_at(x, y))
+        for (x, y), change in delta.tiles.items():
+            owner, troops = change[tile_side], change[tile_side + 1]
+            board.set_owner(x, y, owner)
+            board.set_troops(x, y, list(troops))
+            for troop in troops:
+                troop.x = x
+                troop.y = y
+            if owner >= 0:
+                countries[owner].enlist(troops)
+        for cid, change in delta.countries.items():
+            country = countries[cid]
+            (country.current_territory, country.total_territory,
+             country.next_reward, country.defeated) = change[state_side]
+        state = delta.before if state_side == 0 else delta.after
+        engine.next_troop_id, engine.turn_count, engine.game_over, engine.winner = state
+
+    def undo(self):
+        """撤销最近的一步，返回该步；没有可撤销的步时返回None"""
+        if not self.done:
+            return None
+        delta = self.done.pop()
+        self.rollback(delta)
+        self.undone.append(delta)
+        return delta
+
+    def redo(self):
+        """重做最近撤销的一步，返回该步；没有可重做的步时返回None"""
+        if not self.undone:
+            return None
+        delta = self.undone.pop()
+        self.apply(delta)
+        self.done.append(delta)
+        return delta
+
+def recorded(step):
+    """装饰器：方法执行期间的所有改动记录为一步（嵌套调用并入外层）
+
+    step(*args)返回(引擎, 行动的国家或None, 移动或None)。引擎未开启记录时只多一次函数调用。
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            engine, actor, move = step(*args)
+            log = engine.history
+            if log is None:
+                return method(*args, **kwargs)
+            log.begin(actor, move)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                log.end()
+        return wrapper
+    return decorate
+
+class GameState:
+    """游戏状态的紧凑形式，用于分叉对局而不必深拷贝棋盘和国家对象
+
+    owner/troop_count为棋盘数组的副本，troop_ids为所有士兵组的id，
+    按格子的行优先顺序、格子内按列表顺序排列（每格的数量即troop_count）。
+    countries为每个国家的(当前领土, 总领土, 下一次奖励, 是否被消灭)。
+    spawn_order为各国家安全格子索引中格子的行优先编号，按索引的顺序排列，使载入后生成士兵组的随机结果不变；
+    为None时（例如录像的关键帧）按行优先顺序重建。
+    capture得到的数组是只读的，载入时会被复制，同一个状态可以载入多次。
+    """
+    __slots__ = ('owner', 'troop_count', 'troop_ids', 'countries',
+                 'next_troop_id', 'turn_count', 'game_over', 'winner', 'hash', 'spawn_order')
+
+    def __init__(self, owner, troop_count, troop_ids, countries, next_troop_id, turn_count, game_over, winner,
+                 board_hash=None, spawn_order=None):
+        self.owner = owner
+        self.troop_count = troop_count
+        self.troop_ids = troop_ids
+        self.countries = countries
+        self.next_troop_id = next_troop_id
+        self.turn_count = turn_count
+        self.game_over = game_over
+        self.winner = winner  # 胜利国家的编号，未结束时为-1
+        self.hash = board_hash  # 棋盘哈希，为None时载入时重新计算
+        self.spawn_order = spawn_order
+
+    @classmethod
+    def capture(cls, engine):
+        board = engine.board
+        ys, xs = np.nonzero(board.troop_count)
+        troop_ids = np.fromiter((troop.id for x, y in zip(xs.tolist(), ys.tolist())
+                                 for troop in board.tile_troops[(x, y)]),
+                                dtype=np.int64, count=int(board.troop_count.sum()))
+        countries = np.array([country_state(country) for country in engine.countries],
+                             dtype=np.int64).reshape(-1, 4)
+        width = board.width
+        spawn_order = np.fromiter((y * width + x for country in engine.countries for x, y in country.safe),
+                                  dtype=np.int32, count=sum(len(country.safe) for country in engine.countries))
+        owner = board.owner.copy()
+        troop_count = board.troop_count.copy()
+        for array in (owner, troop_count, troop_ids, countries, spawn_order):
+            array.flags.writeable = False
+        return cls(owner, troop_count, troop_ids, countries, engine.next_troop_id, engine.turn_count,
+                   engine.game_over, engine.winner.cid if engine.winner else -1, board.hash, spawn_order)
+
+    def nbytes(self):
+        spawn = self.spawn_order.nbytes if self.spawn_order is not None else 0
+        return self.owner.nbytes + self.troop_count.nbytes + self.troop_ids.nbytes + self.countries.nbytes + spawn
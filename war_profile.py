@@ -0,0 +1,145 @@
+import json
+import time
+from collections import deque
+
+# 可选的性能统计：各阶段的耗时、扫描和评估的计数，以及每帧处理时间的直方图
+#
+# 统计通过在对象实例上替换方法实现（见Profiler.wrap），不修改规则和绘制代码；
+# detach后恢复原方法。未开启统计时代码路径与没有本模块时完全相同，没有任何开销。
+
+FRAME_BUCKETS = (2, 4, 8, 16, 33, 66)  # 帧时间直方图的分界（毫秒），最后一档为超过66毫秒
+
+class Profiler:
+    """按阶段计时和计数
+
+    阶段可以嵌套（例如移动中的领土奖励），每个阶段的时间包含其内部的阶段；
+    一帧的处理时间为该帧内最外层阶段的时间之和，不包括等待输入的空闲时间。
+    """
+
+    def __init__(self, window=600):
+        self.phases = {}     # 阶段名 -> [次数, 总时间, 最长时间]（秒）
+        self.breakdown = {}  # 阶段名 -> {细分键 -> [次数, 总时间]}，例如每个电脑国家的行动时间
+        self.counters = {}   # 计数器名 -> 累计值
+        self.frames = deque(maxlen=window)  # 最近的帧处理时间（秒）
+        self.histogram = [0] * (len(FRAME_BUCKETS) + 1)
+        self.busy = 0.0      # 本帧内最外层阶段的累计时间
+        self.depth = 0
+        self.patched = []    # 被替换的(对象, 方法名)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def wrap(self, obj, attr, name, key=None, before=None, after=None):
+        """把obj.attr替换为计时版本，计入阶段name
+
+        key(*args)给出细分键；before(*args)在调用前、after(result, *args)在调用后执行（不计入耗时），用于计数。
+        """
+        method = getattr(obj, attr)
+        stats = self.phases.setdefault(name, [0, 0.0, 0.0])
+        parts = self.breakdown.setdefault(name, {}) if key else None
+
+        def timed(*args, **kwargs):
+            if before:
+                before(*args)
+            self.depth += 1
+            start = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.depth -= 1
+                stats[0] += 1
+                stats[1] += elapsed
+                if elapsed > stats[2]:
+                    stats[2] = elapsed
+                if parts is not None:
+                    part = parts.setdefault(key(*args), [0, 0.0])
+                    part[0] += 1
+                    part[1] += elapsed
+                if not self.depth:
+                    self.busy += elapsed
+            if after:
+                after(result, *args)
+            return result
+
+        setattr(obj, attr, timed)
+        self.patched.append((obj, attr))
+
+    def attach_engine(self, engine):
+        """统计规则核心：玩家移动、每个电脑国家的行动和规划、领土奖励的位置搜索"""
+        self.wrap(engine, 'player_move', 'move_troops')
+        self.wrap(engine, 'ai_move', 'ai_turn', key=lambda country, *move: country.name)
+        # 回合开始时为所有电脑国家批量规划；预先规划的移动失效时或使用搜索型电脑时逐个国家重新规划
+        self.wrap(engine, 'plan_ai_moves', 'ai_plan')
+        # 同时行动模式下所有命令一起结算
+        self.wrap(engine, 'resolve_orders', 'resolve_orders')
+        self.wrap(engine, 'plan_ai_move', 'ai_replan', after=lambda move, country: self._count_search(engine))
+        # 收集候选出发格子时扫描所有有士兵的格子，贪心电脑对每个候选格子评估所有移动方向
+        self.wrap(engine, 'ai_sources', 'ai_sources', after=lambda result, countries: self._count_sources(engine, result))
+        for country in engine.countries:
+            self.wrap(country, 'add_territory', 'add_territory')
+
+    def _count_search(self, engine):
+        if engine.searcher:
+            self.count('search_nodes', engine.searcher.nodes)
+
+    def _count_sources(self, engine, result):
+        self.count('tiles_scanned', len(engine.board.tile_troops))
+        self.count('moves_evaluated', len(result[0]) * len(engine.move_offsets))
+
+    def detach(self):
+        """恢复所有被替换的方法"""
+        for obj, attr in reversed(self.patched):
+            delattr(obj, attr)
+        self.patched.clear()
+
+    def end_frame(self):
+        """一帧结束：记录本帧的处理时间"""
+        frame, self.busy = self.busy, 0.0
+        self.frames.append(frame)
+        ms = frame * 1000
+        bucket = 0
+        while bucket < len(FRAME_BUCKETS) and ms >= FRAME_BUCKETS[bucket]:
+            bucket += 1
+        self.histogram[bucket] += 1
+
+    def mean(self, name):
+        """阶段的平均耗时（毫秒）"""
+        count, total, _ = self.phases.get(name, (0, 0.0, 0.0))
+        return total / count * 1000 if count else 0.0
+
+    def histogram_labels(self):
+        return [f"<{bound}" for bound in FRAME_BUCKETS] + [f">{FRAME_BUCKETS[-1]}"]
+
+    def summary(self, labels):
+        """信息面板上显示的文字：帧时间和直方图、各阶段平均耗时、计数器
+
+        labels为[(阶段名, 显示名)]
+        """
+        frames = self.frames
+        average = sum(frames) / len(frames) * 1000 if frames else 0.0
+        longest = max(frames, default=0.0) * 1000
+        histogram = " ".join(f"{label}:{n}" for label, n in zip(self.histogram_labels(), self.histogram))
+        phases = " ".join(f"{label}{self.mean(name):.2f}" for name, label in labels)
+        counters = self.counters
+        return [f"帧 平均{average:.1f} 最长{longest:.1f}ms  {histogram}",
+                f"平均耗时(ms) {phases}",
+                f"扫描格子{counters.get('tiles_scanned', 0)} 评估移动{counters.get('moves_evaluated', 0)}"]
+
+    def report(self):
+        """所有统计结果（可写入JSON）"""
+        return {
+            "phases": {name: {"count": count, "total_ms": total * 1000, "mean_ms": self.mean(name),
+                              "max_ms": longest * 1000}
+                       for name, (count, total, longest) in self.phases.items()},
+            "breakdown": {name: {key: {"count": count, "total_ms": total * 1000}
+                                 for key, (count, total) in parts.items()}
+                          for name, parts in self.breakdown.items() if parts},
+            "counters": dict(self.counters),
+            "frames": {"histogram_ms": dict(zip(self.histogram_labels(), self.histogram)),
+                       "recent_mean_ms": sum(self.frames) / len(self.frames) * 1000 if self.frames else 0.0},
+        }
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
@@ -0,0 +1,278 @@
+import numpy as np
+import pygame
+
+from war_board import EMPTY
+
+# 颜色
+BACKGROUND = (30, 30, 50)
+GRID_COLOR = (60, 60, 80)
+PANEL_COLOR = (40, 40, 60)
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+HIGHLIGHT = (255, 255, 255, 100)
+NEUTRAL_COLOR = (100, 100, 100)  # 中立领土颜色
+
+# 可选的格子像素大小（缩放级别）
+ZOOM_LEVELS = [4, 6, 8, 12, 16, 24, 32, 40, 48, 64]
+MIN_GLYPH_TILE = 20  # 格子小于该尺寸时不显示兵力数字
+
+class Camera:
+    """视口：决定地图的哪一部分显示在屏幕的view_rect区域内，支持平移和缩放
+
+    (x, y)是视口左上角在当前缩放下的地图像素坐标。
+    """
+
+    def __init__(self, view_rect, grid_width, grid_height, tile_size):
+        self.view_rect = pygame.Rect(view_rect)
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.tile_size = tile_size
+        self.x = 0
+        self.y = 0
+        self.version = 0  # 每次平移或缩放后递增，渲染器据此整屏重绘
+
+    def _clamp(self):
+        max_x = max(0, self.grid_width * self.tile_size - self.view_rect.width)
+        max_y = max(0, self.grid_height * self.tile_size - self.view_rect.height)
+        self.x = min(max(0, self.x), max_x)
+        self.y = min(max(0, self.y), max_y)
+
+    def pan(self, dx, dy):
+        old = self.x, self.y
+        self.x += dx
+        self.y += dy
+        self._clamp()
+        if (self.x, self.y) != old:
+            self.version += 1
+
+    def center_on(self, tile_x, tile_y):
+        ts = self.tile_size
+        self.x = tile_x * ts + ts // 2 - self.view_rect.width // 2
+        self.y = tile_y * ts + ts // 2 - self.view_rect.height // 2
+        self._clamp()
+        self.version += 1
+
+    def zoom(self, steps, anchor=None):
+        """按缩放级别放大(steps>0)或缩小，保持anchor处的地图位置不动"""
+        levels = ZOOM_LEVELS
+        index = min(range(len(levels)), key=lambda i: abs(levels[i] - self.tile_size))
+        index = min(max(0, index + steps), len(levels) - 1)
+        new_size = levels[index]
+        if new_size == self.tile_size:
+            return
+        if anchor is None:
+            anchor = self.view_rect.center
+        ax = anchor[0] - self.view_rect.x
+        ay = anchor[1] - self.view_rect.y
+        # 锚点下的地图坐标（以格子为单位）
+        world_x = (self.x + ax) / self.tile_size
+        world_y = (self.y + ay) / self.tile_size
+        self.tile_size = new_size
+        self.x = int(world_x * new_size - ax)
+        self.y = int(world_y * new_size - ay)
+        self._clamp()
+        self.version += 1
+
+    def visible_tiles(self):
+        """视口内（包括部分可见）的格子范围：x0 <= x < x1, y0 <= y < y1"""
+        ts = self.tile_size
+        x0 = self.x // ts
+        y0 = self.y // ts
+        x1 = min(self.grid_width, -(-(self.x + self.view_rect.width) // ts))
+        y1 = min(self.grid_height, -(-(self.y + self.view_rect.height) // ts))
+        return x0, y0, x1, y1
+
+    def tile_rect(self, x, y):
+        ts = self.tile_size
+        return pygame.Rect(self.view_rect.x + x * ts - self.x, self.view_rect.y + y * ts - self.y, ts, ts)
+
+    def world_rect(self):
+        """地图在屏幕上的可见区域"""
+        rect = pygame.Rect(self.view_rect.x - self.x, self.view_rect.y - self.y,
+                           self.grid_width * self.tile_size, self.grid_height * self.tile_size)
+        return rect.clip(self.view_rect)
+
+    def screen_to_tile(self, pos):
+        """屏幕坐标 -> 格子坐标，不在地图上时返回None"""
+        if not self.view_rect.collidepoint(pos):
+            return None
+        x = (pos[0] - self.view_rect.x + self.x) // self.tile_size
+        y = (pos[1] - self.view_rect.y + self.y) // self.tile_size
+        if 0 <= x < self.grid_width and 0 <= y < self.grid_height:
+            return x, y
+        return None
+
+class BoardRenderer:
+    """保留式渲染器：网格背景和兵力数字只绘制一次并缓存，每帧只重绘视口内变化的格子
+
+    render()返回本帧实际改动的屏幕区域，交给pygame.display.update。
+    整屏重绘只遍历视口内的格子，开销与地图大小无关。
+    """
+
+    def __init__(self, screen, board, countries, camera, font, move_offsets):
+        self.screen = screen
+        self.board = board
+        self.countries = countries
+        self.camera = camera
+        self.font = font
+        self.move_offsets = move_offsets  # 选中士兵后高亮的可移动范围
+        self.panel_rect = pygame.Rect(0, camera.view_rect.bottom, screen.get_width(),
+                                      screen.get_height() - camera.view_rect.bottom)
+
+        self.background = None       # 比视口大一格的网格背景，随缩放级别重建
+        self.background_tile = None
+        self.glyphs = {}        # 兵力数字 -> 文字贴图
+        self.highlight = {}     # 高亮格子 -> 边框宽度
+        self.panel_key = None   # 上次绘制的信息面板内容
+        self.overlay_key = None
+        self.camera_version = None
+        self.full_redraw = True
+
+        board.track_dirty()
+
+    def _build_background(self):
+        """绘制网格背景（底色和网格线）到缓存表面"""
+        ts = self.camera.tile_size
+        width = self.camera.view_rect.width + ts
+        height = self.camera.view_rect.height + ts
+        surface = pygame.Surface((width, height))
+        surface.fill(BACKGROUND)
+        for x in range(0, width, ts):
+            pygame.draw.line(surface, GRID_COLOR, (x, 0), (x, height))
+        for y in range(0, height, ts):
+            pygame.draw.line(surface, GRID_COLOR, (0, y), (width, y))
+        self.background = surface
+        self.background_tile = ts
+
+    def invalidate(self):
+        """下一帧整屏重绘（例如重新开始游戏后）"""
+        self.full_redraw = True
+
+    def glyph(self, count):
+        text = self.glyphs.get(count)
+        if text is None:
+            text = self.font.render(str(count), True, BLACK)
+            self.glyphs[count] = text
+        return text
+
+    def _highlight_tiles(self, selected):
+        if not selected:
+            return {}
+        x, y = selected
+        tiles = {(x, y): 3}
+        # 绘制可移动范围
+        for dx, dy in self.move_offsets:
+            nx, ny = x + dx, y + dy
+            if self.board.in_bounds(nx, ny):
+                tiles[(nx, ny)] = 2
+        return tiles
+
+    def _draw_tile(self, x, y):
+        ts = self.camera.tile_size
+        rect = self.camera.tile_rect(x, y)
+        owner = self.board.owner[y, x]
+        if owner == EMPTY:
+            # 空白格子直接从缓存的背景复制（背景的每一格都相同）
+            self.screen.blit(self.background, rect, pygame.Rect(0, 0, ts, ts))
+        elif owner >= 0:
+            pygame.draw.rect(self.screen, self.countries[owner].color, rect)
+
+            # 绘制士兵组，格子太小时只画圆点
+            troop_count = self.board.troop_count[y, x]
+            if troop_count > 0:
+                pygame.draw.circle(self.screen, WHITE, rect.center, max(1, ts // 3))
+                if ts >= MIN_GLYPH_TILE:
+                    text = self.glyph(int(troop_count))
+                    self.screen.blit(text, text.get_rect(center=rect.center))
+        else:
+            # 绘制中立领土
+            pygame.draw.rect(self.screen, NEUTRAL_COLOR, rect)
+
+        width = self.highlight.get((x, y))
+        if width:
+            pygame.draw.rect(self.screen, HIGHLIGHT, rect, width)
+        return rect.clip(self.camera.view_rect)
+
+    def _draw_view(self):
+        """重绘整个视口：只遍历可见的格子"""
+        camera = self.camera
+        ts = camera.tile_size
+        if self.background_tile != ts:
+            self._build_background()
+        view = camera.view_rect
+        self.screen.fill(BACKGROUND, view)
+        # 网格背景按滚动偏移对齐后一次复制，只覆盖地图所在区域
+        self.screen.set_clip(camera.world_rect())
+        self.screen.blit(self.background, (view.x - camera.x % ts, view.y - camera.y % ts))
+        x0, y0, x1, y1 = camera.visible_tiles()
+        for y, x in np.argwhere(self.board.owner[y0:y1, x0:x1] != EMPTY):
+            self._draw_tile(int(x) + x0, int(y) + y0)
+        for x, y in self.highlight:
+            if x0 <= x < x1 and y0 <= y < y1:
+                self._draw_tile(x, y)
+        self.screen.set_clip(None)
+
+    def _draw_panel(self, items):
+        pygame.draw.rect(self.screen, PANEL_COLOR, self.panel_rect)
+        top = self.panel_rect.top
+        pygame.draw.line(self.screen, WHITE, (0, top + 1), (self.panel_rect.right, top + 1), 2)
+        for font, text, color, pos in items:
+            self.screen.blit(font.render(text, True, color), pos)
+
+    def _draw_overlay(self, items):
+        overlay = pygame.Surface(self.screen.get_size(), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 180))
+        self.screen.blit(overlay, (0, 0))
+        center_x, center_y = self.screen.get_rect().center
+        for font, text, color, offset_y in items:
+            surface = font.render(text, True, color)
+            self.screen.blit(surface, (center_x - surface.get_width() // 2, center_y + offset_y))
+
+    def render(self, selected, panel_items, overlay_items=None):
+        """绘制一帧，返回需要更新到显示器的矩形列表
+
+        panel_items: [(字体, 文字, 颜色, 位置)]，内容不变时不重绘信息面板
+        overlay_items: [(字体, 文字, 颜色, 相对屏幕中心的纵向偏移)]，游戏结束时的遮罩
+        """
+        board = self.board
+        highlight = self._highlight_tiles(selected)
+        if highlight != self.highlight:
+            board.dirty.update(self.highlight)
+            board.dirty.update(highlight)
+            self.highlight = highlight
+
+        panel_key = tuple(panel_items)
+        overlay_key = tuple(overlay_items) if overlay_items else None
+        # 遮罩显示时任何变化都需要整屏重绘，保证遮罩在最上层
+        if overlay_key and (board.dirty or panel_key != self.panel_key or overlay_key != self.overlay_key):
+            self.full_redraw = True
+        if overlay_key is None and self.overlay_key is not None:
+            self.full_redraw = True
+        # 平移或缩放后整屏重绘
+        if self.camera.version != self.camera_version:
+            self.full_redraw = True
+
+        if self.full_redraw:
+            self.full_redraw = False
+            self.camera_version = self.camera.version
+            board.dirty.clear()
+            self._draw_view()
+            self._draw_panel(panel_items)
+            if overlay_key:
+                self._draw_overlay(overlay_items)
+            self.panel_key = panel_key
+            self.overlay_key = overlay_key
+            return [self.screen.get_rect()]
+
+        # 视口外的变化直接丢弃，平移到该处时会整屏重绘
+        x0, y0, x1, y1 = self.camera.visible_tiles()
+        self.screen.set_clip(self.camera.view_rect)
+        rects = [self._draw_tile(x, y) for x, y in board.dirty
+                 if x0 <= x < x1 and y0 <= y < y1]
+        self.screen.set_clip(None)
+        board.dirty.clear()
+        if panel_key != self.panel_key:
+            self._draw_panel(panel_items)
+            self.panel_key = panel_key
+            rects.append(self.panel_rect)
+        return rects
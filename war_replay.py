@@ -0,0 +1,300 @@
+import argparse
+import struct
+import zlib
+
+import numpy as np
+
+from war_engine import WarEngine, Troop, STATE_RESTORED
+from war_history import Delta, GameState, MoveLog, STEP_RECORDED
+
+# 二进制录像：只追加写入的记录流，可以边写边读，也可以只读取需要的部分
+#
+#   文件头 | 记录 | 记录 | ... | [关键帧索引 | 文件尾]
+#
+# 每条记录为 类型(1字节) + 内容长度(4字节) + 回合数(4字节) + 内容：
+#   STEP     一步（一次移动、战斗结算或回合结算）后被修改格子的新内容和受影响国家的新状态
+#   KEYFRAME 每隔若干回合的完整状态（war_history.GameState，zlib压缩）
+#   RESTORE  撤销、重做或载入后的完整状态，格式同KEYFRAME，表示之后的记录不再接续之前的状态
+# 录像记录的是每一步的结果而不是随机数，回放时不需要重新计算战斗和奖励。
+# 正常关闭时在末尾追加关键帧索引；没有索引（例如程序中途退出）时打开文件会扫描一遍记录头重建。
+
+MAGIC = b"WARR"
+VERSION = 1
+KEYFRAME_INTERVAL = 50  # 默认每隔多少回合写一个关键帧
+
+STEP = 1
+KEYFRAME = 2
+RESTORE = 3
+
+# 魔数, 版本, 宽, 高, 国家数, 是否有玩家, 奖励步长, 移动距离, 是否记录了种子, 种子
+HEADER = struct.Struct("<4sHIIHBHBBq")
+RECORD = struct.Struct("<BIi")
+# 一步的固定部分：行动国家(-1为回合结算), 移动(无移动时为-1), 格子数, 国家数, 下一个士兵组id, 回合数, 是否结束, 胜者(-1为无)
+STEP_HEAD = struct.Struct("<h4iIHqiBh")
+# 关键帧的固定部分：下一个士兵组id, 回合数, 是否结束, 胜者, 士兵组数
+KEYFRAME_HEAD = struct.Struct("<qiBhI")
+# 索引偏移, 索引条数, 最后的回合数, 魔数
+TRAILER = struct.Struct("<QIi4s")
+INDEX_MAGIC = b"WIDX"
+
+TILE_DTYPE = np.dtype([("x", "<i4"), ("y", "<i4"), ("owner", "<i2"), ("count", "<i4")])
+COUNTRY_DTYPE = np.dtype([("cid", "<i2"), ("current", "<i4"), ("total", "<i4"),
+                          ("next_reward", "<i4"), ("defeated", "u1")])
+INDEX_DTYPE = np.dtype([("turn", "<i4"), ("offset", "<u8")])
+
+def encode_state(state):
+    head = KEYFRAME_HEAD.pack(state.next_troop_id, state.turn_count, state.game_over,
+                              state.winner, len(state.troop_ids))
+    body = b"".join([state.owner.astype("<i2").tobytes(), state.troop_count.astype("<i4").tobytes(),
+                     state.troop_ids.astype("<i8").tobytes(), state.countries.astype("<i8").tobytes()])
+    return head + zlib.compress(body, 1)
+
+def decode_state(payload, width, height, num_countries):
+    next_troop_id, turn_count, game_over, winner, num_troops = KEYFRAME_HEAD.unpack_from(payload)
+    body = zlib.decompress(payload[KEYFRAME_HEAD.size:])
+    tiles = width * height
+    owner = np.frombuffer(body, "<i2", tiles).reshape(height, width)
+    offset = owner.nbytes
+    troop_count = np.frombuffer(body, "<i4", tiles, offset).reshape(height, width)
+    offset += troop_count.nbytes
+    troop_ids = np.frombuffer(body, "<i8", num_troops, offset)
+    offset += troop_ids.nbytes
+    countries = np.frombuffer(body, "<i8", num_countries * 4, offset).reshape(-1, 4)
+    return GameState(owner, troop_count, troop_ids, countries, next_troop_id, turn_count,
+                     bool(game_over), winner)
+
+def encode_step(delta):
+    """一步记录的内容：Delta中改动后的一侧"""
+    tiles = np.empty(len(delta.tiles), TILE_DTYPE)
+    ids = []
+    for i, ((x, y), change) in enumerate(delta.tiles.items()):
+        troops = change[3]
+        tiles[i] = (x, y, change[2], len(troops))
+        ids.extend(troop.id for troop in troops)
+    changed = np.empty(len(delta.countries), COUNTRY_DTYPE)
+    for i, (cid, change) in enumerate(delta.countries.items()):
+        changed[i] = (cid,) + change[1]
+    next_troop_id, turn_count, game_over, winner = delta.after
+    head = STEP_HEAD.pack(-1 if delta.actor is None else delta.actor, *(delta.move or (-1, -1, -1, -1)),
+                          len(tiles), len(changed), next_troop_id, turn_count, game_over,
+                          winner.cid if winner else -1)
+    return b"".join([head, tiles.tobytes(), np.array(ids, "<i8").tobytes(), changed.tobytes()])
+
+def decode_step(payload, troops, countries):
+    """还原为只有改动后一侧的Delta，可交给MoveLog.apply；troops为id -> Troop，新出现的士兵组加入其中"""
+    (actor, fx, fy, tx, ty, num_tiles, num_countries,
+     next_troop_id, turn_count, game_over, winner) = STEP_HEAD.unpack_from(payload)
+    offset = STEP_HEAD.size
+    tiles = np.frombuffer(payload, TILE_DTYPE, num_tiles, offset)
+    offset += tiles.nbytes
+    ids = np.frombuffer(payload, "<i8", int(tiles["count"].sum()), offset).tolist()
+    offset += 8 * len(ids)
+    changed = np.frombuffer(payload, COUNTRY_DTYPE, num_countries, offset)
+
+    delta = Delta(None if actor < 0 else actor, None if fx < 0 else (fx, fy, tx, ty), None)
+    start = 0
+    for x, y, owner, count in tiles.tolist():
+        stack = []
+        for troop_id in ids[start:start + count]:
+            troop = troops.get(troop_id)
+            if troop is None:
+                troop = troops[troop_id] = Troop(troop_id, x, y)
+            stack.append(troop)
+        start += count
+        delta.tiles[(x, y)] = [None, None, owner, tuple(stack)]
+    for cid, current, total, next_reward, defeated in changed.tolist():
+        delta.countries[cid] = [None, (current, total, next_reward, bool(defeated))]
+    delta.after = (next_troop_id, turn_count, bool(game_over), countries[winner] if winner >= 0 else None)
+    return delta
+
+class ReplayWriter:
+    """把引擎的每一步追加写入录像文件（通过引擎事件，不改变对局本身）
+
+    文件头记录引擎的随机种子（engine.seed），回放本身不需要它。
+    """
+
+    def __init__(self, path, engine, keyframe_interval=KEYFRAME_INTERVAL):
+        self.engine = engine
+        self.keyframe_interval = keyframe_interval
+        self.file = open(path, "wb")
+        self.index = []
+        self.last_turn = engine.turn_count
+        self.restore_offset = None  # 文件末尾的RESTORE记录的偏移
+        with_player = engine.player_country is not None
+        self.file.write(HEADER.pack(MAGIC, VERSION, engine.grid_width, engine.grid_height,
+                                    len(engine.countries), with_player, engine.reward_step,
+                                    engine.move_range, True, engine.seed))
+        # 只为录像开启走子记录时不保留撤销步
+        if engine.history is None:
+            engine.track_history(limit=0)
+        engine.subscribe(STEP_RECORDED, self.on_step)
+        engine.subscribe(STATE_RESTORED, self.on_restored)
+        self.write_state(KEYFRAME)
+
+    def _write(self, kind, turn, payload):
+        self.restore_offset = None
+        if kind != STEP:
+            self.index.append((turn, self.file.tell()))
+        self.file.write(RECORD.pack(kind, len(payload), turn))
+        self.file.write(payload)
+        self.last_turn = turn
+
+    def write_state(self, kind):
+        self._write(kind, self.engine.turn_count, encode_state(self.engine.save_state()))
+        self.file.flush()
+
+    def on_step(self, delta):
+        self._write(STEP, delta.after[1], encode_step(delta))
+        if delta.actor is None:
+            # 每回合结束时写入磁盘，程序中途退出时录像最多丢失一个回合
+            if self.engine.turn_count % self.keyframe_interval == 0:
+                self.write_state(KEYFRAME)
+            else:
+                self.file.flush()
+
+    def on_restored(self):
+        # 连续撤销或重做时只保留最后的状态：覆盖末尾尚未被后续记录引用的RESTORE
+        offset = self.restore_offset
+        if offset is not None:
+            self.file.seek(offset)
+            self.file.truncate()
+            self.index.pop()
+        offset = self.file.tell()
+        self.write_state(RESTORE)
+        self.restore_offset = offset
+
+    def close(self):
+        """停止录制，写入关键帧索引"""
+        if self.file is None:
+            return
+        self.engine.unsubscribe(STEP_RECORDED, self.on_step)
+        self.engine.unsubscribe(STATE_RESTORED, self.on_restored)
+        offset = self.file.tell()
+        self.file.write(np.array(self.index, INDEX_DTYPE).tobytes())
+        self.file.write(TRAILER.pack(offset, len(self.index), self.last_turn, INDEX_MAGIC))
+        self.file.close()
+        self.file = None
+
+class ReplayReader:
+    """读取录像：按需从文件中读取记录，不把整个文件载入内存"""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        (magic, version, self.width, self.height, self.num_countries, with_player, self.reward_step,
+         self.move_range, has_seed, seed) = HEADER.unpack(self.file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}不是录像文件或版本不受支持")
+        self.with_player = bool(with_player)
+        self.seed = seed if has_seed else None
+        self._load_index()
+
+    def _load_index(self):
+        """读取文件末尾的关键帧索引，没有时扫描记录头重建"""
+        size = self.file.seek(0, 2)
+        if size >= HEADER.size + TRAILER.size:
+            self.file.seek(size - TRAILER.size)
+            offset, count, last_turn, magic = TRAILER.unpack(self.file.read(TRAILER.size))
+            if magic == INDEX_MAGIC:
+                self.file.seek(offset)
+                self.index = np.frombuffer(self.file.read(count * INDEX_DTYPE.itemsize), INDEX_DTYPE)
+                self.end = offset
+                self.last_turn = last_turn
+                return
+
+        # 只读取记录头，跳过内容；末尾不完整的记录被忽略
+        index = []
+        offset = HEADER.size
+        self.last_turn = 0
+        while offset + RECORD.size <= size:
+            self.file.seek(offset)
+            kind, length, turn = RECORD.unpack(self.file.read(RECORD.size))
+            if kind not in (STEP, KEYFRAME, RESTORE) or offset + RECORD.size + length > size:
+                break
+            if kind != STEP:
+                index.append((turn, offset))
+            offset += RECORD.size + length
+            self.last_turn = turn
+        self.index = np.array(index, INDEX_DTYPE)
+        self.end = offset
+
+    def records(self, offset=HEADER.size):
+        """从offset开始依次返回(类型, 回合数, 内容)，每次只读取一条记录"""
+        file = self.file
+        while offset < self.end:
+            file.seek(offset)
+            kind, length, turn = RECORD.unpack(file.read(RECORD.size))
+            payload = file.read(length)
+            offset += RECORD.size + length
+            yield kind, turn, payload
+
+    def new_engine(self, state):
+        """按录像的规则参数创建引擎，直接从state开始"""
+        return WarEngine(self.width, self.height, num_ai=self.num_countries - self.with_player,
+                         with_player=self.with_player, reward_step=self.reward_step,
+                         move_range=self.move_range, state=state)
+
+    def state_at(self, offset):
+        for kind, turn, payload in self.records(offset):
+            return decode_state(payload, self.width, self.height, self.num_countries)
+
+    def seek(self, turn, engine=None):
+        """返回(引擎, 步骤迭代器)：引擎处于第turn回合开始时的状态（超出录像时为最后的状态）
+
+        从不晚于turn的最近关键帧开始，只重放其后的记录，开销与关键帧间隔有关而与录像长度无关。
+        给出engine时在其上载入状态（例如保持渲染器引用的棋盘不变）。
+        步骤迭代器继续向后推进，每步返回应用后的Delta（遇到RESTORE时返回None）。
+        """
+        # 撤销会在文件后部写入回合数更小的RESTORE，因此取文件中最后一个回合数不超过turn的关键帧
+        candidates = np.flatnonzero(self.index["turn"] <= turn)
+        start = int(self.index["offset"][candidates[-1] if len(candidates) else 0])
+        state = self.state_at(start)
+        if engine is None:
+            engine = self.new_engine(state)
+        else:
+            engine.load_state(state)
+        troops = {troop.id: troop for stack in engine.board.tile_troops.values() for troop in stack}
+        log = MoveLog(engine)
+        records = self.records(start)
+        next(records)
+
+        def steps():
+            for kind, _, payload in records:
+                if kind == STEP:
+                    delta = decode_step(payload, troops, engine.countries)
+                    log.apply(delta)
+                    yield delta
+                elif kind == RESTORE:
+                    engine.load_state(decode_state(payload, self.width, self.height, self.num_countries))
+                    troops.clear()
+                    troops.update((troop.id, troop) for stack in engine.board.tile_troops.values()
+                                  for troop in stack)
+                    yield None
+
+        iterator = steps()
+        while engine.turn_count < turn:
+            if next(iterator, StopIteration) is StopIteration:
+                break
+        return engine, iterator
+
+    def close(self):
+        self.file.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="录像分析（图形回放：python War.py --replay 文件）")
+    parser.add_argument("path", help="录像文件")
+    parser.add_argument("--turn", type=int, default=None, help="输出该回合开始时各国的状态，默认为录像结束时")
+    args = parser.parse_args(argv)
+
+    reader = ReplayReader(args.path)
+    print(f"{reader.width}x{reader.height}地图 {reader.num_countries}国 "
+          f"种子{reader.seed if reader.seed is not None else '未知'} "
+          f"共{reader.last_turn}回合 {len(reader.index)}个关键帧")
+    engine, _ = reader.seek(reader.last_turn if args.turn is None else args.turn)
+    print(f"第{engine.turn_count}回合" + (f" {engine.winner.name}获胜" if engine.winner else ""))
+    for country in engine.countries:
+        status = "已被消灭" if country.defeated else f"{country.current_territory}领土 {country.get_troop_count()}兵力"
+        print(f"  {country.name}: {status}")
+    reader.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import argparse
+import os
+import struct
+
+import numpy as np
+
+from war_engine import WarEngine
+from war_history import GameState
+
+# 存档：固定布局的二进制文件，载入时直接内存映射，不逐格解析
+#
+#   文件头 | 国家计数器 | 随机数状态 | 归属数组 | 士兵数数组 | 士兵组id | 安全格子索引的顺序
+#
+# 各段的长度都由文件头算出，起点按8字节对齐，可以直接映射为numpy数组。
+# 映射使用写时复制：载入后棋盘直接使用映射的数组，只有被修改的页才会复制到内存，存档文件本身不变。
+# 保存时先写入临时文件再替换。Windows不允许替换仍被映射的文件，因此覆盖对局正在映射的存档前，
+# 先把棋盘数组复制到内存（见release_mapping）。
+
+MAGIC = b"WARS"
+VERSION = 2
+
+# 魔数, 版本, 宽, 高, 国家数, 是否有玩家, 奖励步长, 移动距离, 是否记录了种子, 种子,
+# 下一个士兵组id, 回合数, 是否结束, 胜者(-1为无), 士兵组数, 安全格子数, 棋盘哈希, 是否有缓存的正态分布值, 该值
+HEADER = struct.Struct("<4sHIIHBHBBqqiBhIIQBd")
+RNG_WORDS = 625  # random.Random的内部状态：624个32位整数加当前位置
+
+def align(offset):
+    return -(-offset // 8) * 8
+
+def layout(width, height, num_countries, num_troops, num_spawn):
+    """各段的(起点, 数据类型, 形状)"""
+    sections = []
+    offset = align(HEADER.size)
+    for dtype, shape in (("<i8", (num_countries, 4)), ("<u4", (RNG_WORDS,)), ("<i2", (height, width)),
+                         ("<i4", (height, width)), ("<i8", (num_troops,)), ("<i4", (num_spawn,))):
+        sections.append((offset, np.dtype(dtype), shape))
+        offset = align(offset + np.dtype(dtype).itemsize * int(np.prod(shape)))
+    return sections
+
+def mapped_file(array):
+    """数组映射自的文件路径，不是内存映射时返回None"""
+    base = array
+    while base is not None:
+        if isinstance(base, np.memmap):
+            return base.filename
+        base = base.base
+    return None
+
+def release_mapping(board, path):
+    """棋盘数组映射自path时复制到内存，解除对该文件的映射"""
+    path = os.path.abspath(path)
+    if mapped_file(board.owner) == path:
+        board.owner = np.array(board.owner)
+    if mapped_file(board.troop_count) == path:
+        board.troop_count = np.array(board.troop_count)
+
+def save_game(engine, path):
+    """把对局保存到path：棋盘、各国家计数器、士兵组、回合数和随机数状态"""
+    # save_state会完成载入后延迟的索引重建，之后士兵组id等数组不再被引用，只剩棋盘数组可能仍在映射
+    state = engine.save_state()
+    release_mapping(engine.board, path)
+    version, words, gauss = engine.rng.getstate()
+    has_seed = isinstance(engine.seed, int) and -2 ** 63 <= engine.seed < 2 ** 63
+    header = HEADER.pack(MAGIC, VERSION, engine.grid_width, engine.grid_height, len(engine.countries),
+                         engine.player_country is not None, engine.reward_step, engine.move_range,
+                         has_seed, engine.seed if has_seed else 0,
+                         state.next_troop_id, state.turn_count, state.game_over, state.winner,
+                         len(state.troop_ids), len(state.spawn_order), state.hash, gauss is not None, gauss or 0.0)
+    arrays = (state.countries, np.array(words, dtype=np.uint32), state.owner, state.troop_count, state.troop_ids,
+              state.spawn_order)
+    temp = path + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(header)
+        for (offset, dtype, shape), array in zip(layout(engine.grid_width, engine.grid_height, len(engine.countries),
+                                                        len(state.troop_ids), len(state.spawn_order)), arrays):
+            f.write(bytes(offset - f.tell()))
+            f.write(np.ascontiguousarray(array, dtype=dtype).tobytes())
+    try:
+        os.replace(temp, path)
+    except OSError:
+        os.remove(temp)
+        raise
+
+def read_header(path):
+    """读取并检查文件头：不是存档、版本不支持或文件长度与文件头不符时抛出ValueError"""
+    with open(path, "rb") as f:
+        data = f.read(HEADER.size)
+        size = os.fstat(f.fileno()).st_size
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path}不是存档文件（文件过短）")
+    fields = HEADER.unpack(data)
+    if fields[0] != MAGIC or fields[1] != VERSION:
+        raise ValueError(f"{path}不是存档文件或版本不支持")
+    width, height, num_countries = fields[2:5]
+    num_troops, num_spawn = fields[14:16]
+    offset, dtype, shape = layout(width, height, num_countries, num_troops, num_spawn)[-1]
+    if size < offset + dtype.itemsize * int(np.prod(shape)):
+        raise ValueError(f"{path}已损坏（文件长度与文件头不符）")
+    return fields[2:]
+
+def load_game(path, engine=None):
+    """载入存档，返回引擎；给出engine时在其上载入（地图尺寸和国家数量必须一致），否则按存档的规则参数创建
+
+    数组直接映射自文件，载入时间与地图大小基本无关；士兵组对象和领土索引在第一次被使用时才建立。
+    """
+    (width, height, num_countries, with_player, reward_step, move_range, has_seed, seed,
+     next_troop_id, turn_count, game_over, winner, num_troops, num_spawn, board_hash, has_gauss, gauss) = read_header(path)
+    data = np.memmap(path, dtype=np.uint8, mode="c")
+    countries, words, owner, troop_count, troop_ids, spawn_order = (
+        np.asarray(data[offset:offset + dtype.itemsize * int(np.prod(shape))]).view(dtype).reshape(shape)
+        for offset, dtype, shape in layout(width, height, num_countries, num_troops, num_spawn))
+    state = GameState(owner, troop_count, troop_ids, countries, next_troop_id, turn_count,
+                      bool(game_over), winner, board_hash, spawn_order)
+    if engine is None:
+        engine = WarEngine(width, height, num_ai=num_countries - with_player, with_player=bool(with_player),
+                           reward_step=reward_step, move_range=move_range, state=state)
+    else:
+        engine.load_state(state)
+    if has_seed:
+        engine.seed = seed
+    engine.rng.setstate((3, tuple(words.tolist()), gauss if has_gauss else None))
+    return engine
+
+def main():
+    parser = argparse.ArgumentParser(description="查看存档")
+    parser.add_argument("path")
+    args = parser.parse_args()
+    engine = load_game(args.path)
+    print(f"{engine.grid_width}x{engine.grid_height} 种子{engine.seed} 第{engine.turn_count}回合"
+          f"{' 已结束' if engine.game_over else ''}")
+    for country in engine.countries:
+        status = "已被消灭" if country.defeated else f"领土{country.current_territory} 士兵组{country.get_troop_count()}"
+        print(f"  {country.name}: {status}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+import time
+from itertools import chain
+
+import numpy as np
+
+from war_board import EMPTY, NEUTRAL, count_key, owner_key, splitmix64
+
+# 搜索型电脑：在apply_move的规则上做有深度限制的alpha-beta搜索
+#
+# 搜索把局面简化为两方：正在行动的国家（己方）和其附近的所有敌方士兵组（对手）。
+# 双方轮流行动，对手总是选择对己方最不利的进攻（偏执假设），任一方也可以不行动。
+# 局面用Zobrist哈希标识（棋盘哈希由Board增量维护，搜索中随走子增量更新），
+# 结果存入有界的置换表；迭代加深直到用完每步的时间预算。
+
+# 评估权重（以士兵组为单位，相对搜索开始时的变化量）
+TILE_VALUE = 1.0          # 己方每增加一块领土
+TROOP_VALUE = 1.0         # 己方每增加一个士兵组
+ENEMY_TILE_VALUE = 0.2    # 敌方每损失一块领土
+ENEMY_TROOP_VALUE = 1.0   # 敌方每损失一个士兵组（没有士兵的国家无法行动）
+
+# 置换表条目的边界类型
+EXACT, LOWER, UPPER = 0, 1, 2
+
+SIDE_KEY = splitmix64(0x6A09E667F3BCC908)         # 轮到对手行动
+PERSPECTIVE_SALT = 0xBB67AE8584CAA73B            # 区分不同国家视角的评估
+CHECK_INTERVAL = 32                              # 每搜索多少个节点检查一次时间
+
+class SearchTimeout(Exception):
+    """本次迭代超出时间预算"""
+
+class TranspositionTable:
+    """固定大小的置换表：按哈希取槽位，深度优先替换
+
+    每次搜索开始时调用new_search()。评估是相对于搜索开始时的局面的变化量，
+    之前搜索（或其他国家）留下的条目的分数以另一个局面为基准，因此probe只返回本次搜索的条目，
+    旧条目总是可以被替换；同一次搜索中只有深度不小于原条目时才替换。
+    """
+
+    def __init__(self, size=1 << 16):
+        size = 1 << max(0, size - 1).bit_length()
+        self.mask = size - 1
+        self.entries = [None] * size
+        self.generation = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def probe(self, key):
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key and entry[5] == self.generation:
+            return entry
+        return None
+
+    def store(self, key, depth, score, flag, move):
+        slot = key & self.mask
+        old = self.entries[slot]
+        if old is None or old[5] != self.generation or depth >= old[1]:
+            self.entries[slot] = (key, depth, score, flag, move, self.generation)
+
+class SearchState:
+    """搜索用的棋盘：在只读的owner/troop_count数组上叠加修改，支持走子和撤销"""
+
+    def __init__(self, owner, troop_count, board_hash, cid, stacks, enemy_stacks,
+                 total_territory, next_reward, reward_step, offsets):
+        self.owner = owner
+        self.troop_count = troop_count
+        self.height, self.width = owner.shape
+        self.overlay = {}  # (x, y) -> (归属, 兵力)
+        self.hash = board_hash
+        self.cid = cid
+        self.offsets = offsets
+        # 双方可以行动的士兵组位置：0为己方，1为对手
+        self.stacks = [set(stacks), set(enemy_stacks)]
+        # 相对搜索开始时的变化量
+        self.tiles = 0
+        self.troops = 0
+        self.enemy_tiles = 0
+        self.enemy_troops = 0
+        # 己方的奖励进度（每占领reward_step块领土获得一个士兵组）
+        self.total_territory = total_territory
+        self.next_reward = next_reward
+        self.reward_step = reward_step
+
+    def get(self, x, y):
+        cell = self.overlay.get((x, y))
+        if cell is None:
+            return int(self.owner[y, x]), int(self.troop_count[y, x])
+        return cell
+
+    def _set(self, x, y, old, new):
+        """修改格子并更新哈希"""
+        if old != new:
+            index = y * self.width + x
+            self.hash ^= (owner_key(index, old[0]) ^ owner_key(index, new[0])
+                          ^ count_key(index, old[1]) ^ count_key(index, new[1]))
+            self.overlay[(x, y)] = new
+
+    def evaluate(self):
+        """从己方视角评估当前局面"""
+        return (TILE_VALUE * self.tiles + TROOP_VALUE * self.troops
+                - ENEMY_TILE_VALUE * self.enemy_tiles - ENEMY_TROOP_VALUE * self.enemy_troops)
+
+    def moves(self, side):
+        """一方的所有移动，按预估收益排序；对手只考虑进攻己方格子"""
+        cid = self.cid
+        width, height = self.width, self.height
+        moves = []
+        for x, y in self.stacks[side]:
+            mover, count = self.get(x, y)
+            for dx, dy in self.offsets:
+                tx, ty = x + dx, y + dy
+                if not (0 <= tx < width and 0 <= ty < height):
+                    continue
+                target, defenders = self.get(tx, ty)
+                if side:
+                    if target != cid:
+                        continue
+                    guess = min(count, defenders) + (count >= defenders)
+                elif target == cid:
+                    guess = 0  # 合并到友方格子
+                elif target < 0:
+                    guess = 1  # 空白或中立格子
+                else:
+                    guess = (count >= defenders) - (count < defenders) * count
+                moves.append((guess, (x, y, tx, ty)))
+        moves.sort(key=lambda item: -item[0])
+        return [move for _, move in moves]
+
+    def make(self, side, move):
+        """按apply_move的规则执行移动，返回撤销信息"""
+        fx, fy, tx, ty = move
+        undo = ({}, (self.hash, self.tiles, self.troops, self.enemy_tiles, self.enemy_troops,
+                     self.total_territory, self.next_reward),
+                (set(self.stacks[0]), set(self.stacks[1])))
+        saved = undo[0]
+        mover, count = self.get(fx, fy)
+        target, defenders = self.get(tx, ty)
+        saved[(fx, fy)] = self.overlay.get((fx, fy))
+        saved[(tx, ty)] = self.overlay.get((tx, ty))
+
+        self._set(fx, fy, (mover, count), (mover, 0))
+        self.stacks[side].discard((fx, fy))
+
+        if target == mover:
+            # 合并到友方领土
+            self._set(tx, ty, (target, defenders), (mover, defenders + count))
+            self.stacks[side].add((tx, ty))
+            return undo
+
+        if target == EMPTY or target == NEUTRAL:
+            winner, remaining, losses = mover, count, 0
+        elif count >= defenders:
+            winner, remaining, losses = mover, count - defenders, defenders
+        else:
+            winner, remaining, losses = target, defenders - count, count
+
+        mine = mover == self.cid
+        if mine:
+            self.troops -= losses
+        else:
+            self.enemy_troops -= losses
+        if target == self.cid:
+            self.troops -= losses
+        elif target >= 0:
+            self.enemy_troops -= losses
+
+        self._set(tx, ty, (target, defenders), (winner, remaining))
+        if winner == mover:
+            # 占领目标格子
+            self.stacks[1 - side].discard((tx, ty))
+            if remaining:
+                self.stacks[side].add((tx, ty))
+            if mine:
+                self.tiles += 1
+                self.total_territory += 1
+                if self.total_territory >= self.next_reward:
+                    # 奖励的士兵组生成在随机的安全格子上，这里只计入兵力
+                    self.next_reward += self.reward_step
+                    self.troops += 1
+            if target == self.cid:
+                self.tiles -= 1
+            elif target >= 0:
+                self.enemy_tiles -= 1
+        return undo
+
+    def unmake(self, undo):
+        saved, counters, stacks = undo
+        for pos, cell in saved.items():
+            if cell is None:
+                self.overlay.pop(pos, None)
+            else:
+                self.overlay[pos] = cell
+        (self.hash, self.tiles, self.troops, self.enemy_tiles, self.enemy_troops,
+         self.total_territory, self.next_reward) = counters
+        self.stacks = [stacks[0], stacks[1]]
+
+class SearchAI:
+    """迭代加深的alpha-beta搜索，每步最多使用time_budget秒
+
+    time_budget越大棋力越强、每步越慢；max_depth为双方合计的最大搜索层数。
+    置换表的存储在多次搜索（和所有电脑国家）之间共用，但每次搜索只使用自己的条目（见TranspositionTable）。
+    """
+
+    def __init__(self, time_budget=0.02, max_depth=6, table_size=1 << 16):
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.table = TranspositionTable(table_size)
+        self.deadline = 0.0
+        self.nodes = 0
+        self.depth_reached = 0  # 最近一次搜索完成的深度
+        self.perspective = 0    # 当前搜索国家的哈希键，区分不同视角的置换表条目
+
+    def choose(self, engine, country):
+        """为电脑国家搜索一步移动，返回(from_x, from_y, to_x, to_y)或None
+
+        时间预算从调用时开始计算，包括收集双方士兵组的准备工作。
+        """
+        deadline = time.perf_counter() + self.time_budget
+        board = engine.board
+        stacks, _ = engine.ai_sources([country])
+        stacks = [tuple(pos) for pos in stacks.tolist()]
+        if not stacks:
+            return None
+        state = SearchState(board.owner, board.troop_count, board.hash, country.cid, stacks,
+                            self._enemy_stacks(board, country.cid, stacks, engine.move_offsets),
+                            country.total_territory, country.next_reward, engine.reward_step,
+                            engine.move_offsets)
+        return self.search(state, deadline)
+
+    def _enemy_stacks(self, board, cid, stacks, offsets):
+        """对手的士兵组：一步之内可以进攻己方领土，或在己方士兵组两步之内的敌方士兵组"""
+        tiles = np.fromiter(chain.from_iterable(board.tile_troops), dtype=np.intp,
+                            count=2 * len(board.tile_troops)).reshape(-1, 2)
+        tiles = tiles[board.owner[tiles[:, 1], tiles[:, 0]] != cid]
+        if not len(tiles):
+            return []
+        x, y = tiles[:, 0:1], tiles[:, 1:2]
+        deltas = np.asarray(offsets)
+        tx = x + deltas[:, 0]
+        ty = y + deltas[:, 1]
+        inside = (tx >= 0) & (tx < board.width) & (ty >= 0) & (ty < board.height)
+        target = board.owner[ty.clip(0, board.height - 1), tx.clip(0, board.width - 1)]
+        threat = (inside & (target == cid)).any(axis=1)
+        # 己方士兵组移动后可能到达的范围：以每个己方士兵组为中心、曼哈顿距离reach以内的格子，一次标记在棋盘上
+        reach = 2 * int(np.abs(deltas).max())
+        dy, dx = np.mgrid[-reach:reach + 1, -reach:reach + 1]
+        diamond = np.abs(dx) + np.abs(dy) <= reach
+        own = np.asarray(stacks)
+        cx = (own[:, 0:1] + dx[diamond]).ravel()
+        cy = (own[:, 1:2] + dy[diamond]).ravel()
+        inside = (cx >= 0) & (cx < board.width) & (cy >= 0) & (cy < board.height)
+        covered = np.zeros(board.owner.shape, dtype=bool)
+        covered[cy[inside], cx[inside]] = True
+        near = threat | covered[tiles[:, 1], tiles[:, 0]]
+        return [tuple(pos) for pos in tiles[near].tolist()]
+
+    def search(self, state, deadline=None):
+        """在state上迭代加深搜索，deadline（time.perf_counter的时刻）省略时为现在起time_budget秒"""
+        self.table.new_search()
+        self.deadline = time.perf_counter() + self.time_budget if deadline is None else deadline
+        self.nodes = 0
+        self.depth_reached = 0
+        self.perspective = splitmix64(state.cid ^ PERSPECTIVE_SALT)
+
+        root_moves = state.moves(0)
+        if not root_moves:
+            return None
+        best = root_moves[0]
+        for depth in range(1, self.max_depth + 1):
+            try:
+                move = self._root(state, root_moves, depth)
+            except SearchTimeout:
+                break
+            best = move
+            self.depth_reached = depth
+            # 下一轮先搜索本轮的最佳移动
+            root_moves.remove(move)
+            root_moves.insert(0, move)
+        return best
+
+    def _root(self, state, moves, depth):
+        alpha = float("-inf")
+        best = moves[0]
+        for move in moves:
+            undo = state.make(0, move)
+            try:
+                score = -self._negamax(state, depth - 1, float("-inf"), -alpha, 1)
+            finally:
+                state.unmake(undo)
+            if score > alpha:
+                alpha = score
+                best = move
+        self.table.store(state.hash ^ self.perspective, depth, alpha, EXACT, best)
+        return best
+
+    def _negamax(self, state, depth, alpha, beta, side):
+        """返回从side视角的局面分数；对手视角的分数为己方评估取负"""
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        if depth == 0:
+            score = state.evaluate()
+            return -score if side else score
+
+        key = state.hash ^ self.perspective ^ (SIDE_KEY if side else 0)
+        entry = self.table.probe(key)
+        tt_move = None
+        if entry is not None:
+            tt_move = entry[4]
+            if entry[1] >= depth:
+                score, flag = entry[2], entry[3]
+                if flag == EXACT:
+                    return score
+                if flag == LOWER:
+                    alpha = max(alpha, score)
+                elif flag == UPPER:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        moves = state.moves(side)
+        if tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        # 也可以不行动
+        moves.append(None)
+
+        original_alpha = alpha
+        best_score = float("-inf")
+        best_move = None
+        for move in moves:
+            undo = state.make(side, move) if move else None
+            try:
+                score = -self._negamax(state, depth - 1, -beta, -alpha, 1 - side)
+            finally:
+                if undo:
+                    state.unmake(undo)
+            if score > best_score:
+                best_score = score
+                best_move = move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table.store(key, depth, best_score, flag, best_move)
+        return best_score
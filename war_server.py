@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+import json
+
+from war_engine import WarEngine
+
+# 本地多人对战服务器：一个进程托管一局权威对局，多个客户端通过TCP或Unix套接字连接，
+# 每个玩家控制一个国家，其余国家由电脑控制；任意数量的观战连接只接收画面。
+#
+# 协议为JSON行（每条消息一行UTF-8 JSON）。客户端发送：
+#   {"type": "join", "country": 编号（可省略）}    占据一个国家（省略时分配任意空闲国家）
+#   {"type": "watch"}                              观战
+#   {"type": "move", "from": [x, y], "to": [x, y]} 本回合的移动
+#   {"type": "pass"}                               本回合不移动
+# 服务器发送：
+#   {"type": "state", ...}   完整状态：加入、观战和重新开局时发送一次（见state_message）
+#   {"type": "update", ...}  每次移动或回合结算后广播给已经加入或观战的连接，只包含发生变化的格子（见update_message）
+#   {"type": "error", "message": 说明}
+#
+# 每回合等待所有在座玩家移动或放弃（最长turn_timeout秒，超时视为放弃），然后电脑行动并结算回合；
+# 没有玩家时按turn_timeout的间隔自动进行电脑对战。同时行动模式（WarEngine.simultaneous）下
+# 玩家的命令先保留，回合结束时与电脑的命令一起结算；否则玩家的移动立即执行并广播。
+# 广播的消息只编码一次，写入每个连接的发送缓冲区；缓冲区超过MAX_BUFFER的慢速连接被断开，不拖慢其他连接。
+
+MAX_BUFFER = 1 << 20  # 每个连接允许积压的字节数
+RESTART_DELAY = 3.0   # 游戏结束后重新开局前的等待时间（秒）
+
+def encode(message):
+    return (json.dumps(message, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+class Connection:
+    """一个客户端连接：seat为控制的国家编号，观战为None；synced表示已经收到完整状态，之后才接收广播"""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.seat = None
+        self.synced = False
+        self.closed = False
+
+    def send(self, data):
+        if self.closed or self.writer.is_closing():
+            return
+        self.writer.write(data)
+        if self.writer.transport.get_write_buffer_size() > MAX_BUFFER:
+            self.close()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.writer.close()
+
+class WarServer:
+    """托管一局对局，转发玩家的移动并广播变化
+
+    规则在事件循环的线程中直接执行（默认地图每回合只需几毫秒），所有连接共享同一个引擎。
+    """
+
+    def __init__(self, engine, turn_timeout=10.0):
+        self.engine = engine
+        self.turn_timeout = turn_timeout
+        engine.board.track_dirty()
+        engine.board.dirty.clear()
+        self.clients = set()
+        self.seats = {}      # 国家编号 -> Connection
+        self.waiting = set()  # 本回合还没有行动的在座国家
+        self.orders = []     # 同时行动模式下本回合保留的玩家命令
+        self.turn_ready = asyncio.Event()
+        self.servers = []
+        self.handlers = set()  # 各连接的处理任务
+        self.task = None
+
+    async def start(self, host="127.0.0.1", port=8765, path=None):
+        """开始监听（给出path时使用Unix套接字）并开始推进回合"""
+        if path:
+            server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        self.servers.append(server)
+        if self.task is None:
+            self.task = asyncio.create_task(self.run_turns())
+        return server
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+        for server in self.servers:
+            server.close()
+        for conn in list(self.clients):
+            conn.close()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        for server in self.servers:
+            await server.wait_closed()
+
+    async def handle(self, reader, writer):
+        conn = Connection(writer)
+        self.clients.add(conn)
+        task = asyncio.current_task()
+        self.handlers.add(task)
+        try:
+            while not conn.closed:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                    kind = message["type"]
+                except (ValueError, KeyError, TypeError):
+                    conn.send(encode({"type": "error", "message": "无法解析的消息"}))
+                    continue
+                handler = getattr(self, f"on_{kind}", None)
+                if handler is None:
+                    conn.send(encode({"type": "error", "message": f"未知的消息类型{kind}"}))
+                    continue
+                error = handler(conn, message)
+                if error:
+                    conn.send(encode({"type": "error", "message": error}))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.leave(conn)
+            conn.close()
+            self.handlers.discard(task)
+
+    def leave(self, conn):
+        """连接断开：该国家交还电脑控制"""
+        self.clients.discard(conn)
+        if conn.seat is not None:
+            self.engine.countries[conn.seat].is_player = False
+            del self.seats[conn.seat]
+            self.waiting.discard(conn.seat)
+            self.orders = [order for order in self.orders if order[0] != conn.seat]
+            conn.seat = None
+            if self.seats and not self.waiting:
+                self.turn_ready.set()
+
+    def on_join(self, conn, message):
+        if conn.seat is not None:
+            return "已经控制了一个国家"
+        free = [country.cid for country in self.engine.countries
+                if not country.defeated and country.cid not in self.seats]
+        wanted = message.get("country")
+        if wanted is not None:
+            if wanted not in free:
+                return f"国家{wanted}不可用"
+            free = [wanted]
+        if not free:
+            return "没有空闲的国家"
+        conn.seat = free[0]
+        self.seats[conn.seat] = conn
+        self.engine.countries[conn.seat].is_player = True
+        # 中途加入时本回合即可行动
+        self.waiting.add(conn.seat)
+        self.sync(conn)
+        return None
+
+    def on_watch(self, conn, message):
+        self.sync(conn)
+        return None
+
+    def sync(self, conn):
+        """发送完整状态，之后的广播才发给该连接（还没有加入或观战的连接没有棋盘，不能应用变化）"""
+        conn.send(encode(self.state_message(conn.seat)))
+        conn.synced = True
+
+    def on_move(self, conn, message):
+        engine = self.engine
+        cid = conn.seat
+        if cid is None:
+            return "观战中，不能移动"
+        if cid not in self.waiting:
+            return "本回合已经行动"
+        try:
+            (from_x, from_y), (to_x, to_y) = message["from"], message["to"]
+            move = (cid, int(from_x), int(from_y), int(to_x), int(to_y))
+        except (KeyError, TypeError, ValueError):
+            return "移动的格式应为{\"from\": [x, y], \"to\": [x, y]}"
+        if engine.game_over or not engine.is_legal_move(*move):
+            return "不合法的移动"
+        if engine.simultaneous:
+            self.orders.append(move)
+        else:
+            engine.apply_moves([move])
+            self.broadcast_update()
+        self.acted(cid)
+        return None
+
+    def on_pass(self, conn, message):
+        if conn.seat is None or conn.seat not in self.waiting:
+            return "本回合不需要行动"
+        self.acted(conn.seat)
+        return None
+
+    def acted(self, cid):
+        self.waiting.discard(cid)
+        if not self.waiting:
+            self.turn_ready.set()
+
+    async def run_turns(self):
+        """回合循环：等待玩家行动（或超时），然后电脑行动并结算"""
+        engine = self.engine
+        while True:
+            # 不用wait_for：它在事件恰好被设置时可能吞掉或卡住close的取消
+            waiter = asyncio.ensure_future(self.turn_ready.wait())
+            try:
+                await asyncio.wait((waiter,), timeout=self.turn_timeout)
+            finally:
+                waiter.cancel()
+            self.turn_ready.clear()
+            if engine.simultaneous:
+                orders, self.orders = self.orders, []
+                engine.simultaneous_turn(orders)
+            else:
+                engine.end_turn()
+            self.broadcast_update()
+            if engine.game_over:
+                await asyncio.sleep(RESTART_DELAY)
+                engine.restart_game()
+                engine.board.dirty.clear()
+                for conn in list(self.clients):
+                    if conn.synced:
+                        conn.send(encode(self.state_message(conn.seat)))
+            self.waiting = {cid for cid in self.seats if not engine.countries[cid].defeated}
+
+    def countries_message(self):
+        return [[country.current_territory, country.get_troop_count(), country.defeated, country.is_player]
+                for country in self.engine.countries]
+
+    def state_message(self, seat):
+        """完整状态：地图、规则参数、各国家的名称和颜色，以及当前的归属和士兵组数"""
+        engine = self.engine
+        return {
+            "type": "state",
+            "seat": seat,
+            "width": engine.grid_width,
+            "height": engine.grid_height,
+            "move_range": engine.move_range,
+            "simultaneous": engine.simultaneous,
+            "turn": engine.turn_count,
+            "names": [country.name for country in engine.countries],
+            "colors": [country.color for country in engine.countries],
+            "countries": self.countries_message(),
+            "owner": engine.board.owner.tolist(),
+            "troops": engine.board.troop_count.tolist(),
+            "game_over": engine.game_over,
+            "winner": engine.winner.cid if engine.winner else None,
+        }
+
+    def update_message(self):
+        """自上次广播以来发生变化的格子[[x, y, 归属, 士兵组数], ...]和各国家的概况"""
+        board = self.engine.board
+        tiles = [[x, y, int(board.owner[y, x]), int(board.troop_count[y, x])] for x, y in sorted(board.dirty)]
+        board.dirty.clear()
+        engine = self.engine
+        return {
+            "type": "update",
+            "turn": engine.turn_count,
+            "tiles": tiles,
+            "countries": self.countries_message(),
+            "game_over": engine.game_over,
+            "winner": engine.winner.cid if engine.winner else None,
+        }
+
+    def broadcast_update(self):
+        data = encode(self.update_message())
+        for conn in list(self.clients):
+            if conn.synced:
+                conn.send(data)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地多人对战服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="同时在该路径监听Unix套接字")
+    parser.add_argument("--width", type=int, default=25)
+    parser.add_argument("--height", type=int, default=15)
+    parser.add_argument("--countries", type=int, default=6, help="国家总数（玩家加入后控制其中之一，其余由电脑控制）")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--simultaneous", action="store_true", help="同时行动：玩家和电脑的命令在回合结束时一起结算")
+    parser.add_argument("--turn-timeout", type=float, default=10.0, help="每回合等待玩家的最长时间（秒）")
+    args = parser.parse_args(argv)
+
+    async def serve():
+        engine = WarEngine(args.width, args.height, num_ai=args.countries, with_player=False, seed=args.seed,
+                           simultaneous=args.simultaneous)
+        server = WarServer(engine, args.turn_timeout)
+        await server.start(args.host, args.port)
+        if args.unix:
+            await server.start(path=args.unix)
+        print(f"监听 {args.host}:{args.port}" + (f" 和 {args.unix}" if args.unix else ""))
+        await server.task
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()